@@ -0,0 +1,208 @@
+"""Bitmap engine for presence, leave and absence over a range of days.
+
+Each employee's days are held as bit rows packed eight days to a byte with
+``np.packbits``: one matrix for days they checked in, one for days they were
+late, one for approved leave. A single calendar row marks working days
+(working weekdays minus public holidays, both from ``system_settings``).
+Absence is then ``working & ~present & ~leave``, and counts for a whole
+department over a year come from a few vectorized bit operations and a
+popcount lookup.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from . import system_settings
+from .models import AttendanceRecord, LeavePeriod
+from .queries import between_days, day_start
+
+# Set-bit count of every byte value; np.bitwise_count needs NumPy 2
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(packed: np.ndarray) -> np.ndarray:
+    """Set bits per row of a packed bit matrix."""
+    return POPCOUNT[packed].sum(axis=-1, dtype=np.int64)
+
+
+def public_holidays() -> set:
+    holidays = set()
+    for value in system_settings.get('attendance', 'public_holidays'):
+        holidays.add(value if isinstance(value, date) else date.fromisoformat(str(value)))
+    return holidays
+
+
+def working_day_mask(start_date: date, end_date: date) -> np.ndarray:
+    """Boolean array over ``start_date``..``end_date``; True on working days."""
+    weekdays = set(system_settings.get('attendance', 'working_weekdays'))
+    holidays = public_holidays()
+    days = (end_date - start_date).days + 1
+    return np.array([
+        (day.weekday() in weekdays and day not in holidays)
+        for day in (start_date + timedelta(days=offset) for offset in range(days))
+    ], dtype=bool)
+
+
+class AttendanceBitmaps:
+    """Packed per-day bitsets for ``user_ids`` over ``start_date``..``end_date``."""
+
+    def __init__(self, start_date: date, end_date: date, user_ids: Sequence[int],
+                 present: np.ndarray, late: np.ndarray, leave: np.ndarray, working: np.ndarray):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = (end_date - start_date).days + 1
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.present = present
+        self.late = late
+        self.leave = leave
+        self.working = working
+
+    @classmethod
+    def build(cls, user_ids: Iterable[int], start_date: date, end_date: date) -> 'AttendanceBitmaps':
+        """Load check-ins and approved leave for ``user_ids`` from the database."""
+        user_ids = np.unique(np.fromiter(user_ids, dtype=np.int64))
+        days = (end_date - start_date).days + 1
+        present = np.zeros((user_ids.size, days), dtype=bool)
+        late = np.zeros((user_ids.size, days), dtype=bool)
+        leave = np.zeros((user_ids.size, days), dtype=bool)
+
+        if user_ids.size:
+            rows = (
+                AttendanceRecord.objects.filter(
+                    between_days(start_date, end_date),
+                    user_id__in=user_ids.tolist(),
+                    attendance_type='check_in',
+                    status__in=AttendanceRecord.PRESENT_STATUSES,
+                )
+                .order_by()
+                .values_list('user_id', 'timestamp', 'status')
+            )
+            records = list(rows.iterator())
+            if records:
+                # Office-midnight boundaries of every day, so DST days map correctly
+                bounds = np.array(
+                    [day_start(start_date + timedelta(days=offset)).timestamp() for offset in range(days + 1)]
+                )
+                record_users = np.fromiter((row[0] for row in records), dtype=np.int64, count=len(records))
+                stamps = np.fromiter((row[1].timestamp() for row in records), dtype=np.float64, count=len(records))
+                is_late = np.fromiter((row[2] == 'late' for row in records), dtype=bool, count=len(records))
+                user_index = np.searchsorted(user_ids, record_users)
+                day_index = np.clip(np.searchsorted(bounds, stamps, side='right') - 1, 0, days - 1)
+                present[user_index, day_index] = True
+                late[user_index[is_late], day_index[is_late]] = True
+
+            periods = LeavePeriod.objects.filter(
+                user_id__in=user_ids.tolist(),
+                status='approved',
+                start_date__lte=end_date,
+                end_date__gte=start_date,
+            ).values_list('user_id', 'start_date', 'end_date')
+            for user_id, leave_start, leave_end in periods:
+                row = np.searchsorted(user_ids, user_id)
+                first = (max(leave_start, start_date) - start_date).days
+                last = (min(leave_end, end_date) - start_date).days
+                leave[row, first:last + 1] = True
+
+        return cls(
+            start_date, end_date, user_ids,
+            present=np.packbits(present, axis=1),
+            late=np.packbits(late, axis=1),
+            leave=np.packbits(leave, axis=1),
+            working=np.packbits(working_day_mask(start_date, end_date)),
+        )
+
+    # Derived bitsets -------------------------------------------------------
+
+    def leave_days(self) -> np.ndarray:
+        """Approved leave falling on working days."""
+        return self.leave & self.working
+
+    def absent(self) -> np.ndarray:
+        """Working days with neither a check-in nor approved leave."""
+        return self.working & ~self.present & ~self.leave
+
+    def expected(self) -> np.ndarray:
+        """Working days the employee was expected in (not on leave)."""
+        return self.working & ~self.leave
+
+    def unpack(self, packed: np.ndarray) -> np.ndarray:
+        return np.unpackbits(packed, axis=-1, count=self.days).astype(bool)
+
+    # Aggregates ------------------------------------------------------------
+
+    def streaks(self):
+        """(current, longest) runs of present days per employee.
+
+        Absent working days break a run; weekends, holidays and leave days
+        neither break nor extend it.
+        """
+        present = self.unpack(self.present & self.working).astype(np.int64)
+        breaks = self.unpack(self.absent())
+        counted = np.cumsum(present, axis=1)
+        reset = np.maximum.accumulate(np.where(breaks, counted, 0), axis=1)
+        runs = counted - reset
+        if not self.days:
+            empty = np.zeros(self.user_ids.size, dtype=np.int64)
+            return empty, empty
+        return runs[:, -1], runs.max(axis=1)
+
+    def summaries(self) -> List[Dict[str, object]]:
+        """Per-employee day counts, in ``user_ids`` order."""
+        working_days = int(popcount(self.working))
+        present_days = popcount(self.present & self.working)
+        late_days = popcount(self.late & self.working)
+        leave_days = popcount(self.leave_days())
+        absent_days = popcount(self.absent())
+        expected = popcount(self.expected())
+        attended = popcount(self.present & self.expected())
+        current, longest = self.streaks()
+
+        results = []
+        for index, user_id in enumerate(self.user_ids.tolist()):
+            results.append({
+                'user_id': user_id,
+                'working_days': working_days,
+                'present_days': int(present_days[index]),
+                'late_days': int(late_days[index]),
+                'leave_days': int(leave_days[index]),
+                'absent_days': int(absent_days[index]),
+                'attendance_rate': round(float(attended[index] / expected[index] * 100), 2) if expected[index] else 0,
+                'current_streak': int(current[index]),
+                'longest_streak': int(longest[index]),
+            })
+        return results
+
+    def totals(self) -> Dict[str, object]:
+        """Group totals across every employee in the bitmap."""
+        present_days = int(popcount(self.present & self.working).sum())
+        attended = int(popcount(self.present & self.expected()).sum())
+        expected = int(popcount(self.expected()).sum())
+        return {
+            'employees': int(self.user_ids.size),
+            'working_days': int(popcount(self.working)),
+            'present_days': present_days,
+            'late_days': int(popcount(self.late & self.working).sum()),
+            'leave_days': int(popcount(self.leave_days()).sum()),
+            'absent_days': int(popcount(self.absent()).sum()),
+            'attendance_rate': round(attended / expected * 100, 2) if expected else 0,
+        }
+
+    def daily_absent_counts(self) -> np.ndarray:
+        """Employees absent on each day of the range."""
+        return self.unpack(self.absent()).sum(axis=0)
+
+
+def user_summary(user_id: int, start_date: date, end_date: date) -> Dict[str, object]:
+    return AttendanceBitmaps.build([user_id], start_date, end_date).summaries()[0]
+
+
+def department_summary(user_ids: Iterable[int], start_date: date, end_date: date,
+                       per_user: bool = False) -> Dict[str, object]:
+    bitmaps = AttendanceBitmaps.build(user_ids, start_date, end_date)
+    result = bitmaps.totals()
+    if per_user:
+        result['employees_detail'] = bitmaps.summaries()
+    return result
@@ -0,0 +1,124 @@
+"""Materialize ``absent`` and ``on_leave`` attendance rows after the workday.
+
+Once a working day has closed, every active employee without a check-in gets
+one ``check_in`` row stamped at office midnight with status ``on_leave``
+(approved leave covers the day) or ``absent``. Historical reports can then
+count those statuses directly instead of anti-joining users against
+check-ins.
+
+The job works one department at a time and records each finished department
+in ``AbsenteeRun``, so an interrupted run resumes where it stopped. It is
+also idempotent: employees who already have any check-in that day,
+including a materialized one, are skipped, and the insert ignores rows that
+would violate the (user, timestamp, attendance_type) unique constraint.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import system_settings
+from .absence import working_day_mask
+from .archive import insert_raw
+from .conditional import bump_data_version
+from .models import AbsenteeRun, AttendanceRecord, Department, LeavePeriod, User
+from .queries import day_start, office_timezone, on_day
+
+NOTE = 'Recorded by absentee job'
+
+
+def closed_day():
+    """Latest office day whose workday has ended."""
+    end = system_settings.get_time('attendance', 'work_end_time')
+    now = timezone.localtime(timezone.now(), office_timezone())
+    today = now.date()
+    return today if now.time() >= end else today - timedelta(days=1)
+
+
+def is_working_day(day) -> bool:
+    return bool(working_day_mask(day, day)[0])
+
+
+def department_scopes() -> List[Optional[int]]:
+    """Department ids to process, with None for staff without a department."""
+    return list(Department.objects.order_by('id').values_list('id', flat=True)) + [None]
+
+
+def scope_name(department_id: Optional[int]) -> str:
+    return f"department:{department_id if department_id is not None else 'none'}"
+
+
+def materialize_department(day, department_id: Optional[int], batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Write absent/on_leave rows for one department's staff on ``day``."""
+    batch_size = batch_size or getattr(settings, 'ABSENTEE_BATCH_SIZE', 1000)
+    staff = User.objects.filter(
+        role='user', employment_status='active', department_ref_id=department_id,
+        date_joined__lt=day_start(day + timedelta(days=1)),
+    )
+    checked_in = AttendanceRecord.objects.filter(on_day(day), attendance_type='check_in').values('user_id')
+    missing = list(staff.exclude(id__in=checked_in).order_by('id').values_list('id', flat=True))
+    on_leave = set(
+        LeavePeriod.objects.filter(
+            user_id__in=missing, status='approved', start_date__lte=day, end_date__gte=day,
+        ).values_list('user_id', flat=True)
+    )
+
+    stamp = day_start(day)
+    now = timezone.now()
+    counts = {'absent': 0, 'on_leave': 0}
+    for offset in range(0, len(missing), batch_size):
+        rows = []
+        for user_id in missing[offset:offset + batch_size]:
+            status = 'on_leave' if user_id in on_leave else 'absent'
+            counts[status] += 1
+            rows.append(AttendanceRecord(
+                user_id=user_id,
+                timestamp=stamp,
+                attendance_type='check_in',
+                status=status,
+                verification_method='manual',
+                notes=NOTE,
+                created_at=now,
+                updated_at=now,
+            ))
+        with transaction.atomic():
+            insert_raw(AttendanceRecord, rows)
+            bump_data_version(row.user_id for row in rows)
+    return counts
+
+
+def materialize_absentees(day=None, department_ids: Optional[Iterable[Optional[int]]] = None,
+                          force: bool = False, batch_size: Optional[int] = None, log=None) -> Dict[str, int]:
+    """Run the absentee job for ``day`` (default: the latest closed day).
+
+    Departments already recorded in ``AbsenteeRun`` for the day are skipped
+    unless ``force`` is set. Non-working days are skipped entirely.
+    """
+    day = day or closed_day()
+    log = log or (lambda message: None)
+    totals = {'departments': 0, 'skipped': 0, 'absent': 0, 'on_leave': 0}
+    if not is_working_day(day):
+        log(f'{day} is not a working day')
+        return totals
+
+    scopes = department_scopes() if department_ids is None else list(department_ids)
+    done = set(AbsenteeRun.objects.filter(day=day).values_list('scope', flat=True))
+    for department_id in scopes:
+        scope = scope_name(department_id)
+        if scope in done and not force:
+            totals['skipped'] += 1
+            continue
+        counts = materialize_department(day, department_id, batch_size)
+        run, _ = AbsenteeRun.objects.get_or_create(day=day, scope=scope)
+        run.absent_count += counts['absent']
+        run.leave_count += counts['on_leave']
+        run.save()
+        totals['departments'] += 1
+        totals['absent'] += counts['absent']
+        totals['on_leave'] += counts['on_leave']
+        log(f"{scope}: {counts['absent']} absent, {counts['on_leave']} on leave")
+    return totals
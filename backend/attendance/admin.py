@@ -5,7 +5,10 @@ from django.urls import reverse
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import User, AttendanceRecord, BiometricVerificationSession
+from .models import User, AttendanceRecord, BiometricVerificationSession, Department, Office, LeavePeriod, AbsenteeRun, ReportJob, SystemSetting, AuditLog
+from . import system_settings
+from .conditional import bump_data_version
+from .exports import export_response
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -77,7 +80,7 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     list_filter = [
         'attendance_type', 'status', 'verification_method',
         'face_verified', 'ear_verified', 'timestamp',
-        ('user__department', admin.RelatedOnlyFieldListFilter),
+        ('user__department_ref', admin.RelatedOnlyFieldListFilter),
         ('user__role', admin.RelatedOnlyFieldListFilter)
     ]
     search_fields = [
@@ -116,22 +119,29 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
         return obj.get_verification_status()
     verification_status.short_description = 'Verification Status'
     
-    actions = ['mark_as_present', 'mark_as_absent', 'export_attendance_data']
+    actions = ['mark_as_present', 'mark_as_absent', 'export_attendance_data', 'export_attendance_xlsx']
     
     def mark_as_present(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
         updated = queryset.update(status='present')
+        bump_data_version(user_ids)
         self.message_user(request, f'{updated} attendance records marked as present.')
     mark_as_present.short_description = 'Mark selected as present'
     
     def mark_as_absent(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
         updated = queryset.update(status='absent')
+        bump_data_version(user_ids)
         self.message_user(request, f'{updated} attendance records marked as absent.')
     mark_as_absent.short_description = 'Mark selected as absent'
     
     def export_attendance_data(self, request, queryset):
-        # This would integrate with a proper export library like django-import-export
-        self.message_user(request, 'Export functionality would be implemented here.')
-    export_attendance_data.short_description = 'Export attendance data'
+        return export_response(queryset, 'csv')
+    export_attendance_data.short_description = 'Export attendance data (CSV)'
+    
+    def export_attendance_xlsx(self, request, queryset):
+        return export_response(queryset, 'xlsx')
+    export_attendance_xlsx.short_description = 'Export attendance data (Excel)'
 
 @admin.register(BiometricVerificationSession)
 class BiometricVerificationSessionAdmin(admin.ModelAdmin):
@@ -141,7 +151,7 @@ class BiometricVerificationSessionAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'verification_type', 'status', 'created_at',
-        ('user__department', admin.RelatedOnlyFieldListFilter)
+        ('user__department_ref', admin.RelatedOnlyFieldListFilter)
     ]
     search_fields = [
         'session_id', 'user__full_name', 'user__short_id'
@@ -175,6 +185,73 @@ class BiometricVerificationSessionAdmin(admin.ModelAdmin):
         return "In Progress"
     session_duration.short_description = 'Duration'
 
+@admin.register(Department, Office)
+class DimensionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'headcount', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['headcount', 'created_at', 'updated_at']
+    ordering = ('name',)
+
+@admin.register(LeavePeriod)
+class LeavePeriodAdmin(admin.ModelAdmin):
+    list_display = ['user', 'leave_type', 'start_date', 'end_date', 'status', 'approved_by']
+    list_filter = ['leave_type', 'status', 'start_date']
+    search_fields = ['user__full_name', 'user__short_id']
+    raw_id_fields = ['user', 'approved_by']
+    date_hierarchy = 'start_date'
+    ordering = ('-start_date',)
+
+@admin.register(AbsenteeRun)
+class AbsenteeRunAdmin(admin.ModelAdmin):
+    list_display = ['day', 'scope', 'absent_count', 'leave_count', 'completed_at']
+    list_filter = ['day']
+    readonly_fields = ['day', 'scope', 'absent_count', 'leave_count', 'completed_at']
+    ordering = ('-day', 'scope')
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['job_id', 'status', 'requested_by', 'created_at', 'completed_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['job_id', 'params_hash', 'params', 'result', 'error', 'created_at', 'started_at', 'completed_at']
+    ordering = ('-created_at',)
+
+@admin.register(SystemSetting)
+class SystemSettingAdmin(admin.ModelAdmin):
+    list_display = ['section', 'name', 'value', 'updated_by', 'updated_at']
+    list_filter = ['section']
+    readonly_fields = ['updated_by', 'updated_at']
+    ordering = ('section', 'name')
+
+    def save_model(self, request, obj, form, change):
+        obj.updated_by = request.user
+        super().save_model(request, obj, form, change)
+        system_settings.invalidate()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        system_settings.invalidate()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        system_settings.invalidate()
+
+@admin.register(AuditLog)
+class AuditLogAdmin(admin.ModelAdmin):
+    list_display = ['timestamp', 'username', 'action', 'action_type', 'status', 'ip_address']
+    list_filter = ['action_type', 'status', 'timestamp']
+    search_fields = ['username', 'action', 'resource_name']
+    ordering = ('-timestamp',)
+
+    # Append-only: entries are viewed here, never edited or removed
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # Customize admin site
 admin.site.site_header = "Government Biometric Attendance System"
 admin.site.site_title = "Biometric Attendance Admin"
@@ -0,0 +1,334 @@
+"""Cold-storage archival of old attendance records and verification sessions.
+
+Rows past the retention window are streamed into compressed JSONL segment
+files (zstd when ``zstandard`` is installed, gzip otherwise), each recorded in
+a per-model ``manifest.json`` with its SHA-256 checksum, row count and id and
+time bounds. Only once a segment is durably on disk are its rows deleted from
+the live table, in small id-keyed batches each in its own short transaction,
+so the purge never holds long locks. ``rehydrate`` streams segments back for
+a date range when an audit needs them.
+"""
+from __future__ import annotations
+
+import fcntl
+import gzip
+import hashlib
+import io
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.db.models import Model, Q
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from .models import AttendanceRecord, BiometricVerificationSession
+from .queries import day_start
+
+try:
+    import zstandard
+except Exception:  # pragma: no cover - zstandard is optional, gzip is the fallback
+    zstandard = None  # type: ignore
+
+# Sessions that never reached a final state are abandoned after this long
+SESSION_EXPIRY_SECONDS = 1800
+
+ARCHIVED_MODELS = {
+    'attendance_record': (AttendanceRecord, 'timestamp'),
+    'verification_session': (BiometricVerificationSession, 'created_at'),
+}
+
+
+def archive_root() -> str:
+    return str(getattr(settings, 'ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'archive')))
+
+
+def _model_dir(kind: str) -> str:
+    path = os.path.join(archive_root(), kind)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _manifest_path(kind: str) -> str:
+    return os.path.join(_model_dir(kind), 'manifest.json')
+
+
+def load_manifest(kind: str) -> Dict[str, Any]:
+    try:
+        with open(_manifest_path(kind)) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {'kind': kind, 'segments': []}
+
+
+def _write_manifest(kind: str, manifest: Dict[str, Any]) -> None:
+    path = _manifest_path(kind)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _archive_lock(kind: str):
+    """Serialize archive runs for one model across processes."""
+    with open(os.path.join(_model_dir(kind), '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _codec() -> str:
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def _open_writer(raw, codec: str):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='wb')
+
+
+def _open_reader(raw, codec: str):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to read zstd archive segments')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding='utf-8')
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode='rb'), encoding='utf-8')
+
+
+class _HashingFile:
+    """Write-through wrapper that checksums bytes as they hit the disk."""
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self._fh.write(data)
+
+    def flush(self):
+        self._fh.flush()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _field_names(model) -> List[str]:
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _write_segment(kind: str, model, time_field: str, rows: Iterator[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Stream rows into a new segment file; returns its manifest entry."""
+    codec = _codec()
+    created = timezone.now()
+    name = f"{kind}-{created.strftime('%Y%m%dT%H%M%S%f')}.jsonl.{'zst' if codec == 'zstd' else 'gz'}"
+    path = os.path.join(_model_dir(kind), name)
+    tmp_path = f'{path}.partial'
+
+    ids: List[int] = []
+    min_time = max_time = None
+    with open(tmp_path, 'wb') as raw:
+        hashing = _HashingFile(raw)
+        writer = _open_writer(hashing, codec)
+        for row in rows:
+            writer.write((json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode('utf-8'))
+            ids.append(row['id'])
+            moment = row[time_field]
+            min_time = moment if min_time is None or moment < min_time else min_time
+            max_time = moment if max_time is None or moment > max_time else max_time
+        writer.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not ids:
+        os.remove(tmp_path)
+        return None
+
+    checksum = hashing.digest.hexdigest()
+    if _file_sha256(tmp_path) != checksum:
+        os.remove(tmp_path)
+        raise RuntimeError(f'Checksum mismatch while writing {name}')
+    os.replace(tmp_path, path)
+
+    return {
+        'file': name,
+        'codec': codec,
+        'sha256': checksum,
+        'rows': len(ids),
+        'ids': ids,
+        'min_id': min(ids),
+        'max_id': max(ids),
+        'min_time': min_time.isoformat(),
+        'max_time': max_time.isoformat(),
+        'created_at': created.isoformat(),
+    }
+
+
+def _delete_in_batches(model, ids: List[int], batch_size: int) -> int:
+    deleted = 0
+    for offset in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            count, _ = model.objects.filter(pk__in=ids[offset:offset + batch_size]).delete()
+        deleted += count
+    return deleted
+
+
+def archive_queryset(kind: str, queryset, batch_size: Optional[int] = None, segment_rows: Optional[int] = None) -> Dict[str, int]:
+    """Move every row of ``queryset`` into archive segments, then delete it.
+
+    Rows are read in primary-key order, ``segment_rows`` per segment. Each
+    segment is written, fsynced and checksummed before its rows are deleted
+    ``batch_size`` at a time.
+    """
+    model, time_field = ARCHIVED_MODELS[kind]
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 1000)
+    segment_rows = segment_rows or getattr(settings, 'ARCHIVE_SEGMENT_ROWS', 50000)
+    fields = _field_names(model)
+    totals = {'segments': 0, 'archived': 0, 'deleted': 0}
+
+    with _archive_lock(kind):
+        last_id = 0
+        while True:
+            rows = (
+                queryset.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values(*fields)[:segment_rows]
+                .iterator(chunk_size=batch_size)
+            )
+            entry = _write_segment(kind, model, time_field, rows)
+            if entry is None:
+                break
+
+            ids = entry.pop('ids')
+            manifest = load_manifest(kind)
+            manifest['segments'].append(entry)
+            _write_manifest(kind, manifest)
+
+            totals['segments'] += 1
+            totals['archived'] += entry['rows']
+            totals['deleted'] += _delete_in_batches(model, ids, batch_size)
+            last_id = entry['max_id']
+
+    return totals
+
+
+def expired_sessions_filter(now=None) -> Q:
+    """Sessions that were abandoned before reaching a final status."""
+    now = now or timezone.now()
+    return Q(
+        status__in=['pending', 'in_progress'],
+        created_at__lt=now - timedelta(seconds=SESSION_EXPIRY_SECONDS),
+    )
+
+
+def archive_old_data(
+    retention_days: Optional[int] = None,
+    session_retention_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    segment_rows: Optional[int] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Archive attendance records and sessions past their retention windows."""
+    retention_days = retention_days if retention_days is not None else getattr(
+        settings, 'ATTENDANCE_RETENTION_DAYS', 365)
+    session_retention_days = session_retention_days if session_retention_days is not None else getattr(
+        settings, 'SESSION_RETENTION_DAYS', 30)
+    now = timezone.now()
+
+    records = AttendanceRecord.objects.filter(timestamp__lt=now - timedelta(days=retention_days))
+    sessions = BiometricVerificationSession.objects.filter(
+        Q(created_at__lt=now - timedelta(days=session_retention_days)) | expired_sessions_filter(now)
+    )
+    return {
+        'attendance_record': archive_queryset('attendance_record', records, batch_size, segment_rows),
+        'verification_session': archive_queryset('verification_session', sessions, batch_size, segment_rows),
+    }
+
+
+def iter_segment_rows(kind: str, entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    path = os.path.join(_model_dir(kind), entry['file'])
+    if _file_sha256(path) != entry['sha256']:
+        raise RuntimeError(f"Checksum mismatch for archive segment {entry['file']}")
+    with open(path, 'rb') as raw:
+        for line in _open_reader(raw, entry['codec']):
+            if line.strip():
+                yield json.loads(line)
+
+
+def insert_raw(model, objs: List[Model]) -> None:
+    """Insert rows with their field values exactly as given.
+
+    ``bulk_create`` would re-run ``auto_now``/``auto_now_add`` and overwrite
+    the timestamps, so rows go in through a raw InsertQuery, the same way
+    fixture loading does. Rows that hit a unique constraint are skipped.
+    """
+    fields = model._meta.concrete_fields
+    if any(obj.pk is None for obj in objs):
+        # New rows take their ids from the database
+        fields = [field for field in fields if not field.primary_key]
+    query = InsertQuery(model, on_conflict=OnConflict.IGNORE)
+    query.insert_values(fields, objs, raw=True)
+    query.get_compiler(using=router.db_for_write(model)).execute_sql()
+
+
+def rehydrate(kind: str, start_date: date, end_date: date, batch_size: Optional[int] = None) -> int:
+    """Restore archived rows whose time falls within ``start_date``..``end_date``.
+
+    Only segments whose time bounds overlap the range are opened. Rows that
+    are already live, or whose user no longer exists, are skipped. Returns
+    the number of rows inserted.
+    """
+    model, time_field = ARCHIVED_MODELS[kind]
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 1000)
+    start, end = day_start(start_date), day_start(end_date + timedelta(days=1))
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    time_attname = model._meta.get_field(time_field).attname
+    user_model = model._meta.get_field('user').related_model
+
+    restored = 0
+    batch: List[Model] = []
+
+    def flush():
+        nonlocal restored
+        if not batch:
+            return
+        live_users = set(user_model.objects.filter(
+            pk__in={obj.user_id for obj in batch}).values_list('pk', flat=True))
+        live_ids = set(model.objects.filter(
+            pk__in=[obj.pk for obj in batch]).values_list('pk', flat=True))
+        objs = [obj for obj in batch if obj.user_id in live_users and obj.pk not in live_ids]
+        if objs:
+            with transaction.atomic():
+                insert_raw(model, objs)
+        restored += len(objs)
+        batch.clear()
+
+    for entry in load_manifest(kind)['segments']:
+        seg_start = fields[time_attname].to_python(entry['min_time'])
+        seg_end = fields[time_attname].to_python(entry['max_time'])
+        if seg_end < start or seg_start >= end:
+            continue
+        for row in iter_segment_rows(kind, entry):
+            values = {name: fields[name].to_python(value) for name, value in row.items() if name in fields}
+            if not (start <= values[time_attname] < end):
+                continue
+            batch.append(model(**values))
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+    return restored
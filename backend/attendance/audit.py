@@ -0,0 +1,236 @@
+"""Append-only audit trail of logins, marks, enrolments and admin actions.
+
+An INSERT per audited request would put a write on the login and marking
+hot paths, so ``writer.record`` only builds an ``AuditLog`` and puts it on a
+bounded in-process queue. A daemon thread takes entries off the queue and
+writes them with ``bulk_create``: as soon as ``AUDIT_BATCH_SIZE`` are
+waiting, or ``AUDIT_FLUSH_INTERVAL`` seconds after the first of a batch
+arrived, whichever comes first. Each entry keeps the time it was recorded.
+
+Backpressure: when the queue (``AUDIT_QUEUE_SIZE`` entries) stays full for
+``AUDIT_QUEUE_TIMEOUT`` seconds the writer has fallen behind the database,
+and the recording request writes a batch itself. Requests slow down rather
+than entries being dropped or memory growing without bound.
+
+The queue is drained at interpreter exit, which is how gunicorn workers end
+on a graceful shutdown or restart, for at most ``AUDIT_DRAIN_TIMEOUT``
+seconds. Entries are lost only if the process is killed outright. With an
+interval of 0 or less every entry is written at once (the tests run that
+way). Management commands call ``drain`` once they have recorded, rather
+than rely on the exit hook.
+"""
+from __future__ import annotations
+
+import atexit
+import ipaddress
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+backpressure = metrics.Counter('audit.backpressure', 'Audit entries written by the request because the queue was full')
+failed = metrics.Counter('audit.failed', 'Audit entries that could not be written (logged instead)')
+
+_STOP = object()
+
+
+def client_ip(request) -> Optional[str]:
+    """The client's address, taking the first X-Forwarded-For hop behind a proxy."""
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    candidate = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR', '')
+    try:
+        return str(ipaddress.ip_address(candidate))
+    except ValueError:
+        # A malformed address must not fail the whole batch insert
+        return None
+
+
+class AuditWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread = None
+        self._pid = None
+
+    @staticmethod
+    def interval() -> float:
+        return float(getattr(settings, 'AUDIT_FLUSH_INTERVAL', 0.5))
+
+    @staticmethod
+    def batch_size() -> int:
+        return int(getattr(settings, 'AUDIT_BATCH_SIZE', 500))
+
+    # Recording --------------------------------------------------------------
+
+    def record(self, action: str, action_type: str, request=None, user=None, status: str = 'success',
+               resource_type: str = '', resource_id: Any = '', resource_name: str = '',
+               details: Any = None, username: str = '') -> AuditLog:
+        """Queue one entry; ``user`` defaults to the request's authenticated user."""
+        if user is None and request is not None and getattr(request.user, 'is_authenticated', False):
+            user = request.user
+        entry = AuditLog(
+            user_id=user.pk if user is not None else None,
+            username=user.username if user is not None else username,
+            role=getattr(user, 'role', '') or '',
+            action=action,
+            action_type=action_type,
+            resource_type=resource_type,
+            resource_id=str(resource_id or ''),
+            resource_name=(resource_name or '')[:255],
+            status=status,
+            ip_address=client_ip(request) if request is not None else None,
+            user_agent=request.META.get('HTTP_USER_AGENT', '')[:255] if request is not None else '',
+            details=details,
+        )
+        self.submit(entry)
+        return entry
+
+    def submit(self, entry: AuditLog) -> None:
+        if self.interval() <= 0:
+            self._write([entry])
+            return
+        pending = self._ensure_worker()
+        try:
+            pending.put(entry, timeout=float(getattr(settings, 'AUDIT_QUEUE_TIMEOUT', 0.05)))
+        except queue.Full:
+            # The writer is behind: write this entry and a batch of older ones here
+            batch = [entry] + self._take(pending, self.batch_size() - 1)
+            backpressure.incr(len(batch))
+            self._write(batch)
+
+    def __len__(self):
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+    # Writing ----------------------------------------------------------------
+
+    @staticmethod
+    def _take(pending: queue.Queue, limit: int) -> List[AuditLog]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                entry = pending.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                batch.append(entry)
+        return batch
+
+    def _write(self, batch: List[AuditLog]) -> int:
+        if not batch:
+            return 0
+        try:
+            AuditLog.objects.bulk_create(batch, batch_size=self.batch_size())
+            return len(batch)
+        except Exception:
+            # Keep the trail in the log file rather than lose it
+            failed.incr(len(batch))
+            logger.exception('Could not write %d audit entries: %s', len(batch), [
+                (entry.timestamp.isoformat(), entry.username, entry.action, entry.status) for entry in batch
+            ])
+            return 0
+
+    def flush(self) -> int:
+        """Write everything queued in this thread; returns the number of entries written."""
+        if self._queue is None or self._pid != os.getpid():
+            return 0
+        written = 0
+        while True:
+            batch = self._take(self._queue, self.batch_size())
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """Stop the writer thread once it has written everything queued.
+
+        Returns how many entries were left for this thread to write.
+        """
+        timeout = float(getattr(settings, 'AUDIT_DRAIN_TIMEOUT', 10)) if timeout is None else timeout
+        with self._lock:
+            thread, pending = self._thread, self._queue
+            if thread is None or self._pid != os.getpid():
+                return 0
+            self._thread = None
+        if thread.is_alive():
+            deadline = time.monotonic() + timeout
+            try:
+                pending.put(_STOP, timeout=timeout)
+                thread.join(max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                pass
+        # Whatever the thread did not get to (it died, or ran out of time)
+        return self.flush()
+
+    # Worker -----------------------------------------------------------------
+
+    def _ensure_worker(self) -> queue.Queue:
+        pid = os.getpid()
+        if self._pid != pid or self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != pid or self._thread is None or not self._thread.is_alive():
+                    if self._pid != pid or self._queue is None:
+                        # Forked: the parent's queued entries are the parent's to write
+                        self._queue = queue.Queue(maxsize=int(getattr(settings, 'AUDIT_QUEUE_SIZE', 10000)))
+                    self._pid = pid
+                    self._thread = threading.Thread(
+                        target=self._run, args=(self._queue,), name='audit-writer', daemon=True,
+                    )
+                    self._thread.start()
+        return self._queue
+
+    def _run(self, pending: queue.Queue) -> None:
+        stopping = False
+        while not stopping:
+            entry = pending.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = time.monotonic() + max(self.interval(), 0.01)
+            limit = self.batch_size()
+            while len(batch) < limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            close_old_connections()
+            try:
+                self._write(batch)
+            finally:
+                close_old_connections()
+        # Asked to stop: write what is left before returning
+        try:
+            while True:
+                batch = self._take(pending, self.batch_size())
+                if not batch:
+                    break
+                self._write(batch)
+        finally:
+            close_old_connections()
+
+
+writer = AuditWriter()
+
+
+@atexit.register
+def _drain_at_exit() -> None:
+    try:
+        writer.drain()
+    except Exception:
+        logger.exception('Audit log drain at exit failed')
@@ -0,0 +1,37 @@
+"""JWT authentication that does not load the users row on every request."""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+
+from .principals import LazyPrincipal, load_principal
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` resolving a cached ``LazyPrincipal``.
+
+    Performs the same checks as simplejwt (user exists, is active, password
+    unchanged when ``CHECK_REVOKE_TOKEN`` is on) against the cached principal.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        if api_settings.USER_ID_FIELD not in ('id', 'pk'):
+            # Principals are keyed by primary key
+            return super().get_user(validated_token)
+
+        data = load_principal(user_id)
+        if data is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not data['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and 'revoke_hash' in data:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != data['revoke_hash']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return LazyPrincipal(data)
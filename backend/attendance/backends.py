@@ -0,0 +1,40 @@
+"""Authentication backend for logins under load."""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+from .principals import invalidate_principal
+
+
+class PooledModelBackend(ModelBackend):
+    """``ModelBackend`` whose password checks run in ``hashing.pool``.
+
+    Also upgrades the stored hash when it was made with an older algorithm
+    or cost than the current ``PASSWORD_HASHERS`` settings.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Spend the same hashing time so response times don't reveal which usernames exist
+            hashing.hash_password(password)
+            return None
+        if not user.has_usable_password():
+            return None
+
+        valid, new_encoded = hashing.verify(password, user.password)
+        if not valid:
+            return None
+        if new_encoded:
+            # Only replace the hash we checked, in case the password changed meanwhile
+            UserModel._default_manager.filter(pk=user.pk, password=user.password).update(password=new_encoded)
+            user.password = new_encoded
+            hashing.rehashed.incr()
+            invalidate_principal(user.pk)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,102 @@
+"""Conditional GET for endpoints the app polls.
+
+Each user has a data version counter in the shared cache, bumped after any
+committed change to their profile, attendance records or leave; a second
+counter covers everyone, for admin views over all users. An endpoint's ETag
+hashes the path, query string, rendered format, the relevant counter and the
+office day. It is computed before any query or serializer runs, so a
+matching ``If-None-Match`` gets an empty 304.
+
+Counters start from the current time in milliseconds instead of zero, so a
+counter lost from the cache comes back with a value that no earlier ETag
+carried.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import counters
+from .queries import local_today
+
+ALL_USERS = 'all'
+
+
+def _version_key(user_id) -> str:
+    return f'attendance:data-version:{user_id}'
+
+
+def _seed() -> int:
+    return int(time.time() * 1000)
+
+
+def data_version(user_id=ALL_USERS) -> int:
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(user_ids: Iterable) -> None:
+    # A dropped counter is reseeded with a value no earlier ETag carried, so
+    # per-user counters go in one round trip however many rows changed
+    cache.delete_many([_version_key(user_id) for user_id in set(user_ids) - {ALL_USERS}])
+    counters.incr(_version_key(ALL_USERS), seed=_seed())
+
+
+def bump_data_version(user_ids: Iterable) -> None:
+    """Invalidate ETags for ``user_ids`` (and admin views) once the transaction commits."""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _bump(user_ids))
+
+
+def etag_for(request, user_id=ALL_USERS, *parts) -> str:
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = '|'.join(str(part) for part in (
+        request.path,
+        request.META.get('QUERY_STRING', ''),
+        getattr(renderer, 'format', ''),
+        user_id,
+        data_version(user_id),
+        local_today().isoformat(),
+        *parts,
+    ))
+    return quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def _matches(request, etag: str) -> bool:
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    # Weak comparison: GZipMiddleware marks our tags W/
+    return '*' in tags or etag.strip('"') in {tag.removeprefix('W/').strip('"') for tag in tags}
+
+
+def conditional_response(request, build, user_id=ALL_USERS, cache_control: Optional[dict] = None,
+                         parts: Iterable = ()) -> Response:
+    """``build()``'s response, or a 304 when the client's ETag is still current.
+
+    ``user_id`` picks the data version counter (``ALL_USERS`` for views over
+    everyone); ``parts`` adds anything else the payload depends on.
+    """
+    etag = etag_for(request, user_id, *parts)
+    if _matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build()
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        patch_cache_control(response, **(cache_control or {'private': True, 'no_cache': True}))
+        patch_vary_headers(response, ('Authorization',))
+    return response
@@ -0,0 +1,26 @@
+"""Counters in the shared Django cache.
+
+Version counters (workforce snapshot, ETags, two-tier cache) and metrics are
+integers in the shared cache that every process increments. A counter may be
+missing, never written or evicted, and can be evicted again between
+``add()`` and ``incr()``, so each increment goes through ``incr`` here.
+"""
+from __future__ import annotations
+
+from django.core.cache import cache
+
+
+def incr(key: str, delta: int = 1, seed: int = 0) -> int:
+    """Add ``delta`` to the counter at ``key`` and return the new value.
+
+    A missing counter restarts from ``seed`` (so the first increment returns
+    ``seed + delta``); it is stored without expiry.
+    """
+    if cache.add(key, seed + delta, timeout=None):
+        return seed + delta
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, seed + delta, timeout=None)
+        return seed + delta
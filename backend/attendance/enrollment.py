@@ -0,0 +1,242 @@
+"""Bulk import of enrolled biometric templates.
+
+Moving enrolments over from another vendor means hundreds of thousands of
+face and ear templates. ``BiometricRegistrationView`` takes one user per
+request and validates every float through a serializer; this module takes
+whole template matrices instead:
+
+* ``.npy`` files and stored (uncompressed) ``.npz`` members are memory
+  mapped, as are raw little-endian float32 files, so only the block being
+  processed is read into memory;
+* rows are matched to users by NIN or short ID through a dict built with a
+  single query;
+* each block of ``BIOMETRIC_IMPORT_BLOCK_SIZE`` rows is checked and
+  L2-normalised with numpy, then written with ``bulk_update``;
+* profile ETags and cached principals for the imported users are
+  invalidated once, after the last block.
+
+Verification compares templates by cosine similarity, so normalising does
+not change match scores; it only makes the stored vectors uniform.
+"""
+from __future__ import annotations
+
+import csv
+import os
+import struct
+import zipfile
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .conditional import bump_data_version
+from .models import User
+from .principals import invalidate_principals
+
+# Modality -> key in face_biometric_data / ear_biometric_data
+MODALITIES = {
+    'face': 'face_features',
+    'ear': 'ear_features',
+    'ear_left': 'ear_left_features',
+    'ear_right': 'ear_right_features',
+}
+EAR_MODALITIES = ('ear', 'ear_left', 'ear_right')
+MATCH_FIELDS = ('nin', 'short_id')
+# Stored vectors keep float32 precision without float32 repr noise
+DECIMALS = 6
+
+
+# Reading --------------------------------------------------------------------
+
+def _npz_member(path: str, name: str) -> np.ndarray:
+    """Map one ``.npz`` member without extracting it (if it is stored uncompressed)."""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name if name.endswith('.npy') else f'{name}.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            # np.savez_compressed: no way around inflating the member
+            with archive.open(info) as member:
+                return np.lib.format.read_array(member, allow_pickle=False)
+
+    with open(path, 'rb') as handle:
+        # Skip the zip local file header to reach the .npy bytes
+        handle.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', handle.read(30)[26:30])
+        handle.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(handle)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+        offset = handle.tell()
+    if dtype.hasobject:
+        raise ValueError(f'{name} holds Python objects; save templates and ids as plain arrays')
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+def npz_members(path: str) -> List[str]:
+    with zipfile.ZipFile(path) as archive:
+        return [name[:-len('.npy')] for name in archive.namelist() if name.endswith('.npy')]
+
+
+def open_templates(path: str, member: Optional[str] = None, dim: Optional[int] = None) -> np.ndarray:
+    """A (rows, dim) view of the templates in ``path``, memory mapped where possible.
+
+    ``member`` names the array inside an ``.npz``; raw float32 files (any
+    other extension) need ``dim``.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        array = np.load(path, mmap_mode='r', allow_pickle=False)
+    elif extension == '.npz':
+        array = _npz_member(path, member)
+    else:
+        if not dim:
+            raise ValueError('Raw float32 templates need the vector length (dim)')
+        array = np.memmap(path, dtype='<f4', mode='r')
+        if array.size % dim:
+            raise ValueError(f'{path} holds {array.size} floats, not a multiple of {dim}')
+        array = array.reshape(-1, dim)
+    if array.ndim != 2:
+        raise ValueError(f'Templates must be a 2-D array, got shape {array.shape}')
+    return array
+
+
+def read_ids(path: str) -> List[str]:
+    """Identifiers from a text/CSV file (first column), one per template row.
+
+    A first line reading ``nin`` or ``short_id`` is taken as a header.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        ids = [row[0].strip() if row else '' for row in csv.reader(handle)]
+    if ids and ids[0].lower() in MATCH_FIELDS:
+        ids = ids[1:]
+    return ids
+
+
+def read_npz_ids(path: str, name: str) -> List[str]:
+    """Identifiers stored as an array (strings or integers) inside an ``.npz``."""
+    return [str(value).strip() for value in _npz_member(path, name).tolist()]
+
+
+# Import ---------------------------------------------------------------------
+
+def _normalise(block: np.ndarray):
+    """(unit rows rounded to DECIMALS, mask of rows that could be normalised)"""
+    block = np.asarray(block, dtype=np.float64)
+    norms = np.linalg.norm(block, axis=1)
+    usable = np.isfinite(norms) & (norms > 0)
+    unit = block / np.where(usable, norms, 1.0)[:, None]
+    return np.round(unit, DECIMALS), usable
+
+
+def _status(has_face: bool, has_ear: bool) -> str:
+    # Same mapping as User.get_biometric_status()
+    if has_face and has_ear:
+        return 'both'
+    if has_face:
+        return 'face_only'
+    if has_ear:
+        return 'ear_only'
+    return 'pending'
+
+
+def import_templates(ids: Sequence[str], templates: Dict[str, np.ndarray], match: str = 'nin',
+                     replace: bool = False, dry_run: bool = False, block_size: Optional[int] = None,
+                     log: Callable[[str], Any] = lambda message: None) -> Dict[str, Any]:
+    """Store ``templates[modality][i]`` for the user whose ``match`` field is ``ids[i]``.
+
+    Users who already have a template for an imported modality (or appear
+    twice) are skipped unless ``replace``; as with registration, an ear
+    import replaces the user's whole ear template.
+    """
+    if match not in MATCH_FIELDS:
+        raise ValueError(f'Match on one of {", ".join(MATCH_FIELDS)}')
+    unknown_modalities = set(templates) - set(MODALITIES)
+    if unknown_modalities or not templates:
+        raise ValueError(f'Templates must be given for some of {", ".join(MODALITIES)}')
+    for modality, array in templates.items():
+        if len(array) != len(ids):
+            raise ValueError(f'{len(ids)} ids but {len(array)} {modality} templates')
+    block_size = block_size or getattr(settings, 'BIOMETRIC_IMPORT_BLOCK_SIZE', 2000)
+
+    # identifier -> [user id, has face, has ear], one query for everyone
+    users = {
+        key: [pk, status in ('face_only', 'both'), status in ('ear_only', 'both')]
+        for key, pk, status in User.objects.values_list(match, 'id', 'biometric_verification_status').order_by()
+    }
+    imports_face = 'face' in templates
+    imports_ear = any(modality in templates for modality in EAR_MODALITIES)
+    fields = ['biometric_verification_status', 'is_verified', 'onboarding_completed']
+    if imports_face:
+        fields += ['face_biometric_data', 'face_verification_date']
+    if imports_ear:
+        fields += ['ear_biometric_data', 'ear_verification_date']
+
+    now = timezone.now()
+    updated: List[int] = []
+    unknown: List[str] = []
+    invalid: List[int] = []
+    skipped: List[str] = []
+    for start in range(0, len(ids), block_size):
+        stop = min(start + block_size, len(ids))
+        usable = np.ones(stop - start, dtype=bool)
+        unit = {}
+        for modality, array in templates.items():
+            unit[modality], ok = _normalise(array[start:stop])
+            usable &= ok
+
+        batch = []
+        for offset, key in enumerate(ids[start:stop]):
+            if not usable[offset]:
+                invalid.append(start + offset)
+                continue
+            user = users.get(key)
+            if user is None:
+                unknown.append(key)
+                continue
+            pk, has_face, has_ear = user
+            if not replace and ((imports_face and has_face) or (imports_ear and has_ear)):
+                skipped.append(key)
+                continue
+
+            obj = User(pk=pk)
+            if imports_face:
+                obj.face_biometric_data = {MODALITIES['face']: unit['face'][offset].tolist()}
+                obj.face_verification_date = now
+            if imports_ear:
+                obj.ear_biometric_data = {
+                    MODALITIES[modality]: unit[modality][offset].tolist() if modality in templates else []
+                    for modality in EAR_MODALITIES
+                }
+                obj.ear_verification_date = now
+            user[1], user[2] = has_face or imports_face, has_ear or imports_ear
+            obj.biometric_verification_status = _status(user[1], user[2])
+            obj.is_verified = True
+            obj.onboarding_completed = True
+            batch.append(obj)
+
+        if batch and not dry_run:
+            with transaction.atomic():
+                User.objects.bulk_update(batch, fields, batch_size=500)
+        updated.extend(obj.pk for obj in batch)
+        log(f'{stop} of {len(ids)} templates processed, {len(updated)} users updated')
+
+    if updated and not dry_run:
+        bump_data_version(updated)
+        invalidate_principals(updated)
+
+    return {
+        'rows': len(ids),
+        'updated': len(updated),
+        'unknown': len(unknown),
+        'invalid': len(invalid),
+        'skipped': len(skipped),
+        'dry_run': dry_run,
+        # Enough to chase up problems without echoing a 100k-row file
+        'unknown_ids': unknown[:100],
+        'invalid_rows': invalid[:100],
+        'skipped_ids': skipped[:100],
+    }
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .queries import between_days, since_day, until_day
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - pyarrow is only needed for columnar exports
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# (column header, ORM lookup) pairs; lookups are fetched with values_list so
+# rows never materialize model instances.
+EXPORT_COLUMNS: List[Tuple[str, str]] = [
+    ('record_id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('attendance_type', 'attendance_type'),
+    ('status', 'status'),
+    ('short_id', 'user__short_id'),
+    ('full_name', 'user__full_name'),
+    ('department', 'user__department'),
+    ('office_location', 'user__office_location'),
+    ('position', 'user__position'),
+    ('face_verified', 'face_verified'),
+    ('ear_verified', 'ear_verified'),
+    ('face_confidence', 'face_confidence'),
+    ('ear_confidence', 'ear_confidence'),
+    ('verification_method', 'verification_method'),
+    ('location', 'location'),
+    ('notes', 'notes'),
+]
+
+
+def _parse_date(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def filter_export_queryset(queryset: QuerySet, params) -> QuerySet:
+    """Apply the export filters (date range, department, user) to a queryset.
+
+    Supported params: ``date`` (single day), ``start_date``/``end_date``,
+    ``department`` and ``user`` (user id or short_id).
+    """
+    day = _parse_date(params.get('date'))
+    start_date = _parse_date(params.get('start_date')) or day
+    end_date = _parse_date(params.get('end_date')) or day
+    if start_date and end_date:
+        queryset = queryset.filter(between_days(start_date, end_date))
+    elif start_date:
+        queryset = queryset.filter(since_day(start_date))
+    elif end_date:
+        queryset = queryset.filter(until_day(end_date))
+
+    department = params.get('department')
+    if department and department != 'all':
+        queryset = queryset.filter(user__department=department)
+
+    user = params.get('user')
+    if user:
+        user_filter = Q(user__short_id=user)
+        if str(user).isdigit():
+            user_filter |= Q(user_id=int(user))
+        queryset = queryset.filter(user_filter)
+
+    return queryset
+
+
+def iter_export_rows(queryset: QuerySet, chunk_size: Optional[int] = None) -> Iterator[tuple]:
+    """Yield export rows as tuples, fetching ``chunk_size`` rows at a time.
+
+    ``iterator()`` uses a server-side cursor on PostgreSQL, so memory stays
+    bounded by the chunk size rather than the number of rows.
+    """
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield tuple(_export_value(value) for value in row)
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the value straight back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink that lets zipfile stream its output.
+
+    zipfile falls back to data descriptors when ``tell``/``seek`` are not
+    available, so each compressed block can be handed to the client as soon
+    as it is produced.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value: Any) -> str:
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    # Drop control characters that are not allowed in XML 1.0
+    text = ''.join(ch for ch in str(value) if ch in '\t\n\r' or ord(ch) >= 0x20)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values: Iterable[Any]) -> bytes:
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>').encode('utf-8')
+
+
+def stream_xlsx(rows: Iterable[tuple], flush_every: int = 500) -> Iterator[bytes]:
+    """Write a single-sheet XLSX workbook incrementally.
+
+    Cells use inline strings so no shared-string table has to be held in
+    memory; the worksheet is compressed and emitted every ``flush_every`` rows.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(header for header, _ in EXPORT_COLUMNS))
+            for index, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row))
+                if index % flush_every == 0:
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def export_response(queryset: QuerySet, file_format: str = 'csv', filename: Optional[str] = None) -> StreamingHttpResponse:
+    """Build a streaming download response for an attendance queryset."""
+    rows = iter_export_rows(queryset)
+    if file_format == 'xlsx':
+        content = stream_xlsx(rows)
+    else:
+        file_format = 'csv'
+        content = stream_csv(rows)
+
+    filename = filename or f"attendance-{timezone.localdate().isoformat()}.{file_format}"
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Columnar export: (column name, ORM lookup, arrow type name). Dimensions are
+# denormalized onto every row so analytics tools need no join.
+PARQUET_COLUMNS: List[Tuple[str, str, str]] = [
+    ('record_id', 'id', 'int64'),
+    ('timestamp', 'timestamp', 'timestamp'),
+    ('attendance_type', 'attendance_type', 'string'),
+    ('status', 'status', 'string'),
+    ('user_id', 'user_id', 'int64'),
+    ('short_id', 'user__short_id', 'string'),
+    ('department', 'user__department', 'string'),
+    ('office_location', 'user__office_location', 'string'),
+    ('position', 'user__position', 'string'),
+    ('face_verified', 'face_verified', 'bool'),
+    ('ear_verified', 'ear_verified', 'bool'),
+    ('face_confidence', 'face_confidence', 'float64'),
+    ('ear_confidence', 'ear_confidence', 'float64'),
+    ('verification_method', 'verification_method', 'string'),
+    ('location', 'location', 'string'),
+]
+
+PARQUET_MANIFEST = '_manifest.json'
+
+
+def parquet_schema():
+    """Arrow schema for the columnar attendance export."""
+    if pa is None:
+        raise RuntimeError('pyarrow is required for Parquet exports (pip install pyarrow)')
+    types = {
+        'int64': pa.int64(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'string': pa.string(),
+        'bool': pa.bool_(),
+        'float64': pa.float64(),
+    }
+    return pa.schema([(name, types[kind]) for name, _, kind in PARQUET_COLUMNS])
+
+
+class _MonthPartitionWriter:
+    """Parquet writer for one month partition, flushed one row group at a time."""
+
+    def __init__(self, output_dir: str, month: str, schema, row_group_size: int, compression: str):
+        self.month = month
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.relative_path = os.path.join(f'month={month}', f'attendance-{month}.parquet')
+        self.path = os.path.join(output_dir, self.relative_path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._writer = pq.ParquetWriter(self.path, schema, compression=compression)
+        self._columns: List[list] = [[] for _ in PARQUET_COLUMNS]
+        self.rows = 0
+        self.row_groups = 0
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.min_record_id = None
+        self.max_record_id = None
+
+    def append(self, row: tuple):
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        record_id, timestamp = row[0], row[1]
+        # Rows arrive ordered by (timestamp, id), so the first row holds the minima
+        if self.min_timestamp is None:
+            self.min_timestamp = timestamp
+        self.max_timestamp = timestamp
+        self.min_record_id = record_id if self.min_record_id is None else min(self.min_record_id, record_id)
+        self.max_record_id = record_id if self.max_record_id is None else max(self.max_record_id, record_id)
+        if len(self._columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self._columns[0]:
+            return
+        batch = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(self._columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_table(batch, row_group_size=self.row_group_size)
+        self.rows += batch.num_rows
+        self.row_groups += 1
+        self._columns = [[] for _ in PARQUET_COLUMNS]
+
+    def close(self) -> Dict[str, Any]:
+        self.flush()
+        self._writer.close()
+        return {
+            'month': self.month,
+            'path': self.relative_path,
+            'rows': self.rows,
+            'row_groups': self.row_groups,
+            'min_timestamp': self.min_timestamp.isoformat() if self.min_timestamp else None,
+            'max_timestamp': self.max_timestamp.isoformat() if self.max_timestamp else None,
+            'min_record_id': self.min_record_id,
+            'max_record_id': self.max_record_id,
+        }
+
+
+def export_parquet(
+    queryset: QuerySet,
+    output_dir: str,
+    row_group_size: Optional[int] = None,
+    compression: str = 'zstd',
+) -> Dict[str, Any]:
+    """Write attendance records as month-partitioned Parquet files.
+
+    Rows stream from a server-side cursor ordered by (timestamp, id), so at
+    most one row group is buffered at a time. Layout is Hive style
+    (``month=YYYY-MM/attendance-YYYY-MM.parquet``). Every row group carries
+    column min/max statistics, and ``_manifest.json`` records per-file
+    timestamp and id bounds so readers can prune whole partitions.
+    """
+    schema = parquet_schema()
+    row_group_size = row_group_size or getattr(settings, 'PARQUET_ROW_GROUP_SIZE', 64_000)
+    os.makedirs(output_dir, exist_ok=True)
+
+    lookups = [lookup for _, lookup, _ in PARQUET_COLUMNS]
+    rows = (
+        queryset.order_by('timestamp', 'id')
+        .values_list(*lookups)
+        .iterator(chunk_size=min(row_group_size, getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)))
+    )
+
+    files: List[Dict[str, Any]] = []
+    writer: Optional[_MonthPartitionWriter] = None
+    for row in rows:
+        month = timezone.localtime(row[1]).strftime('%Y-%m')
+        if writer is None or writer.month != month:
+            if writer is not None:
+                files.append(writer.close())
+            writer = _MonthPartitionWriter(output_dir, month, schema, row_group_size, compression)
+        writer.append(row)
+    if writer is not None:
+        files.append(writer.close())
+
+    manifest = {
+        'generated_at': timezone.now().isoformat(),
+        'partitioning': 'month',
+        'row_group_size': row_group_size,
+        'schema': [{'name': name, 'type': kind} for name, _, kind in PARQUET_COLUMNS],
+        'files': files,
+        'total_rows': sum(entry['rows'] for entry in files),
+    }
+    with open(os.path.join(output_dir, PARQUET_MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
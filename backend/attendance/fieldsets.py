@@ -0,0 +1,128 @@
+"""Sparse fieldsets for API responses.
+
+Clients can name the keys they want with ``?fields=a,b,c``. Some fields are
+heavy (biometric template vectors, raw probe and device blobs) and are left
+out of the default payload; ``?expand=x,y`` adds them back. Naming a heavy
+field in ``fields`` also includes it.
+
+The same selection drives the queryset: ``only_lookups`` lists the columns a
+selection needs, so the ORM fetches only those.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+
+
+def parse_list(value) -> Optional[Set[str]]:
+    """Comma-separated query value as a set; None when the parameter is absent."""
+    if value is None:
+        return None
+    return {part.strip() for part in str(value).split(',') if part.strip()}
+
+
+def requested(request) -> Tuple[Optional[Set[str]], Set[str]]:
+    """``(fields, expand)`` from a request's query string."""
+    params = getattr(request, 'query_params', None) or getattr(request, 'GET', None) or {}
+    return parse_list(params.get('fields')), parse_list(params.get('expand')) or set()
+
+
+def select_fields(names: Sequence[str], fields: Optional[Iterable[str]] = None,
+                  expand: Optional[Iterable[str]] = None, expandable: Iterable[str] = ()) -> List[str]:
+    """Keep ``names`` (in order) that the client asked for.
+
+    Without ``fields`` everything except ``expandable`` is kept; ``expand``
+    adds expandable names back. Unknown names are ignored.
+    """
+    expand = set(expand or ())
+    if fields is not None:
+        wanted = set(fields)
+        return [name for name in names if name in wanted]
+    hidden = set(expandable) - expand
+    return [name for name in names if name not in hidden]
+
+
+def only_lookups(model, sources: Iterable[str]) -> List[str]:
+    """Arguments for ``QuerySet.only()`` covering ``sources``.
+
+    Sources are serializer-style dotted paths (``user.full_name``). Columns of
+    related models are kept as ``user__full_name`` and need a matching
+    ``select_related``; many-to-many and reverse relations are skipped since
+    they are prefetched, not selected.
+    """
+    lookups = ['pk']
+    for source in sources:
+        parts = source.split('.')
+        try:
+            field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            continue
+        if field.many_to_many or field.one_to_many or not field.concrete:
+            continue
+        lookup = '__'.join(parts)
+        if lookup not in lookups:
+            lookups.append(lookup)
+    return lookups
+
+
+def related_paths(lookups: Iterable[str]) -> List[str]:
+    """``select_related`` paths for the related columns in ``lookups``."""
+    paths: List[str] = []
+    for lookup in lookups:
+        if '__' in lookup:
+            path = lookup.rsplit('__', 1)[0]
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin honouring ``fields``/``expand``.
+
+    They come from the ``fields=``/``expand=`` keyword arguments, else from
+    the request in the serializer context (for serializers built without
+    ``data``). ``Meta.expandable_fields`` lists the fields left out by
+    default and ``Meta.field_sources`` the model fields read by each
+    ``SerializerMethodField``.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if hasattr(self, 'initial_data') and fields is None and expand is None:
+            # Input keeps every writable field; selection applies to output only
+            return
+        if fields is None and expand is None:
+            fields, expand = requested(self.context.get('request'))
+        keep = set(select_fields(
+            list(self.fields), fields, expand, getattr(self.Meta, 'expandable_fields', ()),
+        ))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    def source_paths(self) -> List[str]:
+        """Model paths read to render the selected fields."""
+        extra: Dict[str, Sequence[str]] = getattr(self.Meta, 'field_sources', {})
+        sources: List[str] = []
+        for name, field in self.fields.items():
+            if name in extra:
+                sources.extend(extra[name])
+            elif field.source != '*':
+                sources.append(field.source)
+        return sources
+
+    def only_queryset(self, queryset, extra: Iterable[str] = ()):
+        """``queryset`` restricted to the columns the selected fields read.
+
+        ``extra`` names further paths to load, e.g. a paginator's ordering.
+        """
+        lookups = only_lookups(queryset.model, [*self.source_paths(), *extra])
+        paths = related_paths(lookups)
+        for path in paths:
+            # only() needs the foreign key itself for select_related
+            if path not in lookups:
+                lookups.append(path)
+        if paths:
+            queryset = queryset.select_related(*paths)
+        return queryset.only(*lookups)
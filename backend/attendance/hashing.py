@@ -0,0 +1,175 @@
+"""Password hashing off the request thread, with bounded concurrency.
+
+A login costs one slow key-derivation (PBKDF2 by default). When every
+member of staff signs in within the same few minutes, running that on the
+gunicorn workers' own threads starves attendance marks of CPU. Logins hand
+the work to a small per-process pool instead:
+
+* ``LOGIN_HASH_WORKERS`` processes do the hashing, reniced by
+  ``LOGIN_HASH_NICE`` so the OS favours request handling over login work.
+  They are spawned rather than forked: the gunicorn worker already runs
+  daemon threads (audit writer, write-behind, cache bus) whose locks a fork
+  would copy mid-use;
+* at most ``LOGIN_HASH_QUEUE`` logins per worker process wait for the pool;
+  past that a login waits up to ``LOGIN_HASH_QUEUE_TIMEOUT`` seconds for a
+  slot and then gets a 503 with ``Retry-After``;
+* queue wait and hashing time are recorded in ``metrics``.
+
+A login waiting for the pool still holds its request thread. gunicorn runs
+``gthread`` workers (see render.yaml), and ``LOGIN_HASH_QUEUE`` is kept below
+the thread count so a burst of logins cannot take every thread from marks.
+
+With ``LOGIN_HASH_WORKERS = 0`` hashing runs inline (tests, management
+commands).
+
+Hashes made with an older algorithm or cost are replaced after a successful
+login; ``PASSWORD_HASH_ALGORITHM`` and ``PASSWORD_HASH_ITERATIONS`` pick the
+target.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher as BasePBKDF2PasswordHasher
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+
+queue_time = metrics.Timer('login.queue', 'Time logins waited for a hashing slot and worker')
+hash_time = metrics.Timer('login.hash', 'Time spent hashing in the pool')
+busy = metrics.Counter('login.busy', 'Logins turned away because the hashing queue was full')
+rehashed = metrics.Counter('login.rehashed', 'Stored hashes upgraded to the current algorithm or cost')
+
+
+class PBKDF2PasswordHasher(BasePBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count taken from settings."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or BasePBKDF2PasswordHasher.iterations
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, please retry shortly.'
+    default_code = 'login_busy'
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.wait = retry_after
+
+
+# Functions run in the pool --------------------------------------------------
+
+def _init_worker(nice: int) -> None:
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gov_biometric.settings')
+        django.setup()
+    if nice:
+        try:
+            os.nice(nice)
+        except OSError:  # pragma: no cover - not permitted on this platform
+            pass
+
+
+def _verify(password: str, encoded: str, submitted: float) -> Tuple[bool, Optional[str], float, float]:
+    """(valid, new hash if it should be upgraded, queue seconds, hash seconds)"""
+    started = time.time()
+    valid, must_update = verify_password(password, encoded)
+    new_encoded = make_password(password) if valid and must_update else None
+    return valid, new_encoded, max(started - submitted, 0.0), time.time() - started
+
+
+def _make(password: str, submitted: float) -> Tuple[str, float, float]:
+    started = time.time()
+    encoded = make_password(password)
+    return encoded, max(started - submitted, 0.0), time.time() - started
+
+
+# Pool -----------------------------------------------------------------------
+
+class HashingPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._slots = None
+
+    @staticmethod
+    def workers() -> int:
+        return int(getattr(settings, 'LOGIN_HASH_WORKERS', 2))
+
+    def _ensure(self):
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers(),
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(int(getattr(settings, 'LOGIN_HASH_NICE', 5)),),
+                    )
+                    self._slots = threading.BoundedSemaphore(
+                        int(getattr(settings, 'LOGIN_HASH_QUEUE', 4))
+                    )
+                    self._pid = pid
+        return self._executor, self._slots
+
+    def run(self, func, *args):
+        if self.workers() <= 0:
+            return func(*args, time.time())
+
+        submitted = time.time()
+        executor, slots = self._ensure()
+        timeout = float(getattr(settings, 'LOGIN_HASH_QUEUE_TIMEOUT', 1))
+        if not slots.acquire(timeout=timeout):
+            busy.incr()
+            raise LoginBusy(retry_after=max(int(timeout), 1))
+        try:
+            try:
+                return executor.submit(func, *args, submitted).result()
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool and try once more
+                with self._lock:
+                    self._executor = None
+                executor, _ = self._ensure()
+                return executor.submit(func, *args, submitted).result()
+        finally:
+            slots.release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pool = HashingPool()
+
+
+def verify(password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+    """Check ``password``; the second value is an upgraded hash to store, if any."""
+    valid, new_encoded, queued, hashed = pool.run(_verify, password, encoded)
+    queue_time.observe(queued)
+    hash_time.observe(hashed)
+    return valid, new_encoded
+
+
+def hash_password(password: str) -> str:
+    encoded, queued, hashed = pool.run(_make, password)
+    queue_time.observe(queued)
+    hash_time.observe(hashed)
+    return encoded
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import archive
+
+
+class Command(BaseCommand):
+    help = 'Archive old attendance records and verification sessions to compressed segment files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None, help='Attendance retention window in days')
+        parser.add_argument('--session-days', type=int, default=None, help='Verification session retention window in days')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows deleted per transaction')
+        parser.add_argument('--segment-rows', type=int, default=None, help='Rows per archive segment file')
+        parser.add_argument(
+            '--rehydrate', nargs=2, metavar=('START_DATE', 'END_DATE'),
+            help='Restore archived rows for a date range (YYYY-MM-DD YYYY-MM-DD) instead of archiving'
+        )
+        parser.add_argument(
+            '--kind', choices=sorted(archive.ARCHIVED_MODELS), default='attendance_record',
+            help='Archive to rehydrate from'
+        )
+
+    def handle(self, *args, **options):
+        if options['rehydrate']:
+            try:
+                start_date, end_date = (datetime.strptime(value, '%Y-%m-%d').date() for value in options['rehydrate'])
+            except ValueError:
+                raise CommandError('Dates must be in YYYY-MM-DD format')
+            try:
+                restored = archive.rehydrate(options['kind'], start_date, end_date, batch_size=options['batch_size'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} {options["kind"]} rows'))
+            return
+
+        results = archive.archive_old_data(
+            retention_days=options['older_than_days'],
+            session_retention_days=options['session_days'],
+            batch_size=options['batch_size'],
+            segment_rows=options['segment_rows'],
+        )
+        for kind, totals in results.items():
+            self.stdout.write(
+                f"{kind}: archived {totals['archived']} rows in {totals['segments']} segments, "
+                f"deleted {totals['deleted']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Archive written to {archive.archive_root()}'))
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Manage monthly partitions of the attendance table (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='Rebuild the existing attendance table as a partitioned table (locks the table while copying)'
+        )
+        parser.add_argument(
+            '--months-ahead', type=int,
+            default=getattr(settings, 'ATTENDANCE_PARTITION_MONTHS_AHEAD', 3),
+            help='Number of future months to pre-create partitions for'
+        )
+
+    def handle(self, *args, **options):
+        months_ahead = options['months_ahead']
+
+        if not partitioning.is_supported():
+            self.stdout.write(
+                self.style.WARNING('Partitioning needs PostgreSQL 11+; keeping the unpartitioned table')
+            )
+            return
+
+        if options['convert']:
+            try:
+                copied = partitioning.convert_to_partitioned(months_ahead=months_ahead, log=self.stdout.write)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Converted {partitioning.TABLE} into {len(copied)} monthly partitions '
+                    f'({sum(copied.values())} rows copied)'
+                )
+            )
+            return
+
+        if not partitioning.is_partitioned():
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{partitioning.TABLE} is not partitioned; run with --convert to migrate existing data'
+                )
+            )
+            return
+
+        created = partitioning.ensure_partitions(months_ahead=months_ahead)
+        for name in created:
+            self.stdout.write(f'Created partition {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partitions created; coverage is {months_ahead} months ahead'))
@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from attendance.archive import insert_raw
+from attendance.models import AttendanceRecord, User
+from attendance.projections import ATTENDANCE_RECORD
+from attendance.renderers import ORJSONRenderer, orjson
+from attendance.serializers import AttendanceRecordSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer + JSONRenderer with the projection + orjson read path on synthetic rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help='Row counts to time')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+        parser.add_argument('--users', type=int, default=100, help='Synthetic users the rows are spread over')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; the fast path uses the stock renderer'))
+
+        # Everything runs in a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                self._seed(max(options['rows']), options['users'])
+                self.stdout.write(f"{'rows':>8} {'serializer':>12} {'fast path':>12} {'speedup':>8}")
+                for count in sorted(options['rows']):
+                    records = AttendanceRecord.objects.filter(notes='benchmark').order_by('-timestamp', '-id')[:count]
+                    slow = self._best(options['repeat'], lambda: JSONRenderer().render(
+                        AttendanceRecordSerializer(records.select_related('user'), many=True).data
+                    ))
+                    fast = self._best(options['repeat'], lambda: ORJSONRenderer().render(
+                        ATTENDANCE_RECORD.rows(records)
+                    ))
+                    self.stdout.write(f'{count:>8} {slow * 1000:>10.1f}ms {fast * 1000:>10.1f}ms {slow / fast:>7.1f}x')
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('Benchmark data rolled back'))
+
+    def _seed(self, rows, user_count):
+        users = [
+            User.objects.create(
+                username=f'bench{i}@example.invalid', full_name=f'Benchmark {i}',
+                short_id=f'BENCH{i:05d}', nin=f'BENCH{i:09d}',
+            )
+            for i in range(user_count)
+        ]
+        start = timezone.now() - timedelta(seconds=rows)
+        batch = []
+        for i in range(rows):
+            moment = start + timedelta(seconds=i)
+            batch.append(AttendanceRecord(
+                user=users[i % user_count], timestamp=moment, created_at=moment, updated_at=moment,
+                attendance_type='check_in', status='present', face_verified=True, face_confidence=0.93,
+                biometric_data={'face': {'distance': 0.31}}, location='HQ',
+                device_info={'agent': 'benchmark'}, notes='benchmark',
+            ))
+            if len(batch) >= 5000:
+                insert_raw(AttendanceRecord, batch)
+                batch = []
+        if batch:
+            insert_raw(AttendanceRecord, batch)
+
+    @staticmethod
+    def _best(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
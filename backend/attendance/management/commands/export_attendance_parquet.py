@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.exports import export_parquet, filter_export_queryset
+from attendance.models import AttendanceRecord
+
+
+class Command(BaseCommand):
+    help = 'Export attendance records as month-partitioned Parquet files for analytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', type=str, help='Directory to write the partitioned dataset into')
+        parser.add_argument('--start-date', type=str, help='First day to export (YYYY-MM-DD)')
+        parser.add_argument('--end-date', type=str, help='Last day to export (YYYY-MM-DD)')
+        parser.add_argument('--department', type=str, help='Only export this department')
+        parser.add_argument('--row-group-size', type=int, default=None, help='Rows per Parquet row group')
+        parser.add_argument('--compression', type=str, default='zstd', help='Parquet compression codec')
+
+    def handle(self, *args, **options):
+        for key in ('start_date', 'end_date'):
+            if options[key]:
+                try:
+                    datetime.strptime(options[key], '%Y-%m-%d')
+                except ValueError:
+                    raise CommandError(f'Invalid {key.replace("_", " ")}: {options[key]}')
+
+        records = filter_export_queryset(AttendanceRecord.objects.all(), {
+            'start_date': options['start_date'],
+            'end_date': options['end_date'],
+            'department': options['department'],
+        })
+
+        try:
+            manifest = export_parquet(
+                records,
+                options['output_dir'],
+                row_group_size=options['row_group_size'],
+                compression=options['compression'],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        for entry in manifest['files']:
+            self.stdout.write(f"{entry['path']}: {entry['rows']} rows in {entry['row_groups']} row groups")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {manifest['total_rows']} records into {len(manifest['files'])} monthly partitions"
+            )
+        )
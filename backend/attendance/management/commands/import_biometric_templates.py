@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.audit import writer as audit
+from attendance.enrollment import (
+    MATCH_FIELDS, MODALITIES, import_templates, npz_members, open_templates, read_ids, read_npz_ids,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Store enrolled face/ear templates from .npy, .npz or raw float32 files, matched to users by NIN or short ID. '
+        'An .npz holds arrays named after the modalities (face, ear, ear_left, ear_right) and, unless --ids is given, '
+        'an array of identifiers named after --match.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Template file (.npy, .npz, or raw little-endian float32)')
+        parser.add_argument('--ids', help='Text/CSV file with one identifier per template row')
+        parser.add_argument('--match', choices=MATCH_FIELDS, default='nin', help='User field the identifiers hold')
+        parser.add_argument('--modality', choices=list(MODALITIES), default='face',
+                            help='What a .npy or raw file holds')
+        parser.add_argument('--dim', type=int, help='Vector length of a raw float32 file')
+        parser.add_argument('--replace', action='store_true', help='Overwrite templates users already have')
+        parser.add_argument('--dry-run', action='store_true', help='Match and check without writing')
+        parser.add_argument('--block-size', type=int, default=None, help='Rows normalised and written at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.monotonic()
+        try:
+            if path.lower().endswith('.npz'):
+                members = npz_members(path)
+                templates = {name: open_templates(path, member=name) for name in members if name in MODALITIES}
+                if options['ids']:
+                    ids = read_ids(options['ids'])
+                elif options['match'] in members:
+                    ids = read_npz_ids(path, options['match'])
+                else:
+                    raise CommandError(f"{path} has no '{options['match']}' array; pass --ids")
+            else:
+                if not options['ids']:
+                    raise CommandError('--ids is required for .npy and raw template files')
+                templates = {options['modality']: open_templates(path, dim=options['dim'])}
+                ids = read_ids(options['ids'])
+
+            result = import_templates(
+                ids, templates,
+                match=options['match'],
+                replace=options['replace'],
+                dry_run=options['dry_run'],
+                block_size=options['block_size'],
+                log=self.stdout.write,
+            )
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(str(e))
+        if not result['dry_run']:
+            audit.record('Biometric Template Import', 'system', resource_type='biometric', resource_name=path,
+                         details={key: result[key] for key in ('rows', 'updated', 'unknown', 'invalid', 'skipped')})
+            audit.drain()
+
+        for label, key in (('Unknown ids', 'unknown_ids'), ('Rows not normalisable', 'invalid_rows'),
+                           ('Already enrolled', 'skipped_ids')):
+            if result[key]:
+                self.stdout.write(self.style.WARNING(f"{label}: {', '.join(map(str, result[key][:20]))}"))
+        verb = 'Would update' if result['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['updated']} of {result['rows']} users ({result['unknown']} unknown, "
+            f"{result['invalid']} invalid, {result['skipped']} already enrolled) in {time.monotonic() - started:.1f}s"
+        ))
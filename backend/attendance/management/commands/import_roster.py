@@ -0,0 +1,63 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.audit import writer as audit
+from attendance.roster import ROSTER_FORMATS, import_roster, read_roster, roster_format
+
+
+class Command(BaseCommand):
+    help = 'Create staff accounts from a CSV or XLSX roster (username, password, full_name, short_id, nin, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Roster file')
+        parser.add_argument('--format', choices=ROSTER_FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--default-password', help='Initial password for rows without one')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without creating anyone')
+        parser.add_argument('--batch-size', type=int, default=None, help='Users inserted per bulk_create')
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes')
+        parser.add_argument('--errors', help='Write every row error to this CSV file')
+        parser.add_argument('--show-errors', type=int, default=20, help='Row errors printed to the console')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or roster_format(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot tell the roster format from the file name; pass --format')
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as roster:
+                result = import_roster(
+                    read_roster(roster, file_format),
+                    default_password=options['default_password'],
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size'],
+                    workers=options['workers'],
+                    log=self.stdout.write,
+                )
+        except (OSError, RuntimeError, ValueError) as e:
+            raise CommandError(str(e))
+        if not result['dry_run']:
+            audit.record('Roster Import', 'system', resource_type='user', resource_name=options['path'],
+                         status='success' if not result['failed'] else 'warning',
+                         details={key: result[key] for key in ('rows', 'created', 'failed')})
+            audit.drain()
+
+        for error in result['errors'][:options['show_errors']]:
+            self.stdout.write(self.style.WARNING(
+                f"Row {error['row']} ({error['username'] or 'no username'}): {'; '.join(error['errors'])}"
+            ))
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as report:
+                writer = csv.writer(report)
+                writer.writerow(['row', 'username', 'errors'])
+                for error in result['errors']:
+                    writer.writerow([error['row'], error['username'], '; '.join(error['errors'])])
+
+        verb = 'Would create' if result['dry_run'] else 'Created'
+        count = result['valid'] if result['dry_run'] else result['created']
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {count} of {result['rows']} users ({result['failed']} rows with errors) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.absentees import materialize_absentees
+from attendance.models import Department
+
+
+class Command(BaseCommand):
+    help = 'Write absent and on-leave attendance rows for a closed working day (fallback for the Celery beat job)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to process (YYYY-MM-DD); defaults to the latest closed workday')
+        parser.add_argument('--department', action='append', help='Department id or name; repeat for several')
+        parser.add_argument('--force', action='store_true', help='Re-run departments already recorded for the day')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows inserted per transaction')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Date must be in YYYY-MM-DD format')
+
+        department_ids = None
+        if options['department']:
+            department_ids = []
+            for value in options['department']:
+                lookup = {'id': int(value)} if value.isdigit() else {'name__iexact': value}
+                department = Department.objects.filter(**lookup).first()
+                if department is None:
+                    raise CommandError(f'Unknown department: {value}')
+                department_ids.append(department.id)
+
+        totals = materialize_absentees(
+            day=day,
+            department_ids=department_ids,
+            force=options['force'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {totals['absent']} absent and {totals['on_leave']} on leave across "
+            f"{totals['departments']} departments ({totals['skipped']} already done)"
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance.reports import run_queued_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued admin report jobs (local worker when Celery is not in use)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the current queue and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between queue polls')
+
+    def handle(self, *args, **options):
+        while True:
+            ran = run_queued_jobs()
+            if ran:
+                self.stdout.write(f'Ran {ran} report jobs')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Report queue drained'))
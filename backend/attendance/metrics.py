@@ -0,0 +1,160 @@
+"""Lightweight operational metrics kept in the shared cache.
+
+Counters, timers and hit ratios are declared at import time by the modules that record
+them and aggregated in the Django cache, so with Redis the numbers cover
+every worker process (with the local-memory cache, just the current one).
+``snapshot()`` backs the admin metrics endpoint.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, List
+
+from django.core.cache import cache
+
+from . import counters
+
+PREFIX = 'attendance:metrics:'
+
+REGISTRY: Dict[str, 'Metric'] = {}
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, description: str = ''):
+        self.name = name
+        self.description = description
+        REGISTRY[name] = self
+
+    def key(self, part: str) -> str:
+        return f'{PREFIX}{self.name}:{part}'
+
+    def keys(self) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        cache.delete_many(self.keys())
+
+    def flush(self) -> None:
+        """Push anything recorded locally to the cache."""
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def incr(self, delta: int = 1) -> None:
+        counters.incr(self.key('count'), delta)
+
+    def keys(self):
+        return [self.key('count')]
+
+    def read(self, values) -> Dict[str, object]:
+        return {'count': values.get(self.key('count'), 0)}
+
+
+class Timer(Metric):
+    """Count, total and maximum of observed durations."""
+    kind = 'timer'
+
+    def observe(self, seconds: float) -> None:
+        micros = max(int(seconds * 1_000_000), 0)
+        counters.incr(self.key('count'), 1)
+        counters.incr(self.key('total_us'), micros)
+        # Racy but monotonic enough for a high-water mark
+        if micros > (cache.get(self.key('max_us')) or 0):
+            cache.set(self.key('max_us'), micros, timeout=None)
+
+    def keys(self):
+        return [self.key('count'), self.key('total_us'), self.key('max_us')]
+
+    def read(self, values) -> Dict[str, object]:
+        count = values.get(self.key('count'), 0)
+        total = values.get(self.key('total_us'), 0)
+        return {
+            'count': count,
+            'total_ms': round(total / 1000, 3),
+            'avg_ms': round(total / count / 1000, 3) if count else 0,
+            'max_ms': round(values.get(self.key('max_us'), 0) / 1000, 3),
+        }
+
+
+class HitRatio(Metric):
+    """Hits and misses of a cache, and the resulting hit ratio.
+
+    Recorded on paths that exist to avoid a round trip, so counts are kept
+    per process and added to the shared totals at most once a
+    ``FLUSH_INTERVAL`` (or ``FLUSH_EVENTS`` lookups).
+    """
+    kind = 'ratio'
+    FLUSH_INTERVAL = 5.0
+    FLUSH_EVENTS = 1000
+
+    def __init__(self, name: str, description: str = ''):
+        super().__init__(name, description)
+        self._lock = threading.Lock()
+        self._pending = [0, 0]
+        self._flushed = time.monotonic()
+        self._pid = os.getpid()
+
+    def hit(self) -> None:
+        self._record(0)
+
+    def miss(self) -> None:
+        self._record(1)
+
+    def _record(self, index: int) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the parent's pending counts are the parent's to flush
+                self._pending, self._pid = [0, 0], os.getpid()
+            self._pending[index] += 1
+            due = (sum(self._pending) >= self.FLUSH_EVENTS
+                   or time.monotonic() - self._flushed >= self.FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            (hits, misses), self._pending = self._pending, [0, 0]
+            self._flushed = time.monotonic()
+        if hits:
+            counters.incr(self.key('hits'), hits)
+        if misses:
+            counters.incr(self.key('misses'), misses)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending = [0, 0]
+        super().reset()
+
+    def keys(self):
+        return [self.key('hits'), self.key('misses')]
+
+    def read(self, values) -> Dict[str, object]:
+        hits = values.get(self.key('hits'), 0)
+        misses = values.get(self.key('misses'), 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    """Current value of every registered metric."""
+    for metric in REGISTRY.values():
+        metric.flush()
+    keys = [key for metric in REGISTRY.values() for key in metric.keys()]
+    values = cache.get_many(keys)
+    return {
+        name: {'type': metric.kind, 'description': metric.description, **metric.read(values)}
+        for name, metric in sorted(REGISTRY.items())
+    }
+
+
+def reset() -> None:
+    for metric in REGISTRY.values():
+        metric.reset()
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_alter_attendancerecord_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['timestamp', 'attendance_type'], name='att_ts_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['user', '-timestamp'], name='att_user_ts_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(condition=models.Q(('attendance_type', 'check_in')), fields=['timestamp', 'user'], name='att_checkin_ts_user_idx'),
+        ),
+    ]
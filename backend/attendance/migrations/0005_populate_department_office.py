@@ -0,0 +1,59 @@
+from collections import Counter, defaultdict
+
+from django.db import migrations
+
+
+def _normalize(value):
+    if not value:
+        return None
+    return ' '.join(str(value).split()) or None
+
+
+def _populate(apps, text_field, ref_field, model_name):
+    User = apps.get_model('attendance', 'User')
+    Dimension = apps.get_model('attendance', model_name)
+
+    # Group spelling variants ("IT", " it ") under one key; the most common
+    # spelling becomes the canonical name.
+    variants = defaultdict(Counter)
+    for value in User.objects.exclude(**{f'{text_field}__isnull': True}).values_list(text_field, flat=True):
+        name = _normalize(value)
+        if name:
+            variants[name.lower()][name] += 1
+
+    rows = {}
+    for key, spellings in variants.items():
+        canonical = spellings.most_common(1)[0][0]
+        rows[key], _ = Dimension.objects.get_or_create(name=canonical)
+
+    users = list(User.objects.only('id', text_field, 'role', 'employment_status'))
+    for user in users:
+        name = _normalize(getattr(user, text_field))
+        row = rows.get(name.lower()) if name else None
+        setattr(user, text_field, row.name if row else None)
+        setattr(user, f'{ref_field}_id', row.id if row else None)
+    User.objects.bulk_update(users, [text_field, ref_field], batch_size=500)
+
+    headcounts = Counter(
+        getattr(user, f'{ref_field}_id') for user in users
+        if user.role == 'user' and user.employment_status == 'active'
+    )
+    for row in rows.values():
+        row.headcount = headcounts.get(row.id, 0)
+        row.save(update_fields=['headcount'])
+
+
+def populate_dimensions(apps, schema_editor):
+    _populate(apps, 'department', 'department_ref', 'Department')
+    _populate(apps, 'office_location', 'office_ref', 'Office')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_department_office'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_leave_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenteeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('scope', models.CharField(max_length=50)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('leave_count', models.PositiveIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day', 'scope'],
+                'unique_together': {('day', 'scope')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_report_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemSetting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=50)),
+                ('name', models.CharField(max_length=100)),
+                ('value', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='system_settings_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['section', 'name'],
+                'unique_together': {('section', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_system_setting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('username', models.CharField(blank=True, max_length=150)),
+                ('role', models.CharField(blank=True, max_length=20)),
+                ('action', models.CharField(max_length=100)),
+                ('action_type', models.CharField(choices=[('login', 'Login'), ('logout', 'Logout'), ('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('view', 'View'), ('export', 'Export'), ('system', 'System')], max_length=20)),
+                ('resource_type', models.CharField(blank=True, max_length=50)),
+                ('resource_id', models.CharField(blank=True, max_length=100)),
+                ('resource_name', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failure', 'Failure'), ('warning', 'Warning')], default='success', max_length=20)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('details', models.JSONField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='audit_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['action_type', 'timestamp'], name='audit_type_ts_idx'), models.Index(fields=['user', 'timestamp'], name='audit_user_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:38
+
+from collections import defaultdict
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def _merge(apps, model_name, text_field, ref_field):
+    User = apps.get_model('attendance', 'User')
+    Dimension = apps.get_model('attendance', model_name)
+
+    # Rows whose names differ only in case (created concurrently before this
+    # constraint) are merged into the oldest one
+    groups = defaultdict(list)
+    for row in Dimension.objects.order_by('id'):
+        groups[row.name.lower()].append(row)
+    for kept, *duplicates in groups.values():
+        if not duplicates:
+            continue
+        ids = [row.id for row in duplicates]
+        User.objects.filter(**{f'{ref_field}_id__in': ids}).update(**{ref_field: kept, text_field: kept.name})
+        kept.headcount += sum(row.headcount for row in duplicates)
+        kept.save(update_fields=['headcount'])
+        Dimension.objects.filter(id__in=ids).delete()
+
+
+def merge_case_duplicates(apps, schema_editor):
+    _merge(apps, 'Department', 'department', 'department_ref')
+    _merge(apps, 'Office', 'office_location', 'office_ref')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_audit_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='department',
+            name='name',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='office',
+            name='name',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='department',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='department_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='office',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='office_name_ci_unique'),
+        ),
+    ]
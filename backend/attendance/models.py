@@ -1,8 +1,101 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 import json
 
+from .conditional import bump_data_version
+from .principals import invalidate_principal
+from .workforce import bump_workforce_version
+
+def normalize_dimension_name(value):
+    """Collapse whitespace in a free-text department/office name; '' becomes None"""
+    if not value:
+        return None
+    name = ' '.join(str(value).split())
+    return name or None
+
+class DimensionQuerySet(models.QuerySet):
+    def resolve(self, name):
+        """Return the row for a free-text name (case-insensitive), creating it if needed"""
+        name = normalize_dimension_name(name)
+        if not name:
+            return None
+        existing = self.filter(name__iexact=name).first()
+        if existing:
+            return existing
+        try:
+            with transaction.atomic():
+                return self.create(name=name)
+        except IntegrityError:
+            # Created by a concurrent request between the lookup and the insert
+            return self.model._default_manager.get(name__iexact=name)
+
+class Department(models.Model):
+    # Unique ignoring case (Meta), matching how resolve() looks names up
+    name = models.CharField(max_length=100)
+    # Active staff count, refreshed by refresh_headcounts()
+    headcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DimensionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='department_name_ci_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def refresh_headcounts(cls):
+        """Recompute cached active headcounts with one GROUP BY"""
+        refresh_dimension_headcounts(cls, 'department_ref')
+
+class Office(models.Model):
+    # Unique ignoring case (Meta), matching how resolve() looks names up
+    name = models.CharField(max_length=100)
+    # Active staff count, refreshed by refresh_headcounts()
+    headcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DimensionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='office_name_ci_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def refresh_headcounts(cls):
+        """Recompute cached active headcounts with one GROUP BY"""
+        refresh_dimension_headcounts(cls, 'office_ref')
+
+def refresh_dimension_headcounts(model, user_field):
+    counts = dict(
+        User.objects.filter(role='user', employment_status='active', **{f'{user_field}__isnull': False})
+        .values_list(user_field)
+        .annotate(total=models.Count('id'))
+        .order_by()
+    )
+    rows = list(model.objects.all())
+    changed = []
+    for row in rows:
+        headcount = counts.get(row.id, 0)
+        if row.headcount != headcount:
+            row.headcount = headcount
+            changed.append(row)
+    if changed:
+        model.objects.bulk_update(changed, ['headcount'])
+
 class User(AbstractUser):
     full_name = models.CharField(max_length=255)
     short_id = models.CharField(max_length=20, unique=True)
@@ -14,6 +107,13 @@ class User(AbstractUser):
     department = models.CharField(max_length=100, blank=True, null=True)
     position = models.CharField(max_length=100, blank=True, null=True)
     office_location = models.CharField(max_length=100, blank=True, null=True)
+    # Integer dimension keys kept in sync with the free-text fields above
+    department_ref = models.ForeignKey(
+        Department, on_delete=models.SET_NULL, blank=True, null=True, related_name='members'
+    )
+    office_ref = models.ForeignKey(
+        Office, on_delete=models.SET_NULL, blank=True, null=True, related_name='members'
+    )
     staff_id = models.CharField(max_length=50, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
     gender = models.CharField(max_length=10, blank=True, null=True)
@@ -56,6 +156,66 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.full_name} ({self.short_id})"
 
+    # Fields that feed department/office rows and their cached headcounts
+    DIMENSION_FIELDS = ('department', 'office_location', 'role', 'employment_status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_dimensions = instance._dimension_state()
+        instance._loaded_supervisor = instance.__dict__.get('supervisor_id')
+        return instance
+
+    def _dimension_state(self):
+        return tuple(self.__dict__.get(name) for name in self.DIMENSION_FIELDS)
+
+    def sync_dimensions(self):
+        """Point department_ref/office_ref at the rows for the free-text names"""
+        department = Department.objects.resolve(self.department)
+        office = Office.objects.resolve(self.office_location)
+        self.department_ref = department
+        self.office_ref = office
+        self.department = department.name if department else None
+        self.office_location = office.name if office else None
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {*self.DIMENSION_FIELDS, 'supervisor'} & set(update_fields):
+            super().save(*args, **kwargs)
+            bump_data_version([self.pk])
+            invalidate_principal(self.pk)
+            return
+
+        previous = getattr(self, '_loaded_dimensions', None)
+        previous_supervisor = getattr(self, '_loaded_supervisor', None)
+        if previous is None or self._dimension_state()[:2] != previous[:2]:
+            self.sync_dimensions()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'department', 'office_location', 'department_ref', 'office_ref'}
+        super().save(*args, **kwargs)
+
+        dimensions_changed = self._dimension_state() != previous
+        if dimensions_changed:
+            Department.refresh_headcounts()
+            Office.refresh_headcounts()
+        if dimensions_changed or self.supervisor_id != previous_supervisor:
+            bump_workforce_version()
+        bump_data_version([self.pk])
+        invalidate_principal(self.pk)
+        self._loaded_dimensions = self._dimension_state()
+        self._loaded_supervisor = self.supervisor_id
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        Department.refresh_headcounts()
+        Office.refresh_headcounts()
+        bump_workforce_version()
+        bump_data_version([user_id])
+        invalidate_principal(user_id)
+        return result
+
     def get_biometric_status(self):
         """Get current biometric verification status"""
         if self.face_biometric_data and self.ear_biometric_data:
@@ -71,6 +231,11 @@ class User(AbstractUser):
         self.biometric_verification_status = self.get_biometric_status()
         self.save()
 
+class AttendanceRecordQuerySet(models.QuerySet):
+    def present_check_ins(self):
+        """Check-ins of people who turned up (not materialized absent/on_leave rows)"""
+        return self.filter(attendance_type='check_in', status__in=AttendanceRecord.PRESENT_STATUSES)
+
 class AttendanceRecord(models.Model):
     ATTENDANCE_TYPES = [
         ('check_in', 'Check In'),
@@ -86,6 +251,10 @@ class AttendanceRecord(models.Model):
         ('half_day', 'Half Day'),
         ('on_leave', 'On Leave'),
     ]
+    # Statuses that mean the employee actually turned up
+    PRESENT_STATUSES = ('present', 'late', 'half_day')
+    # Written by the absentee job rather than marked by the user
+    MATERIALIZED_STATUSES = ('absent', 'on_leave')
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_records')
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -119,13 +288,36 @@ class AttendanceRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AttendanceRecordQuerySet.as_manager()
+
     class Meta:
         ordering = ['-timestamp']
         unique_together = ['user', 'timestamp', 'attendance_type']
+        indexes = [
+            # Day/range filters by type (dashboard, reports, trends)
+            models.Index(fields=['timestamp', 'attendance_type'], name='att_ts_type_idx'),
+            # Per-user history, newest first (today/weekly/monthly, profile)
+            models.Index(fields=['user', '-timestamp'], name='att_user_ts_desc_idx'),
+            # Distinct check-ins per day
+            models.Index(
+                fields=['timestamp', 'user'],
+                name='att_checkin_ts_user_idx',
+                condition=models.Q(attendance_type='check_in'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.full_name} - {self.attendance_type} at {self.timestamp}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_data_version([self.user_id])
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_data_version([self.user_id])
+        return result
+
     def get_verification_status(self):
         """Get verification status for this attendance record"""
         if self.face_verified and self.ear_verified:
@@ -165,3 +357,183 @@ class BiometricVerificationSession(models.Model):
         """Check if session is expired (30 minutes)"""
         from django.utils import timezone
         return (timezone.now() - self.created_at).total_seconds() > 1800
+
+class LeavePeriod(models.Model):
+    """Leave granted to an employee over an inclusive range of days"""
+    LEAVE_TYPES = [
+        ('annual', 'Annual Leave'),
+        ('sick', 'Sick Leave'),
+        ('maternity', 'Maternity/Paternity Leave'),
+        ('official', 'Official Duty'),
+        ('other', 'Other'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_periods')
+    leave_type = models.CharField(max_length=20, choices=LEAVE_TYPES, default='annual')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('pending', 'Pending'),
+            ('approved', 'Approved'),
+            ('rejected', 'Rejected')
+        ],
+        default='pending'
+    )
+    reason = models.TextField(blank=True, null=True)
+    approved_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='approved_leave_periods'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'end_date'], name='leave_user_range_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.full_name} - {self.leave_type} {self.start_date} to {self.end_date}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_data_version([self.user_id])
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_data_version([self.user_id])
+        return result
+
+class AbsenteeRun(models.Model):
+    """Progress of the absentee job for one day and one department"""
+    day = models.DateField()
+    # 'department:<id>', or 'department:none' for staff without a department
+    scope = models.CharField(max_length=50)
+    absent_count = models.PositiveIntegerField(default=0)
+    leave_count = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day', 'scope']
+        unique_together = ['day', 'scope']
+
+    def __str__(self):
+        return f"Absentees {self.day} {self.scope}"
+
+class ReportJob(models.Model):
+    """An admin report computed in the background"""
+    job_id = models.CharField(max_length=64, unique=True)
+    # SHA-256 of the normalized parameters; identical requests share a job
+    params_hash = models.CharField(max_length=64, db_index=True)
+    params = models.JSONField()
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('completed', 'Completed'),
+            ('failed', 'Failed')
+        ],
+        default='queued'
+    )
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='report_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Report {self.job_id} ({self.status})"
+
+
+class SystemSetting(models.Model):
+    """An admin-edited value replacing a system setting's default (see system_settings.py)"""
+    section = models.CharField(max_length=50)
+    name = models.CharField(max_length=100)
+    value = models.JSONField()
+    updated_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='system_settings_updated'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['section', 'name']
+        unique_together = ['section', 'name']
+
+    def __str__(self):
+        return f"{self.section}.{self.name} = {self.value!r}"
+
+
+class AuditLogQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError('Audit log entries cannot be changed')
+
+    def delete(self):
+        raise TypeError('Audit log entries cannot be deleted')
+
+
+class AuditLog(models.Model):
+    """One entry in the append-only audit trail (written through audit.writer)"""
+    ACTION_TYPES = [
+        ('login', 'Login'),
+        ('logout', 'Logout'),
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+        ('view', 'View'),
+        ('export', 'Export'),
+        ('system', 'System'),
+    ]
+
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+    # No database constraint: entries outlive the accounts they mention
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, blank=True, null=True, related_name='audit_logs'
+    )
+    username = models.CharField(max_length=150, blank=True)
+    role = models.CharField(max_length=20, blank=True)
+    action = models.CharField(max_length=100)
+    action_type = models.CharField(max_length=20, choices=ACTION_TYPES)
+    resource_type = models.CharField(max_length=50, blank=True)
+    resource_id = models.CharField(max_length=100, blank=True)
+    resource_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('success', 'Success'),
+            ('failure', 'Failure'),
+            ('warning', 'Warning')
+        ],
+        default='success'
+    )
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    user_agent = models.CharField(max_length=255, blank=True)
+    details = models.JSONField(blank=True, null=True)
+
+    objects = AuditLogQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['action_type', 'timestamp'], name='audit_type_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='audit_user_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.timestamp:%Y-%m-%d %H:%M} {self.username or 'system'}: {self.action} ({self.status})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError('Audit log entries cannot be changed')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('Audit log entries cannot be deleted')
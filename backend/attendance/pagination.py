@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset: QuerySet) -> int:
+    """Estimate the row count of a queryset from planner statistics.
+
+    On PostgreSQL this reads the planner's row estimate from ``EXPLAIN``
+    instead of running ``COUNT(*)``. Other backends have no comparable
+    statistic, so they fall back to an exact count (fine for local SQLite).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on a composite key instead of OFFSET.
+
+    Each page is fetched with a ``WHERE (a, b) < (:a, :b)`` style predicate on
+    the ``ordering`` fields, so page N costs the same as page 1 and no
+    ``COUNT(*)`` is issued. The last ordering field must be unique (normally
+    ``id``) to make the key total. Pass ``include_total=1`` for an approximate
+    total taken from planner statistics.
+    """
+
+    ordering: Sequence[str] = ('-id',)
+    page_size = getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE', 20)
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'include_total'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.include_total = request.query_params.get(self.total_query_param, '').lower() in ('1', 'true', 'yes')
+        self.total = approximate_count(queryset) if self.include_total else None
+        page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request, queryset)
+        ordering = self._ordering(reverse)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position, reverse))
+
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Going forwards, a cursor means there is something behind us; going
+        # backwards, it means there is something ahead of us.
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        payload: Dict[str, Any] = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.include_total:
+            payload['approximate_total'] = self.total
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'approximate_total': {'type': 'integer', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    # Cursor encoding -----------------------------------------------------
+
+    def _fields(self) -> List[Tuple[str, bool]]:
+        """Ordering as (field name, descending) pairs."""
+        return [(f.lstrip('-'), f.startswith('-')) for f in self.ordering]
+
+    def _ordering(self, reverse: bool) -> List[str]:
+        ordering = []
+        for name, descending in self._fields():
+            descending = descending != reverse
+            ordering.append(f'-{name}' if descending else name)
+        return ordering
+
+    def _seek_filter(self, position: Sequence[Any], reverse: bool) -> Q:
+        """Expand the row-value comparison into an index-friendly OR chain."""
+        fields = self._fields()
+        seek = Q()
+        for index, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': position[index]})
+            for prior_index, (prior_name, _) in enumerate(fields[:index]):
+                clause &= Q(**{prior_name: position[prior_index]})
+            seek |= clause
+        return seek
+
+    def _position(self, item) -> List[Any]:
+        values = []
+        for name, _ in self._fields():
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def _link(self, item, reverse: bool) -> str:
+        token = json.dumps({'p': self._position(item), 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            remove_query_param(self.base_url, self.total_query_param),
+            self.cursor_query_param, encoded,
+        )
+
+    def decode_cursor(self, request, queryset) -> Tuple[Optional[List[Any]], bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            raw_position = token['p']
+            reverse = bool(token.get('r'))
+            if len(raw_position) != len(self.ordering):
+                raise ValueError('cursor length mismatch')
+            opts = queryset.model._meta
+            position = [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self._fields(), raw_position)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+
+class AttendanceKeysetPagination(KeysetPagination):
+    """Newest records first, keyed on (timestamp, id)."""
+
+    ordering = ('-timestamp', '-id')
+
+
+class UserKeysetPagination(KeysetPagination):
+    """Most recently joined users first, keyed on (date_joined, id)."""
+
+    ordering = ('-date_joined', '-id')
+
+
+class AuditLogKeysetPagination(KeysetPagination):
+    """Newest audit entries first, keyed on (timestamp, id); sized by ``limit``."""
+
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'limit'
@@ -0,0 +1,228 @@
+"""Optional monthly range partitioning of AttendanceRecord on PostgreSQL.
+
+The Django model is unchanged: a partitioned parent table keeps the same name
+and columns, so every ORM path (inserts, updates, the date-bounded filters in
+``queries.py``) works as before and PostgreSQL prunes partitions for bounded
+queries. Differences at the SQL level:
+
+- the primary key becomes ``(id, timestamp)`` because PostgreSQL requires the
+  partition key in every unique constraint; ``id`` stays unique because it is
+  drawn from a single sequence;
+- ``id`` defaults to ``nextval`` on a plain sequence instead of an identity
+  column, which partitioned tables only support from PostgreSQL 17;
+- a DEFAULT partition catches rows outside the pre-created months so inserts
+  never fail if the ``attendance_partitions`` job lapses.
+
+Other backends (SQLite for local testing) keep the plain table.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection as default_connection, transaction
+
+from .models import AttendanceRecord
+from .queries import office_timezone
+
+TABLE = AttendanceRecord._meta.db_table
+LEGACY_TABLE = f'{TABLE}_unpartitioned'
+DEFAULT_PARTITION = f'{TABLE}_default'
+ID_SEQUENCE = f'{TABLE}_pid_seq'
+MIN_SERVER_VERSION = 110000  # default partitions and partitioned primary keys
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def timezone_date(value: datetime) -> date:
+    return value.astimezone(office_timezone()).date()
+
+
+def partition_name(month: date) -> str:
+    return f'{TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def partition_bounds(month: date) -> Tuple[datetime, datetime]:
+    """Bounds of a monthly partition, aligned to office-timezone midnight.
+
+    Aligning to the office timezone means a query for one local month, built
+    with ``queries.between_days``, touches exactly one partition.
+    """
+    tz = office_timezone()
+    return (
+        datetime.combine(month, time.min, tzinfo=tz),
+        datetime.combine(add_months(month, 1), time.min, tzinfo=tz),
+    )
+
+
+def is_supported(connection=None) -> bool:
+    connection = connection or default_connection
+    return connection.vendor == 'postgresql' and connection.pg_version >= MIN_SERVER_VERSION
+
+
+def is_partitioned(connection=None) -> bool:
+    connection = connection or default_connection
+    if not is_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema())
+            """,
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(connection=None) -> List[str]:
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [TABLE],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _create_partition(connection, cursor, month: date, has_default: bool) -> None:
+    name = partition_name(month)
+    start, end = partition_bounds(month)
+    qn = connection.ops.quote_name
+    if has_default:
+        # Rows that landed in the DEFAULT partition for this range must move
+        # into the new partition, otherwise PostgreSQL rejects the CREATE.
+        cursor.execute(
+            f'CREATE TEMP TABLE _attendance_moved ON COMMIT DROP AS '
+            f'SELECT * FROM {qn(DEFAULT_PARTITION)} WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [start, end],
+        )
+        cursor.execute(
+            f'DELETE FROM {qn(DEFAULT_PARTITION)} WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [start, end],
+        )
+    cursor.execute(
+        f'CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)',
+        [start, end],
+    )
+    if has_default:
+        cursor.execute(f'INSERT INTO {qn(TABLE)} SELECT * FROM _attendance_moved')
+        cursor.execute('DROP TABLE _attendance_moved')
+
+
+def ensure_partitions(first_month: Optional[date] = None, months_ahead: int = 3, connection=None) -> List[str]:
+    """Create any missing monthly partitions up to ``months_ahead`` months out.
+
+    Returns the names of the partitions that were created.
+    """
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+
+    current = month_start(datetime.now(office_timezone()).date())
+    month = month_start(first_month) if first_month else current
+    last = add_months(current, months_ahead)
+    existing = set(existing_partitions(connection))
+    has_default = DEFAULT_PARTITION in existing
+
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        while month <= last:
+            if partition_name(month) not in existing:
+                _create_partition(connection, cursor, month, has_default)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(months_ahead: int = 3, connection=None, log=None) -> Dict[str, int]:
+    """Rebuild the attendance table as a monthly range-partitioned table.
+
+    Runs in one transaction holding an ACCESS EXCLUSIVE lock: the table is
+    renamed aside, a partitioned parent with the same columns is created,
+    partitions are created for every month that has data plus
+    ``months_ahead`` months ahead, rows are copied month by month, and
+    constraints and indexes are rebuilt on the filled partitions. Returns the
+    number of rows copied per partition.
+    """
+    connection = connection or default_connection
+    if not is_supported(connection):
+        raise RuntimeError('Table partitioning requires PostgreSQL 11 or newer')
+    if is_partitioned(connection):
+        raise RuntimeError(f'{TABLE} is already partitioned')
+
+    log = log or (lambda message: None)
+    qn = connection.ops.quote_name
+    user_table = AttendanceRecord._meta.get_field('user').related_model._meta.db_table
+    copied: Dict[str, int] = {}
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN("timestamp"), MAX("timestamp"), MAX(id) FROM {qn(TABLE)}')
+        min_ts, max_ts, max_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY_TABLE)}')
+        cursor.execute(
+            f'CREATE TABLE {qn(TABLE)} (LIKE {qn(LEGACY_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {qn(ID_SEQUENCE)} AS bigint')
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+        cursor.execute(f'ALTER SEQUENCE {qn(ID_SEQUENCE)} OWNED BY {qn(TABLE)}.id')
+        cursor.execute('SELECT setval(%s, %s, %s)', [ID_SEQUENCE, max_id or 1, max_id is not None])
+
+        today = datetime.now(office_timezone()).date()
+        first = month_start(timezone_date(min_ts) if min_ts else today)
+        last = add_months(month_start(today), months_ahead)
+        if max_ts and month_start(timezone_date(max_ts)) > last:
+            last = month_start(timezone_date(max_ts))
+
+        month = first
+        while month <= last:
+            _create_partition(connection, cursor, month, has_default=False)
+            start, end = partition_bounds(month)
+            cursor.execute(
+                f'INSERT INTO {qn(TABLE)} SELECT * FROM {qn(LEGACY_TABLE)} '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s',
+                [start, end],
+            )
+            copied[partition_name(month)] = cursor.rowcount
+            log(f'{partition_name(month)}: {cursor.rowcount} rows')
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT')
+
+        cursor.execute(f'SELECT COUNT(*) FROM {qn(LEGACY_TABLE)}')
+        legacy_rows = cursor.fetchone()[0]
+        if legacy_rows != sum(copied.values()):
+            raise RuntimeError(f'Copied {sum(copied.values())} of {legacy_rows} rows; aborting conversion')
+        cursor.execute(f'DROP TABLE {qn(LEGACY_TABLE)}')
+
+        # Constraints and indexes are built after the copy, on filled partitions
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_pkey")} PRIMARY KEY (id, "timestamp")')
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_user_id_fk")} '
+            f'FOREIGN KEY (user_id) REFERENCES {qn(user_table)} (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        with connection.schema_editor(atomic=False) as schema_editor:
+            schema_editor.alter_unique_together(AttendanceRecord, [], AttendanceRecord._meta.unique_together)
+            for index in AttendanceRecord._meta.indexes:
+                schema_editor.add_index(AttendanceRecord, index)
+                log(f'index {index.name}')
+        cursor.execute(f'ANALYZE {qn(TABLE)}')
+
+    return copied
+
@@ -0,0 +1,153 @@
+"""Compact, cached stand-in for the authenticated user.
+
+Authenticating an API call used to load the whole users row (biometric
+vectors included) on every request. ``CachedJWTAuthentication`` instead
+resolves a ``LazyPrincipal``: the few columns permission checks and views
+branch on, read from the ``principal`` two-tier cache (``tiered_cache``):
+
+* L1, per process, kept for ``PRINCIPAL_LOCAL_TTL`` seconds;
+* L2, the shared Django cache, kept for ``PRINCIPAL_CACHE_TTL`` seconds.
+
+``User.save``/``delete`` invalidate the principal in both tiers once the
+transaction commits; other processes drop their L1 copy through the
+cache's invalidation bus or version check, and at the latest when
+``PRINCIPAL_LOCAL_TTL`` runs out.
+
+Anything beyond the principal fields (or a write) loads the full ``User``
+on first use, so views that need the model keep working unchanged.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.exceptions import AuthenticationFailed
+
+from .tiered_cache import TwoTierCache
+
+PRINCIPAL_FIELDS = (
+    'id', 'username', 'role', 'employment_status', 'department', 'department_ref_id',
+    'is_verified', 'is_active', 'is_staff', 'is_superuser',
+)
+
+cache = TwoTierCache(
+    'principal',
+    size=10000,
+    local_ttl=lambda: getattr(settings, 'PRINCIPAL_LOCAL_TTL', 5),
+    shared_ttl=lambda: getattr(settings, 'PRINCIPAL_CACHE_TTL', 300),
+)
+
+
+def _query(user_id) -> Optional[Dict[str, Any]]:
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.utils import get_md5_hash_password
+
+    columns = list(PRINCIPAL_FIELDS)
+    if api_settings.CHECK_REVOKE_TOKEN:
+        columns.append('password')
+    row = get_user_model().objects.filter(pk=user_id).values(*columns).first()
+    if row is None:
+        return None
+    password = row.pop('password', None)
+    if password is not None:
+        row['revoke_hash'] = get_md5_hash_password(password)
+    return row
+
+
+def load_principal(user_id) -> Optional[Dict[str, Any]]:
+    """Principal fields for ``user_id``, from L1, L2 or one narrow query."""
+    return cache.get(user_id, lambda: _query(user_id))
+
+
+def invalidate_principal(user_id) -> None:
+    """Forget the cached principal once the current transaction commits."""
+    if user_id is not None:
+        invalidate_principals([user_id])
+
+
+def invalidate_principals(user_ids) -> None:
+    """``invalidate_principal`` for many users, in one cache round trip."""
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if user_ids:
+        cache.invalidate(*user_ids)
+
+
+def _principal_property(name):
+    def getter(self):
+        if self._wrapped is empty and name in self._principal:
+            return self._principal[name]
+        # Loaded already, or cached before the field was added
+        if self._wrapped is empty:
+            self._setup()
+        return getattr(self._wrapped, name)
+    return property(getter)
+
+
+class LazyPrincipal(SimpleLazyObject):
+    """The authenticated user, loaded from the database only when needed.
+
+    Principal fields are answered from the cached data; any other attribute
+    loads the full ``User``. It passes ``isinstance(obj, User)`` and can be
+    used in queries and as a foreign key value without loading.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        user_id = data['id']
+
+        def load():
+            try:
+                return get_user_model().objects.get(pk=user_id)
+            except get_user_model().DoesNotExist:
+                raise AuthenticationFailed('User not found', code='user_not_found')
+
+        self.__dict__['_principal'] = data
+        super().__init__(load)
+
+    def __getattr__(self, name):
+        if self._wrapped is empty:
+            # Probes like hasattr(user, 'resolve_expression') in the ORM should
+            # not load the row; only names a User can have are worth loading for
+            if not name.startswith('_') and not hasattr(get_user_model(), name):
+                raise AttributeError(name)
+            self._setup()
+        return getattr(self._wrapped, name)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def _is_pk_set(self, meta=None):
+        return self.id is not None
+
+    @property
+    def _meta(self):
+        return get_user_model()._meta
+
+    @property
+    def __class__(self):
+        return get_user_model()
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        other_pk = getattr(other, 'pk', None)
+        return isinstance(other, get_user_model()) and other_pk is not None and other_pk == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __repr__(self):
+        if self._wrapped is empty:
+            return f'<LazyPrincipal: {self.id}>'
+        return repr(self._wrapped)
+
+
+for _name in PRINCIPAL_FIELDS:
+    setattr(LazyPrincipal, _name, _principal_property(_name))
+del _name
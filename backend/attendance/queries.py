@@ -0,0 +1,70 @@
+"""Index-friendly date filters for attendance queries.
+
+``timestamp__date=`` and ``timestamp__date__range=`` wrap the column in a
+timezone-converting cast, which stops the database from using any index on
+``timestamp``. The helpers here turn calendar days in the office timezone into
+half-open ``[start, end)`` timestamp ranges that compare the raw column, so the
+composite indexes on AttendanceRecord (and partition pruning on PostgreSQL)
+apply.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+def office_timezone():
+    """Timezone that defines an office 'day' (defaults to TIME_ZONE)."""
+    return ZoneInfo(getattr(settings, 'OFFICE_TIME_ZONE', None) or settings.TIME_ZONE)
+
+
+def local_today() -> date:
+    """Today's date in the office timezone."""
+    return timezone.localdate(timezone.now(), office_timezone())
+
+
+def local_date(value: datetime) -> date:
+    """Calendar day of an aware timestamp in the office timezone."""
+    return timezone.localtime(value, office_timezone()).date()
+
+
+def day_start(day: date) -> datetime:
+    """Aware datetime for midnight at the start of ``day`` in the office timezone."""
+    return datetime.combine(day, time.min, tzinfo=office_timezone())
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Half-open ``[start, end)`` bounds covering one office day."""
+    return day_start(day), day_start(day + timedelta(days=1))
+
+
+def range_bounds(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """Half-open bounds covering ``start_date`` through ``end_date`` inclusive."""
+    return day_start(start_date), day_start(end_date + timedelta(days=1))
+
+
+def on_day(day: date, field: str = 'timestamp') -> Q:
+    """Sargable replacement for ``Q(<field>__date=day)``."""
+    start, end = day_bounds(day)
+    return Q(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def between_days(start_date: date, end_date: date, field: str = 'timestamp') -> Q:
+    """Sargable replacement for ``Q(<field>__date__range=[start_date, end_date])``."""
+    start, end = range_bounds(start_date, end_date)
+    return Q(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def since_day(start_date: date, field: str = 'timestamp') -> Q:
+    """Sargable replacement for ``Q(<field>__date__gte=start_date)``."""
+    return Q(**{f'{field}__gte': day_start(start_date)})
+
+
+def until_day(end_date: date, field: str = 'timestamp') -> Q:
+    """Sargable replacement for ``Q(<field>__date__lte=end_date)``."""
+    return Q(**{f'{field}__lt': day_start(end_date + timedelta(days=1))})
@@ -0,0 +1,35 @@
+"""JSON renderer backed by orjson.
+
+orjson encodes dicts, lists, datetimes, dates, UUIDs and NumPy values in C,
+several times faster than ``json.dumps`` with DRF's encoder. Types it does
+not know (lazy translation strings, Decimals, sets) fall back to DRF's
+encoder. When orjson is not installed the renderer behaves exactly like
+DRF's ``JSONRenderer``.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
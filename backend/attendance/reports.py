@@ -0,0 +1,317 @@
+"""Admin attendance reports, computed inline or as background jobs.
+
+``build_report`` is what ``AdminReportsView`` returns. A month across every
+department can take long enough to hit gunicorn's timeout, so reports can
+also be submitted as a ``ReportJob``: the caller gets a job id, polls its
+status and downloads the result once it completes.
+
+Jobs are deduplicated by a hash of their normalized parameters (including the
+office day they were computed for). While a matching job is queued or running,
+or has completed within ``REPORT_RESULT_TTL`` seconds, a new submission gets
+that job back instead of starting another computation. Completed results are
+also kept in the cache under the hash.
+
+Work runs on Celery when ``REPORT_JOB_BACKEND`` is ``'celery'`` (the
+default with ``REDIS_URL``). With ``'thread'`` (the default without it) the
+web process runs queued jobs itself on one background thread, so a
+deployment with no worker service still completes them. With ``'local'``, or
+if the broker cannot be reached, jobs stay queued for the ``run_report_jobs``
+worker command.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AttendanceRecord, Department, ReportJob
+from .queries import between_days, local_today, office_timezone
+from .workforce import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+DATE_RANGES = ('today', 'week', 'month')
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def department_breakdown(workforce, present_user_ids, unassigned=None):
+    """Headcount and presence per department from the workforce snapshot.
+
+    Staff without a department are reported under ``unassigned``, or left
+    out when it is None.
+    """
+    names = dict(Department.objects.values_list('id', 'name'))
+    return workforce.department_breakdown(present_user_ids, names, unassigned)
+
+
+def report_period(date_range: str, today=None):
+    today = today or local_today()
+    if date_range == 'week':
+        return today - timedelta(days=7), today
+    if date_range == 'month':
+        return today - timedelta(days=30), today
+    return today, today
+
+
+def build_report(date_range: str = 'today', department: Optional[str] = None, today=None) -> Dict[str, Any]:
+    """Summary, department breakdown and 7-day trend for a period."""
+    today = today or local_today()
+    start_date, end_date = report_period(date_range, today)
+
+    # Restrict the workforce snapshot to a department if specified
+    workforce = get_snapshot()
+    if department and department != 'all':
+        if str(department).isdigit():
+            department_id = int(department)
+        else:
+            department_id = Department.objects.filter(
+                name__iexact=' '.join(department.split())
+            ).values_list('id', flat=True).first()
+        workforce = workforce.select(department=department_id) if department_id is not None else workforce.empty()
+
+    # One pass over the period's check-ins; users are matched against the snapshot
+    tz = office_timezone()
+    check_ins = AttendanceRecord.objects.filter(
+        between_days(start_date, end_date),
+    ).present_check_ins().values_list('user_id', 'timestamp', 'status')
+    user_ids = []
+    days = []
+    late = []
+    for user_id, timestamp, status in check_ins.iterator():
+        user_ids.append(user_id)
+        days.append(timezone.localtime(timestamp, tz).date())
+        # As decided when marked, against the working hours then in force
+        late.append(status == 'late')
+    counted = workforce.contains(user_ids)
+
+    total_employees = workforce.headcount
+    present_ids = [user_id for user_id, keep in zip(user_ids, counted) if keep]
+    present_count = workforce.count_present(present_ids)
+    absent_count = total_employees - present_count
+    late_count = sum(1 for keep, is_late in zip(counted, late) if keep and is_late)
+
+    # Attendance trend (last 7 days), oldest to newest
+    trend_data = []
+    for i in reversed(range(7)):
+        date = today - timedelta(days=i)
+        day_ids = [user_id for user_id, keep, day in zip(user_ids, counted, days) if keep and day == date]
+        day_present = workforce.count_present(day_ids)
+        trend_data.append({
+            'date': date.strftime('%Y-%m-%d'),
+            'present': day_present,
+            'absent': total_employees - day_present,
+            'late': sum(1 for keep, day, is_late in zip(counted, days, late) if keep and day == date and is_late),
+        })
+
+    return {
+        'summary': {
+            'total_employees': total_employees,
+            'present_today': present_count,
+            'absent_today': absent_count,
+            'late_today': late_count,
+            'average_attendance_rate': round((present_count / total_employees * 100), 2) if total_employees > 0 else 0
+        },
+        'department_stats': department_breakdown(workforce, present_ids),
+        'attendance_trend': trend_data,
+        'date_range': {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat()
+        }
+    }
+
+
+# Background jobs ------------------------------------------------------------
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical job parameters; raises ValueError for invalid input."""
+    date_range = params.get('date_range') or 'today'
+    if date_range not in DATE_RANGES:
+        raise ValueError(f'date_range must be one of: {", ".join(DATE_RANGES)}')
+    department = params.get('department') or 'all'
+    department = ' '.join(str(department).split()).lower()
+    # Reports are relative to the office day, so the same request tomorrow is a new job
+    return {'date_range': date_range, 'department': department, 'as_of': local_today().isoformat()}
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _result_key(digest: str) -> str:
+    return f'attendance:report:{digest}'
+
+
+class LocalRunner:
+    """One thread per process that runs queued jobs until none are left.
+
+    Woken after each submission commits; at most one job runs at a time per
+    process, and claiming in ``run_report_job`` keeps processes from running
+    the same job twice.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._wanted = False
+
+    def wake(self) -> None:
+        with self._lock:
+            self._wanted = True
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='report-jobs', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    # Checked under the lock, so a wake() from now on starts a new thread
+                    self._thread = None
+                    return
+                self._wanted = False
+            close_old_connections()
+            try:
+                run_queued_jobs()
+            except Exception:
+                logger.exception('Local report job runner failed')
+            finally:
+                close_old_connections()
+
+
+runner = LocalRunner()
+
+
+def _dispatch(job: ReportJob) -> None:
+    backend = getattr(settings, 'REPORT_JOB_BACKEND', 'celery')
+    if backend == 'thread':
+        # The runner's connection cannot see the job until it is committed
+        transaction.on_commit(runner.wake)
+        return
+    if backend != 'celery':
+        return
+    from .tasks import run_report_job_task
+
+    try:
+        run_report_job_task.delay(job.job_id)
+    except Exception:
+        # Broker unreachable: the job stays queued for run_report_jobs
+        logger.warning('Could not enqueue report job %s; leaving it for the local worker', job.job_id)
+
+
+def _reusable_job(digest: str) -> Optional[ReportJob]:
+    now = timezone.now()
+    ttl = getattr(settings, 'REPORT_RESULT_TTL', 900)
+    # Jobs stuck queued/running past the timeout (a dead worker) are not reused
+    timeout = getattr(settings, 'REPORT_JOB_TIMEOUT', 1800)
+    return ReportJob.objects.filter(params_hash=digest).filter(
+        Q(status__in=ACTIVE_STATUSES, created_at__gte=now - timedelta(seconds=timeout))
+        | Q(status='completed', completed_at__gte=now - timedelta(seconds=ttl))
+    ).order_by('-created_at').first()
+
+
+def _submit_lock(digest: str) -> str:
+    return f'attendance:report-submit:{digest}'
+
+
+def submit_report_job(params: Dict[str, Any], user=None) -> Tuple[ReportJob, bool]:
+    """Return a job for ``params``, reusing a matching one where possible.
+
+    The second value is True when a new job was created. Submissions of the
+    same parameters are serialised on a cache lock, so admins asking at the
+    same moment share one job instead of each missing the lookup.
+    """
+    params = normalize_params(params)
+    digest = params_hash(params)
+    lock = _submit_lock(digest)
+    wait = float(getattr(settings, 'REPORT_SUBMIT_LOCK_WAIT', 5))
+    deadline = time.monotonic() + wait
+    while not cache.add(lock, 1, timeout=max(wait * 2, 1)):
+        # Another request is creating this job; take it once it is visible
+        existing = _reusable_job(digest)
+        if existing:
+            return existing, False
+        if time.monotonic() >= deadline:
+            # The holder is stuck or gone: better a duplicate job than none
+            logger.warning('Report submission lock %s not released; creating a job anyway', lock)
+            break
+        time.sleep(0.05)
+
+    try:
+        existing = _reusable_job(digest)
+        if existing:
+            cache.delete(lock)
+            return existing, False
+        job = ReportJob.objects.create(
+            job_id=uuid.uuid4().hex, params_hash=digest, params=params, requested_by=user,
+        )
+    except Exception:
+        cache.delete(lock)
+        raise
+    # Held until the job is visible to other requests' lookups
+    transaction.on_commit(lambda: cache.delete(lock))
+    _dispatch(job)
+    return job, True
+
+
+def run_report_job(job_id: str) -> bool:
+    """Compute one queued job. Returns False if another worker claimed it."""
+    claimed = ReportJob.objects.filter(job_id=job_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return False
+
+    job = ReportJob.objects.get(job_id=job_id)
+    try:
+        result = build_report(
+            job.params['date_range'], job.params['department'], today=date.fromisoformat(job.params['as_of'])
+        )
+    except Exception as exc:
+        logger.exception('Report job %s failed', job_id)
+        job.status = 'failed'
+        job.error = str(exc)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'completed_at'])
+        return True
+
+    job.status = 'completed'
+    job.result = result
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'completed_at'])
+    cache.set(_result_key(job.params_hash), result, getattr(settings, 'REPORT_RESULT_TTL', 900))
+    return True
+
+
+def job_result(job: ReportJob) -> Optional[Dict[str, Any]]:
+    """Result of a completed job, from the cache when available."""
+    if job.status != 'completed':
+        return None
+    result = cache.get(_result_key(job.params_hash))
+    if result is None:
+        result = job.result
+    return result
+
+
+def run_queued_jobs(limit: Optional[int] = None) -> int:
+    """Run queued jobs oldest first; returns how many this worker ran."""
+    ran = 0
+    queued = ReportJob.objects.filter(status='queued').order_by('created_at').values_list('job_id', flat=True)
+    for job_id in list(queued[:limit] if limit else queued):
+        if run_report_job(job_id):
+            ran += 1
+    return ran
@@ -0,0 +1,300 @@
+"""Bulk onboarding of staff from a CSV or XLSX roster.
+
+``RegisterView`` creates one account per request after three ``exists()``
+queries; onboarding a ministry that way means tens of thousands of calls.
+``import_roster`` instead:
+
+* loads every existing username, NIN and short ID into sets once, and checks
+  each row (and the rows before it) against them in memory;
+* hashes initial passwords in a process pool, ``ROSTER_HASH_WORKERS`` wide
+  (the upload endpoint hashes inline, leaving the CPUs to other requests);
+* inserts with ``bulk_create`` in batches of ``ROSTER_BATCH_SIZE``, while the
+  pool is still hashing later rows;
+* refreshes headcounts and the workforce snapshot once at the end.
+
+Rows with problems are skipped and reported with their spreadsheet row
+number; the rest are imported.
+
+Initial passwords are PBKDF2-hashed with ``ROSTER_PASSWORD_ITERATIONS``
+rather than the full login cost, which is what makes 100k rows a matter of
+minutes. ``PooledModelBackend`` upgrades each hash to the configured cost at
+the account's first successful login.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import repeat
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import hashing
+from .conditional import bump_data_version
+from .models import Department, Office, User, normalize_dimension_name
+from .workforce import bump_workforce_version
+
+try:
+    import openpyxl
+except Exception:  # pragma: no cover - openpyxl is only needed for XLSX rosters
+    openpyxl = None  # type: ignore
+
+ROSTER_FORMATS = ('csv', 'xlsx')
+
+COLUMNS = (
+    'username', 'password', 'full_name', 'short_id', 'nin', 'email', 'phone',
+    'department', 'position', 'office_location', 'staff_id', 'employee_id',
+    'gender', 'date_of_birth', 'hire_date',
+)
+REQUIRED_COLUMNS = ('username', 'full_name', 'short_id', 'nin')
+UNIQUE_COLUMNS = ('username', 'nin', 'short_id')
+DATE_COLUMNS = ('date_of_birth', 'hire_date')
+
+Row = Dict[str, str]
+
+
+# Reading --------------------------------------------------------------------
+
+def roster_format(filename: str) -> Optional[str]:
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return extension if extension in ROSTER_FORMATS else None
+
+
+def _header(value: Any) -> str:
+    return '_'.join(str(value or '').strip().lower().split())
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store NINs and IDs typed as numbers as floats
+        return str(int(value))
+    return str(value).strip()
+
+
+def _rows_from_table(table: Iterator[Iterable[Any]]) -> Iterator[Tuple[int, Row]]:
+    try:
+        headers = [_header(value) for value in next(table)]
+    except StopIteration:
+        return
+    for number, values in enumerate(table, start=2):
+        row = {header: _cell(value) for header, value in zip(headers, values) if header}
+        if any(row.values()):
+            yield number, row
+
+
+def read_roster(fileobj: IO, file_format: str) -> Iterator[Tuple[int, Row]]:
+    """``(row number, {column: text})`` for each non-blank data row.
+
+    Headers are matched case-insensitively with spaces as underscores, so
+    "Full Name" reads as ``full_name``. Row numbers count the header as 1.
+    """
+    if file_format == 'csv':
+        text = fileobj if isinstance(fileobj, io.TextIOBase) else io.TextIOWrapper(
+            fileobj, encoding='utf-8-sig', newline='')
+        return _rows_from_table(iter(csv.reader(text)))
+    if file_format == 'xlsx':
+        if openpyxl is None:
+            raise RuntimeError('openpyxl is required for XLSX rosters (pip install openpyxl)')
+        workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+        return _rows_from_table(workbook.active.iter_rows(values_only=True))
+    raise ValueError(f'Unsupported roster format: {file_format}')
+
+
+# Validation -----------------------------------------------------------------
+
+def existing_values() -> Dict[str, set]:
+    """Every username, NIN and short ID already taken, one query each."""
+    return {
+        column: set(User.objects.values_list(column, flat=True).order_by())
+        for column in UNIQUE_COLUMNS
+    }
+
+
+def _row_errors(row: Row, taken: Dict[str, set], default_password: Optional[str]) -> List[str]:
+    errors = [f'{column} is required' for column in REQUIRED_COLUMNS if not row.get(column)]
+    if not row.get('password') and not default_password:
+        errors.append('password is required (or give a default password)')
+
+    for column in COLUMNS:
+        value = row.get(column)
+        if not value or column == 'password':
+            continue
+        max_length = User._meta.get_field(column).max_length
+        if max_length and len(value) > max_length:
+            errors.append(f'{column} is longer than {max_length} characters')
+    for column in DATE_COLUMNS:
+        if row.get(column):
+            try:
+                date.fromisoformat(row[column])
+            except ValueError:
+                errors.append(f'{column} must be in YYYY-MM-DD format')
+    if row.get('email'):
+        try:
+            validate_email(row['email'])
+        except ValidationError:
+            errors.append('email is not a valid address')
+
+    for column, label in (('username', 'Username'), ('nin', 'NIN'), ('short_id', 'Short ID')):
+        if row.get(column) and row[column] in taken[column]:
+            errors.append(f'{label} {row[column]} already exists')
+    return errors
+
+
+def validate_roster(rows: Iterable[Tuple[int, Row]], default_password: Optional[str] = None,
+                    taken: Optional[Dict[str, set]] = None) -> Tuple[List[Tuple[int, Row]], List[dict]]:
+    """Split rows into importable ones and ``{'row', 'username', 'errors'}`` reports.
+
+    A row's username, NIN and short ID count as taken for the rows after it,
+    so the first of two duplicates in the file wins.
+    """
+    taken = existing_values() if taken is None else taken
+    valid, errors = [], []
+    for number, row in rows:
+        problems = _row_errors(row, taken, default_password)
+        if problems:
+            errors.append({'row': number, 'username': row.get('username', ''), 'errors': problems})
+            continue
+        for column in UNIQUE_COLUMNS:
+            taken[column].add(row[column])
+        valid.append((number, row))
+    return valid, errors
+
+
+# Password hashing -----------------------------------------------------------
+
+def _hash_initial(password: str, iterations: int) -> str:
+    hasher = get_hasher('default')
+    if iterations and isinstance(hasher, PBKDF2PasswordHasher) and iterations < hasher.iterations:
+        return hasher.encode(password, hasher.salt(), iterations)
+    return make_password(password)
+
+
+def hash_passwords(passwords: List[str], workers: Optional[int] = None) -> Iterator[str]:
+    """Hashes for ``passwords`` in order, computed ``workers`` processes wide."""
+    iterations = int(getattr(settings, 'ROSTER_PASSWORD_ITERATIONS', 0))
+    if workers is None:
+        workers = int(getattr(settings, 'ROSTER_HASH_WORKERS', 0)) or os.cpu_count() or 1
+    if workers <= 1 or len(passwords) < 2:
+        yield from map(_hash_initial, passwords, repeat(iterations))
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=hashing._init_worker, initargs=(0,)) as executor:
+        chunksize = max(1, min(500, len(passwords) // (workers * 4)))
+        yield from executor.map(_hash_initial, passwords, repeat(iterations), chunksize=chunksize)
+
+
+# Import ---------------------------------------------------------------------
+
+class _Dimensions:
+    """Department/office rows by normalised name, resolved once per import."""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows: Dict[str, Any] = {}
+
+    def get(self, name: str):
+        name = normalize_dimension_name(name)
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.rows:
+            self.rows[key] = self.model.objects.resolve(name)
+        return self.rows[key]
+
+
+def _build_user(row: Row, encoded: str, departments: _Dimensions, offices: _Dimensions) -> User:
+    department = departments.get(row.get('department'))
+    office = offices.get(row.get('office_location'))
+    return User(
+        username=row['username'],
+        password=encoded,
+        full_name=row['full_name'],
+        short_id=row['short_id'],
+        nin=row['nin'],
+        email=row.get('email', ''),
+        phone=row.get('phone', ''),
+        position=row.get('position', ''),
+        staff_id=row.get('staff_id', ''),
+        employee_id=row.get('employee_id', ''),
+        gender=row.get('gender') or None,
+        date_of_birth=row.get('date_of_birth') or None,
+        hire_date=row.get('hire_date') or None,
+        # What sync_dimensions() would have set; bulk_create skips save()
+        department=department.name if department else None,
+        department_ref=department,
+        office_location=office.name if office else None,
+        office_ref=office,
+    )
+
+
+def _insert(batch: List[Tuple[int, User]], errors: List[dict]) -> int:
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user in batch])
+        return len(batch)
+    except IntegrityError:
+        pass
+    # Someone registered a clashing account mid-import; find the row(s) one at a time
+    created = 0
+    for number, user in batch:
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user])
+            created += 1
+        except IntegrityError:
+            errors.append({'row': number, 'username': user.username,
+                           'errors': ['Username, NIN or short ID was registered during the import']})
+    return created
+
+
+def import_roster(rows: Iterable[Tuple[int, Row]], default_password: Optional[str] = None,
+                  dry_run: bool = False, batch_size: Optional[int] = None, workers: Optional[int] = None,
+                  log: Callable[[str], Any] = lambda message: None) -> Dict[str, Any]:
+    """Validate and import roster rows; returns counts and per-row errors."""
+    batch_size = batch_size or getattr(settings, 'ROSTER_BATCH_SIZE', 1000)
+    rows = list(rows)
+    valid, errors = validate_roster(rows, default_password)
+    log(f'{len(rows)} rows read, {len(valid)} valid, {len(errors)} with errors')
+
+    created = 0
+    if valid and not dry_run:
+        departments, offices = _Dimensions(Department), _Dimensions(Office)
+        hashes = hash_passwords([row.get('password') or default_password for _, row in valid], workers)
+        batch: List[Tuple[int, User]] = []
+        for (number, row), encoded in zip(valid, hashes):
+            batch.append((number, _build_user(row, encoded, departments, offices)))
+            if len(batch) >= batch_size:
+                created += _insert(batch, errors)
+                batch = []
+                log(f'{created} users created')
+        if batch:
+            created += _insert(batch, errors)
+
+    if created:
+        Department.refresh_headcounts()
+        Office.refresh_headcounts()
+        bump_workforce_version()
+        # New accounts change admin user lists
+        bump_data_version([])
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'rows': len(rows),
+        'valid': len(valid),
+        'created': created,
+        'failed': len(errors),
+        'dry_run': dry_run,
+        'errors': errors,
+    }
@@ -1,9 +1,54 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import User, AttendanceRecord, BiometricVerificationSession
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 import json
 
-class UserSerializer(serializers.ModelSerializer):
+from .audit import writer as audit
+from .fieldsets import SparseFieldsetMixin
+from .queries import local_today, on_day
+from .writebehind import buffer as write_behind
+
+# Biometric template vectors; only sent when asked for with ?expand= or ?fields=
+BIOMETRIC_TEMPLATE_FIELDS = ('face_biometric_data', 'ear_biometric_data')
+
+def today_records_prefetch(today=None):
+    """Prefetch each user's records for the office day into ``today_attendance_records``"""
+    return Prefetch(
+        'attendance_records',
+        queryset=AttendanceRecord.objects.filter(on_day(today or local_today())).order_by('timestamp'),
+        to_attr='today_attendance_records',
+    )
+
+def summarize_attendance_today(records):
+    """Today's attendance status from a user's day records, oldest first"""
+    if not records:
+        return {'status': 'not_marked', 'check_in': None, 'check_out': None}
+    
+    check_in = next((
+        r for r in records
+        if r.attendance_type == 'check_in' and r.status in AttendanceRecord.PRESENT_STATUSES
+    ), None)
+    check_out = next((r for r in records if r.attendance_type == 'check_out'), None)
+    
+    return {
+        'status': 'marked' if check_in else 'not_marked',
+        'check_in': check_in.timestamp if check_in else None,
+        'check_out': check_out.timestamp if check_out else None,
+        'face_verified': check_in.face_verified if check_in else False,
+        'ear_verified': check_in.ear_verified if check_in else False,
+    }
+
+def biometric_status(user):
+    """Registration status, without loading deferred template vectors"""
+    if set(BIOMETRIC_TEMPLATE_FIELDS) & user.get_deferred_fields():
+        return user.biometric_verification_status
+    return user.get_biometric_status()
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     biometric_status = serializers.SerializerMethodField()
     attendance_today = serializers.SerializerMethodField()
     
@@ -11,30 +56,26 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         exclude = ['password']
         read_only_fields = ['date_joined', 'last_login', 'is_superuser', 'is_staff']
+        expandable_fields = BIOMETRIC_TEMPLATE_FIELDS
+        field_sources = {
+            'biometric_status': ['biometric_verification_status'],
+            'attendance_today': [],
+        }
+    
+    @staticmethod
+    def setup_queryset(queryset):
+        """Load everything the serializer reads in a fixed number of queries"""
+        return queryset.prefetch_related('groups', 'user_permissions', today_records_prefetch())
     
     def get_attendance_today(self, obj):
         """Get today's attendance status"""
-        today = timezone.now().date()
-        today_records = obj.attendance_records.filter(
-            timestamp__date=today
-        ).order_by('timestamp')
-        
-        if not today_records.exists():
-            return {'status': 'not_marked', 'check_in': None, 'check_out': None}
-        
-        check_in = today_records.filter(attendance_type='check_in').first()
-        check_out = today_records.filter(attendance_type='check_out').first()
-        
-        return {
-            'status': 'marked' if check_in else 'not_marked',
-            'check_in': check_in.timestamp if check_in else None,
-            'check_out': check_out.timestamp if check_out else None,
-            'face_verified': check_in.face_verified if check_in else False,
-            'ear_verified': check_in.ear_verified if check_in else False,
-        }
+        records = getattr(obj, 'today_attendance_records', None)
+        if records is None:
+            records = list(obj.attendance_records.filter(on_day(local_today())).order_by('timestamp'))
+        return summarize_attendance_today(records)
 
     def get_biometric_status(self, obj):
-        return obj.get_biometric_status()
+        return biometric_status(obj)
 
 class BiometricDataSerializer(serializers.Serializer):
     """Serializer for biometric data validation"""
@@ -68,7 +109,7 @@ class BiometricDataSerializer(serializers.Serializer):
             raise serializers.ValidationError("Confidence score must be at least 0.5")
         return value
 
-class AttendanceRecordSerializer(serializers.ModelSerializer):
+class AttendanceRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.full_name', read_only=True)
     user_short_id = serializers.CharField(source='user.short_id', read_only=True)
     verification_status = serializers.SerializerMethodField()
@@ -77,6 +118,9 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         model = AttendanceRecord
         fields = '__all__' 
         read_only_fields = ['user', 'timestamp', 'created_at', 'updated_at']
+        # Raw probe vectors and client device details
+        expandable_fields = ('biometric_data', 'device_info')
+        field_sources = {'verification_status': ['face_verified', 'ear_verified']}
     
     def validate(self, data):
         """Validate attendance record data"""
@@ -87,12 +131,14 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("User must be verified before marking attendance")
         
         # Check for duplicate attendance on same day
-        today = timezone.now().date()
-        existing_record = AttendanceRecord.objects.filter(
-            user=user,
-            attendance_type=data['attendance_type'],
-            timestamp__date=today
-        ).first()
+        today = local_today()
+        existing = AttendanceRecord.objects.filter(on_day(today), user=user)
+        if data['attendance_type'] == 'check_in':
+            # A materialized absent/on_leave row does not stop a late arrival checking in
+            existing = existing.present_check_ins()
+        else:
+            existing = existing.filter(attendance_type=data['attendance_type'])
+        existing_record = existing.first()
         
         if existing_record:
             raise serializers.ValidationError(
@@ -102,10 +148,9 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         # Validate check-out can only be after check-in
         if data['attendance_type'] == 'check_out':
             check_in = AttendanceRecord.objects.filter(
+                on_day(today),
                 user=user,
-                attendance_type='check_in',
-                timestamp__date=today
-            ).first()
+            ).present_check_ins().first()
             
             if not check_in:
                 raise serializers.ValidationError("Must check in before checking out")
@@ -192,7 +237,7 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Phone number must be at least 10 digits")
         return value
 
-class AdminUserSerializer(serializers.ModelSerializer):
+class AdminUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for admin user management"""
     attendance_records_count = serializers.SerializerMethodField()
     last_attendance = serializers.SerializerMethodField()
@@ -200,10 +245,45 @@ class AdminUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         exclude = ['password']
+        expandable_fields = BIOMETRIC_TEMPLATE_FIELDS
+        field_sources = {'attendance_records_count': [], 'last_attendance': []}
+    
+    @staticmethod
+    def setup_queryset(queryset):
+        """Annotate record count and latest timestamp with correlated subqueries"""
+        # Absent/on_leave rows written by the absentee job are not attendance
+        records = AttendanceRecord.objects.filter(user=OuterRef('pk')).exclude(
+            status__in=AttendanceRecord.MATERIALIZED_STATUSES
+        ).order_by()
+        return queryset.prefetch_related('groups', 'user_permissions').annotate(
+            annotated_attendance_count=Coalesce(
+                Subquery(records.values('user').annotate(total=Count('pk')).values('total')), 0
+            ),
+            annotated_last_attendance=Subquery(records.order_by('-timestamp').values('timestamp')[:1]),
+        )
     
     def get_attendance_records_count(self, obj):
-        return obj.attendance_records.count()
+        if hasattr(obj, 'annotated_attendance_count'):
+            return obj.annotated_attendance_count
+        return obj.attendance_records.exclude(status__in=AttendanceRecord.MATERIALIZED_STATUSES).count()
     
     def get_last_attendance(self, obj):
-        last_record = obj.attendance_records.first()
-        return last_record.timestamp if last_record else None 
\ No newline at end of file
+        if hasattr(obj, 'annotated_last_attendance'):
+            return obj.annotated_last_attendance
+        last_record = obj.attendance_records.exclude(status__in=AttendanceRecord.MATERIALIZED_STATUSES).first()
+        return last_record.timestamp if last_record else None
+
+class BufferedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair serializer that records last_login through the write-behind buffer"""
+    
+    def validate(self, attrs):
+        request = self.context.get('request')
+        try:
+            data = super().validate(attrs)
+        except AuthenticationFailed:
+            audit.record('User Login', 'login', request=request, status='failure',
+                         resource_name='Authentication System', username=attrs.get(self.username_field, ''))
+            raise
+        write_behind.set(User, self.user.pk, last_login=timezone.now())
+        audit.record('User Login', 'login', request=request, user=self.user, resource_name='Authentication System')
+        return data
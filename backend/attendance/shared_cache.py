@@ -0,0 +1,290 @@
+"""Cache backend shared by every worker process on one host.
+
+Without Redis, Django's ``LocMemCache`` gives each gunicorn worker its own
+cache, so rate limits, cache-backed sessions, verification sessions and
+ETag versions disagree between workers. ``SharedMemoryCache`` keeps entries
+in a SQLite file on ``/dev/shm`` (memory backed, read through ``mmap``) in
+WAL mode, so any number of processes can read at once while writes take a
+short lock:
+
+* entries expire by TTL like any Django cache, and expired entries are
+  never returned;
+* once more than ``MAX_ENTRIES`` are stored, the least recently used are
+  evicted (``CULL_FREQUENCY`` as in Django's own backends); access times
+  are recorded at ``LRU_RESOLUTION`` seconds' granularity so reads stay
+  read-only;
+* ``add``, ``incr`` and ``decr`` are atomic across processes;
+* each process (and thread) opens its own connection after a fork.
+
+Values are pickled, so whoever can write the file can run code in every
+worker. Without a ``LOCATION`` the file goes in a directory of its own under
+``/dev/shm``, private to the current user (mode 0700). A file (or default
+directory) that belongs to another user, or that other users can write to,
+is refused with ``ImproperlyConfigured``.
+
+Only for a single host: the file is not shared between machines.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Keys per statement, well under SQLite's bound-parameter limit
+KEYS_PER_QUERY = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+
+def _check_private(path: str, info: os.stat_result) -> None:
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise ImproperlyConfigured(f'Shared cache {path} belongs to another user')
+    if stat.S_IMODE(info.st_mode) & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ImproperlyConfigured(f'Shared cache {path} is writable by other users')
+
+
+def default_location() -> str:
+    """A file in a directory only the current user can use, created on first call."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    directory = os.path.join(base, f'attendance-cache-{os.getuid() if hasattr(os, "getuid") else "user"}')
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    # lstat: a symlink planted in the shared directory is not followed
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise ImproperlyConfigured(f'Shared cache directory {directory} is not a directory')
+    _check_private(directory, info)
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        raise ImproperlyConfigured(f'Shared cache directory {directory} is accessible to other users')
+    return os.path.join(directory, 'cache.sqlite3')
+
+
+def _open_private(path: str) -> None:
+    """Create ``path`` readable by this user only, or check the file already there."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        info = os.fstat(fd)
+    finally:
+        os.close(fd)
+    _check_private(path, info)
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location or default_location()
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._mmap_size = int(options.get('MMAP_SIZE', 256 * 1024 * 1024))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 10))
+        # Sets between checks of the entry count
+        self._cull_every = max(int(options.get('CULL_EVERY', 64)), 1)
+        self._local = threading.local()
+        self._sets = 0
+
+    # Connections ------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            # A connection inherited across fork must not be used or closed in
+            # the child; it is dropped without closing and a new one opened
+            _open_private(self._path)
+            connection = sqlite3.connect(self._path, timeout=self._busy_timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Memory-backed file: durability across power loss is moot
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection, self._local.pid = connection, pid
+        return connection
+
+    def _write(self):
+        """A transaction holding the write lock from the start (atomic read-modify-write)."""
+        return _WriteTransaction(self._connection())
+
+    # Encoding ---------------------------------------------------------------
+
+    def _dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _loads(blob: bytes) -> Any:
+        return pickle.loads(blob)
+
+    def _expires(self, timeout) -> Optional[float]:
+        return self.get_backend_timeout(timeout)
+
+    # Reads ------------------------------------------------------------------
+
+    def _fetch(self, keys: List[str]) -> Dict[str, Any]:
+        now = time.time()
+        rows = []
+        for start in range(0, len(keys), KEYS_PER_QUERY):
+            chunk = keys[start:start + KEYS_PER_QUERY]
+            rows += self._connection().execute(
+                f'SELECT key, value, accessed FROM cache WHERE key IN ({",".join("?" * len(chunk))})'
+                ' AND (expires IS NULL OR expires > ?)',
+                (*chunk, now),
+            ).fetchall()
+        stale = [key for key, _, accessed in rows if now - accessed > self._lru_resolution]
+        for start in range(0, len(stale), KEYS_PER_QUERY):
+            chunk = stale[start:start + KEYS_PER_QUERY]
+            self._connection().execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({",".join("?" * len(chunk))})', (now, *chunk),
+            )
+        return {key: self._loads(value) for key, value, _ in rows}
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_and_validate_key(key, version=version): key for key in keys}
+        return {made[key]: value for key, value in self._fetch(list(made)).items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone() is not None
+
+    # Writes -----------------------------------------------------------------
+
+    def _store(self, rows: Iterable[tuple]) -> None:
+        now = time.time()
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires,'
+                ' accessed = excluded.accessed',
+                [(key, value, expires, now) for key, value, expires in rows],
+            )
+        self._maybe_cull()
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store([(key, self._dumps(value), self._expires(timeout))])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        self._store([
+            (self.make_and_validate_key(key, version=version), self._dumps(value), expires)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as connection:
+            # Only replaces an entry that has expired
+            cursor = connection.execute(
+                'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires,'
+                ' accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, self._dumps(value), self._expires(timeout), now, now),
+            )
+            added = cursor.rowcount > 0
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), now, key, now),
+            )
+            return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?', (self._dumps(value), now, key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as connection:
+            return connection.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            with self._write() as connection:
+                for start in range(0, len(keys), KEYS_PER_QUERY):
+                    chunk = keys[start:start + KEYS_PER_QUERY]
+                    connection.execute(f'DELETE FROM cache WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    # Eviction ---------------------------------------------------------------
+
+    def _maybe_cull(self) -> None:
+        self._sets += 1
+        if self._sets % self._cull_every == 0:
+            self.cull()
+
+    def cull(self) -> int:
+        """Drop expired entries, then the least recently used beyond ``MAX_ENTRIES``."""
+        with self._write() as connection:
+            removed = connection.execute(
+                'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),),
+            ).rowcount
+            count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries:
+                # Like Django's backends, cull 1/CULL_FREQUENCY (everything if 0)
+                excess = count - self._max_entries
+                extra = count // self._cull_frequency if self._cull_frequency else count
+                removed += connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (max(excess, extra),),
+                ).rowcount
+        return removed
+
+
+class _WriteTransaction:
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
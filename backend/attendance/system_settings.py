@@ -0,0 +1,225 @@
+"""System settings that admins edit at run time.
+
+Every setting has a default, taken from the Django setting of the same
+meaning where one exists (``FACE_RECOGNITION_TOLERANCE``, ``WORK_START_TIME``,
+``WORKING_WEEKDAYS`` ...), so a fresh install behaves as configured. Admins
+override values through ``AdminSettingsView``; only overridden values are
+stored, one ``SystemSetting`` row each.
+
+The mark path, verification sessions and the working calendar read settings
+through ``get``. The stored overrides are held in a ``TwoTierCache`` under a
+single key and loaded in one query when missing, so a request costs no query;
+``update`` invalidates them on commit and every process picks the change up
+within ``TIERED_CACHE_VERSION_CHECK`` seconds (at once with Redis pub/sub).
+
+Read by the server: the biometric thresholds, ``enable_*_recognition``,
+``max_attempts``, working hours, ``late_threshold_minutes``, working weekdays
+and public holidays. The remaining values are kept for the admin UI.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import SystemSetting
+from .tiered_cache import TwoTierCache
+
+cache = TwoTierCache('system-settings', size=1)
+KEY = 'overrides'
+
+
+# Validators: return the value to store or raise ValueError ------------------
+
+def _fraction(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError('must be a number between 0 and 1')
+    return float(value)
+
+
+def _integer(minimum: int, maximum: int) -> Callable[[Any], int]:
+    def validate(value):
+        if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+            raise ValueError(f'must be a whole number between {minimum} and {maximum}')
+        return value
+    return validate
+
+
+def _boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError('must be true or false')
+    return value
+
+
+def _parse_clock(value) -> time:
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def _clock(value):
+    try:
+        return _parse_clock(value).strftime('%H:%M')
+    except (TypeError, ValueError):
+        raise ValueError('must be a time in HH:MM format') from None
+
+
+def _weekdays(value):
+    if not isinstance(value, list) or not all(
+            isinstance(day, int) and not isinstance(day, bool) and 0 <= day <= 6 for day in value):
+        raise ValueError('must be a list of weekday numbers (Monday=0 to Sunday=6)')
+    return sorted(set(value))
+
+
+def _dates(value):
+    try:
+        return sorted({date.fromisoformat(day).isoformat() for day in value})
+    except (TypeError, ValueError):
+        raise ValueError('must be a list of dates in YYYY-MM-DD format') from None
+
+
+def _setting(name: str, fallback: Any) -> Callable[[], Any]:
+    return lambda: getattr(settings, name, fallback)
+
+
+# section -> name -> (validator, default)
+FIELDS: Dict[str, Dict[str, Tuple[Callable[[Any], Any], Callable[[], Any]]]] = {
+    'biometric': {
+        'face_recognition_tolerance': (_fraction, lambda: float(getattr(
+            settings, 'FACE_RECOGNITION_TOLERANCE', getattr(settings, 'MIN_CONFIDENCE_THRESHOLD', 0.8)))),
+        'ear_recognition_tolerance': (_fraction, lambda: float(getattr(
+            settings, 'EAR_RECOGNITION_TOLERANCE', getattr(settings, 'MIN_CONFIDENCE_THRESHOLD', 0.8)))),
+        'min_confidence_threshold': (_fraction, _setting('MIN_CONFIDENCE_THRESHOLD', 0.8)),
+        'enable_face_recognition': (_boolean, lambda: True),
+        'enable_ear_recognition': (_boolean, lambda: True),
+        'max_attempts': (_integer(1, 20), lambda: 3),
+    },
+    'attendance': {
+        'work_start_time': (_clock, _setting('WORK_START_TIME', '09:00')),
+        'work_end_time': (_clock, _setting('WORKDAY_END_TIME', '17:00')),
+        # Grace after work_start_time before a check-in counts as late
+        'late_threshold_minutes': (_integer(0, 240), lambda: 0),
+        'break_duration_minutes': (_integer(0, 480), lambda: 60),
+        'enable_overtime': (_boolean, lambda: True),
+        'max_overtime_hours': (_integer(0, 24), lambda: 2),
+        'working_weekdays': (_weekdays, lambda: list(getattr(settings, 'WORKING_WEEKDAYS', [0, 1, 2, 3, 4]))),
+        'public_holidays': (_dates, lambda: [str(day) for day in getattr(settings, 'PUBLIC_HOLIDAYS', [])]),
+    },
+    'security': {
+        'session_timeout_minutes': (_integer(1, 10080), lambda: 480),
+        'max_login_attempts': (_integer(1, 100), lambda: 5),
+        'enable_two_factor': (_boolean, lambda: False),
+        'password_expiry_days': (_integer(0, 3650), lambda: 90),
+        'require_strong_password': (_boolean, lambda: True),
+    },
+    'notifications': {
+        'enable_email_notifications': (_boolean, lambda: True),
+        'enable_sms_notifications': (_boolean, lambda: False),
+        'attendance_reminders': (_boolean, lambda: True),
+        'late_notifications': (_boolean, lambda: True),
+        'admin_alerts': (_boolean, lambda: True),
+    },
+}
+
+
+# Reading --------------------------------------------------------------------
+
+def _load() -> Dict[Tuple[str, str], Any]:
+    return {
+        (section, name): value
+        for section, name, value in SystemSetting.objects.values_list('section', 'name', 'value')
+    }
+
+
+def overrides() -> Dict[Tuple[str, str], Any]:
+    """Stored values by (section, name), from the cache when it has them."""
+    return cache.get(KEY, _load)
+
+
+def get(section: str, name: str) -> Any:
+    stored = overrides()
+    if (section, name) in stored:
+        return stored[(section, name)]
+    return FIELDS[section][name][1]()
+
+
+def get_time(section: str, name: str) -> time:
+    return _parse_clock(get(section, name))
+
+
+def snapshot(fresh: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Every setting's current value, grouped by section (``fresh`` bypasses the cache)."""
+    stored = _load() if fresh else overrides()
+    return {
+        section: {
+            name: stored[(section, name)] if (section, name) in stored else default()
+            for name, (_, default) in fields.items()
+        }
+        for section, fields in FIELDS.items()
+    }
+
+
+# Writing --------------------------------------------------------------------
+
+def clean(data: Any) -> Tuple[Dict[Tuple[str, str], Any], Dict[str, Any]]:
+    """``(changes, errors)`` for ``{section: {name: value}}``; a null value resets to the default."""
+    if not isinstance(data, dict):
+        return {}, {'non_field_errors': ['Expected an object of settings sections']}
+    changes: Dict[Tuple[str, str], Any] = {}
+    errors: Dict[str, Any] = {}
+    for section, values in data.items():
+        if section not in FIELDS:
+            errors[section] = 'Unknown settings section'
+            continue
+        if not isinstance(values, dict):
+            errors[section] = 'Expected an object of settings'
+            continue
+        for name, value in values.items():
+            if name not in FIELDS[section]:
+                errors.setdefault(section, {})[name] = 'Unknown setting'
+                continue
+            try:
+                changes[(section, name)] = None if value is None else FIELDS[section][name][0](value)
+            except ValueError as error:
+                errors.setdefault(section, {})[name] = str(error)
+
+    hours = [('attendance', 'work_start_time'), ('attendance', 'work_end_time')]
+    if not errors and any(key in changes for key in hours):
+        # Checked against the values the change would leave in place
+        stored = overrides()
+
+        def resulting(key):
+            value = changes[key] if key in changes else stored.get(key)
+            return _parse_clock(FIELDS[key[0]][key[1]][1]() if value is None else value)
+
+        if resulting(hours[1]) <= resulting(hours[0]):
+            errors['attendance'] = {'work_end_time': 'must be later than work_start_time'}
+    return changes, errors
+
+
+def update(changes: Dict[Tuple[str, str], Any], user: Optional[Any] = None) -> List[Tuple[str, str]]:
+    """Store cleaned ``changes`` and invalidate every process; returns the keys that changed.
+
+    A value equal to its default (or None) removes the override, so the admin
+    UI posting the whole form does not pin defaults that may later change.
+    """
+    changed = []
+    with transaction.atomic():
+        stored = _load()
+        for (section, name), value in changes.items():
+            if value is None or value == FIELDS[section][name][1]():
+                if (section, name) in stored:
+                    SystemSetting.objects.filter(section=section, name=name).delete()
+                    changed.append((section, name))
+            elif stored.get((section, name)) != value:
+                SystemSetting.objects.update_or_create(
+                    section=section, name=name, defaults={'value': value, 'updated_by': user},
+                )
+                changed.append((section, name))
+        if changed:
+            invalidate()
+    return changed
+
+
+def invalidate() -> None:
+    cache.invalidate(KEY)
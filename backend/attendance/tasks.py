@@ -0,0 +1,30 @@
+import logging
+from datetime import date
+
+from celery import shared_task
+
+from .absentees import materialize_absentees
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def materialize_absentees_task(self, day=None, force=False):
+    """Write absent/on_leave rows for the latest closed working day"""
+    try:
+        return materialize_absentees(
+            day=date.fromisoformat(day) if day else None,
+            force=force,
+            log=logger.info,
+        )
+    except Exception as exc:
+        # Finished departments are recorded, so a retry resumes where this stopped
+        raise self.retry(exc=exc)
+
+
+@shared_task
+def run_report_job_task(job_id):
+    """Compute a queued admin report job"""
+    from .reports import run_report_job
+
+    return run_report_job(job_id)
@@ -1,5 +1,8 @@
+import unittest
+
+from django.db import connection
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -7,6 +10,7 @@ from django.utils import timezone
 User = get_user_model()
 
 
+@override_settings(AUDIT_FLUSH_INTERVAL=0, WRITE_BEHIND_INTERVAL=0)
 class AuthAndProfileTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -37,6 +41,7 @@ class AuthAndProfileTests(TestCase):
         self.assertEqual(resp.data['username'], 'john@example.com')
 
 
+@override_settings(AUDIT_FLUSH_INTERVAL=0, WRITE_BEHIND_INTERVAL=0)
 class BiometricAndAttendanceTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -90,3 +95,1854 @@ class BiometricAndAttendanceTests(TestCase):
         # Attempt second check-in should fail
         resp2 = self.client.post(reverse('attendance_mark'), attendance_payload, format='json')
         self.assertEqual(resp2.status_code, 400)
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class AttendanceExportTests(TestCase):
+    def setUp(self):
+        from .models import AttendanceRecord
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin@example.com', password='StrongPass123',
+            full_name='Admin User', nin='C123456789', short_id='ADM001', role='admin'
+        )
+        self.staff = User.objects.create_user(
+            username='ola@example.com', password='StrongPass123',
+            full_name='Ola Ade', nin='D123456789', short_id='EMP003', department='HR'
+        )
+        AttendanceRecord.objects.create(user=self.staff, attendance_type='check_in', face_confidence=0.91)
+        AttendanceRecord.objects.create(user=self.admin, attendance_type='check_in')
+        self.client.force_authenticate(user=self.admin)
+
+    def test_csv_export_streams_filtered_rows(self):
+        resp = self.client.get(reverse('attendance-export'), {'department': 'HR'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        lines = b''.join(resp.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('record_id,timestamp'))
+        self.assertIn('EMP003', lines[1])
+
+    def test_xlsx_export_is_valid_workbook(self):
+        import io
+        import zipfile
+
+        resp = self.client.get(reverse('attendance-export'), {'file_format': 'xlsx', 'user': 'EMP003'})
+        self.assertEqual(resp.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(resp.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('Ola Ade', sheet)
+        self.assertIn('<v>0.91</v>', sheet)
+
+    def test_unknown_format_rejected(self):
+        resp = self.client.get(reverse('attendance-export'), {'file_format': 'pdf'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_parquet_export_partitions_by_month(self):
+        import json
+        import tempfile
+        from datetime import datetime as dt
+
+        from . import exports
+        from .models import AttendanceRecord
+
+        if exports.pa is None:
+            raise unittest.SkipTest('pyarrow not installed')
+
+        AttendanceRecord.objects.filter(user=self.staff).update(
+            timestamp=timezone.make_aware(dt(2025, 6, 30, 9, 0))
+        )
+        with tempfile.TemporaryDirectory() as output_dir:
+            manifest = exports.export_parquet(AttendanceRecord.objects.all(), output_dir, row_group_size=1)
+            self.assertEqual(manifest['total_rows'], 2)
+            self.assertEqual(len(manifest['files']), 2)
+            june = manifest['files'][0]
+            self.assertEqual(june['month'], '2025-06')
+            self.assertTrue(june['min_timestamp'].startswith('2025-06-30'))
+
+            table = exports.pq.read_table(f"{output_dir}/{june['path']}")
+            self.assertEqual(table.column('short_id').to_pylist(), ['EMP003'])
+            self.assertEqual(str(table.schema.field('timestamp').type), 'timestamp[us, tz=UTC]')
+            with open(f'{output_dir}/_manifest.json') as fh:
+                self.assertEqual(json.load(fh)['total_rows'], 2)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from .models import AttendanceRecord
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin2@example.com', password='StrongPass123',
+            full_name='Admin Two', nin='E123456789', short_id='ADM002', role='admin'
+        )
+        base = timezone.now().replace(microsecond=0)
+        types = ['check_in', 'check_out', 'break_start', 'break_end', 'check_in']
+        for i, attendance_type in enumerate(types):
+            record = AttendanceRecord.objects.create(user=self.admin, attendance_type=attendance_type)
+            # Two records share a timestamp so the id tiebreaker is exercised
+            AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=base - timedelta(hours=min(i, 3)))
+        self.client.force_authenticate(user=self.admin)
+
+    def test_cursor_pages_cover_all_records_once(self):
+        from .models import AttendanceRecord
+
+        seen = []
+        url = reverse('attendance-list') + '?page_size=2&include_total=1'
+        resp = self.client.get(url)
+        self.assertIsInstance(resp.data['approximate_total'], int)
+        if connection.vendor != 'postgresql':
+            # Only PostgreSQL estimates; other backends count exactly
+            self.assertEqual(resp.data['approximate_total'], 5)
+        self.assertIsNone(resp.data['previous'])
+        while True:
+            seen.extend(row['id'] for row in resp.data['results'])
+            if not resp.data['next']:
+                break
+            resp = self.client.get(resp.data['next'])
+            self.assertEqual(resp.status_code, 200)
+
+        expected = list(AttendanceRecord.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        # Step back one page from the last
+        back = self.client.get(resp.data['previous'])
+        self.assertEqual([row['id'] for row in back.data['results']], expected[2:4])
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(reverse('attendance-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_admin_user_list_paginates_on_request(self):
+        resp = self.client.get(reverse('admin_users'))
+        self.assertIsInstance(resp.data, list)
+        resp = self.client.get(reverse('admin_users'), {'page_size': 1})
+        self.assertIn('results', resp.data)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'plan assertions use SQLite EXPLAIN QUERY PLAN')
+class AttendanceQueryPlanTests(TestCase):
+    """Attendance reads must be served by an index, never a full table scan."""
+
+    def setUp(self):
+        from .models import AttendanceRecord
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='planner@example.com', password='StrongPass123',
+            full_name='Plan Admin', nin='F123456789', short_id='ADM003', role='admin'
+        )
+        self.staff = User.objects.create_user(
+            username='tunde@example.com', password='StrongPass123',
+            full_name='Tunde Bello', nin='G123456789', short_id='EMP004', department='Finance'
+        )
+        AttendanceRecord.objects.create(user=self.staff, attendance_type='check_in')
+        AttendanceRecord.objects.create(user=self.staff, attendance_type='check_out')
+
+    def assertIndexedPlans(self, url, user, params=None):
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, params or {})
+        self.assertEqual(resp.status_code, 200)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or '"attendance_attendancerecord"' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                plans.append(plan)
+                for line in plan.splitlines():
+                    if 'attendance_attendancerecord' in line and line.strip().startswith('SCAN'):
+                        self.assertIn('INDEX', line, f'Full scan for:\n{sql}\n{plan}')
+        self.assertTrue(plans, 'no attendance queries captured')
+        return plans
+
+    def test_date_filters_are_sargable(self):
+        from .models import AttendanceRecord
+        from .queries import on_day, local_today
+
+        sql = str(AttendanceRecord.objects.filter(on_day(local_today())).query)
+        self.assertNotIn('django_datetime_cast_date', sql)
+
+    def test_today_weekly_monthly_use_indexes(self):
+        for name in ('attendance-today', 'attendance-weekly', 'attendance-monthly'):
+            plans = self.assertIndexedPlans(reverse(name), self.staff)
+            self.assertTrue(any('att_user_ts_desc_idx' in plan for plan in plans), plans)
+
+    def test_dashboard_uses_indexes(self):
+        self.assertIndexedPlans(reverse('admin_dashboard'), self.admin)
+
+    def test_reports_use_indexes(self):
+        for date_range in ('today', 'week', 'month'):
+            self.assertIndexedPlans(reverse('admin_reports'), self.admin, {'date_range': date_range})
+
+
+class PartitioningTests(TestCase):
+    def test_month_helpers(self):
+        from datetime import date
+        from . import partitioning
+
+        self.assertEqual(partitioning.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partitioning.partition_name(date(2025, 7, 1)), 'attendance_attendancerecord_y2025m07')
+        start, end = partitioning.partition_bounds(date(2025, 12, 1))
+        self.assertEqual((start.month, end.year, end.month), (12, 2026, 1))
+        # Bounds sit on office-timezone midnight, not UTC midnight
+        self.assertEqual(start.utcoffset(), timezone.localtime(start).utcoffset())
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'exercises the unpartitioned fallback')
+    def test_command_is_noop_without_postgres(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('attendance_partitions', stdout=out)
+        self.assertIn('unpartitioned', out.getvalue())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from datetime import timedelta
+        from django.test import override_settings
+        from .models import AttendanceRecord, BiometricVerificationSession
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(ARCHIVE_ROOT=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(
+            username='archive@example.com', password='StrongPass123',
+            full_name='Archie Ved', nin='H123456789', short_id='EMP005'
+        )
+        self.old_day = timezone.localtime(timezone.now() - timedelta(days=400)).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        )
+        for i, attendance_type in enumerate(['check_in', 'check_out', 'break_start']):
+            record = AttendanceRecord.objects.create(user=self.user, attendance_type=attendance_type)
+            AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=self.old_day + timedelta(hours=i))
+        self.recent = AttendanceRecord.objects.create(user=self.user, attendance_type='check_in')
+
+        BiometricVerificationSession.objects.create(user=self.user, session_id='live', verification_type='face')
+        abandoned = BiometricVerificationSession.objects.create(
+            user=self.user, session_id='abandoned', verification_type='face', status='in_progress'
+        )
+        BiometricVerificationSession.objects.filter(pk=abandoned.pk).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+
+    def test_archive_purges_and_rehydrates(self):
+        from . import archive
+        from .models import AttendanceRecord, BiometricVerificationSession
+        from .queries import local_date
+
+        results = archive.archive_old_data(retention_days=365, batch_size=2, segment_rows=2)
+        self.assertEqual(results['attendance_record'], {'segments': 2, 'archived': 3, 'deleted': 3})
+        self.assertEqual(list(AttendanceRecord.objects.values_list('pk', flat=True)), [self.recent.pk])
+        self.assertEqual(results['verification_session']['archived'], 1)
+        self.assertEqual(
+            list(BiometricVerificationSession.objects.values_list('session_id', flat=True)), ['live']
+        )
+
+        manifest = archive.load_manifest('attendance_record')
+        self.assertEqual(sum(entry['rows'] for entry in manifest['segments']), 3)
+        self.assertTrue(all(len(entry['sha256']) == 64 for entry in manifest['segments']))
+
+        day = local_date(self.old_day)
+        self.assertEqual(archive.rehydrate('attendance_record', day, day), 3)
+        restored = AttendanceRecord.objects.exclude(pk=self.recent.pk).order_by('timestamp').first()
+        self.assertEqual(restored.timestamp, self.old_day)
+        # Rehydrating again is a no-op
+        self.assertEqual(archive.rehydrate('attendance_record', day, day), 0)
+
+    def test_corrupted_segment_is_rejected(self):
+        import os
+        from . import archive
+
+        archive.archive_old_data(retention_days=365)
+        entry = archive.load_manifest('attendance_record')['segments'][0]
+        with open(os.path.join(self.tmp.name, 'attendance_record', entry['file']), 'ab') as fh:
+            fh.write(b'tampered')
+        with self.assertRaises(RuntimeError):
+            list(archive.iter_segment_rows('attendance_record', entry))
+
+
+class DepartmentDimensionTests(TestCase):
+    def setUp(self):
+        from .models import AttendanceRecord
+
+        self.client = APIClient()
+        # Workforce snapshot versions move on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin = User.objects.create_user(
+                username='admin4@example.com', password='StrongPass123',
+                full_name='Admin Four', nin='H123456789', short_id='ADM004', role='admin'
+            )
+            self.alice = User.objects.create_user(
+                username='alice@example.com', password='StrongPass123', full_name='Alice',
+                nin='H223456789', short_id='EMP020', department='Finance ', office_location='HQ'
+            )
+            self.bob = User.objects.create_user(
+                username='bob@example.com', password='StrongPass123', full_name='Bob',
+                nin='H323456789', short_id='EMP021', department='finance', office_location='hq'
+            )
+            self.carol = User.objects.create_user(
+                username='carol@example.com', password='StrongPass123', full_name='Carol',
+                nin='H423456789', short_id='EMP022', department='IT'
+            )
+        AttendanceRecord.objects.create(user=self.alice, attendance_type='check_in')
+        self.client.force_authenticate(user=self.admin)
+
+    def test_free_text_names_share_one_row(self):
+        from .models import Department, Office
+
+        self.assertEqual(self.alice.department_ref_id, self.bob.department_ref_id)
+        self.assertEqual(self.bob.department, 'Finance')
+        self.assertEqual(Office.objects.get().name, 'HQ')
+        self.assertEqual(
+            dict(Department.objects.values_list('name', 'headcount')), {'Finance': 2, 'IT': 1}
+        )
+
+        self.bob.employment_status = 'suspended'
+        self.bob.save()
+        self.assertEqual(Department.objects.get(name='Finance').headcount, 1)
+        self.carol.department = 'Finance'
+        self.carol.save()
+        self.assertEqual(Department.objects.get(name='IT').headcount, 0)
+        self.assertEqual(Department.objects.get(name='Finance').headcount, 2)
+
+    def test_resolve_survives_concurrent_create(self):
+        from .models import Department
+
+        finance = Department.objects.get(name='Finance')
+        # The lookup misses as if another request inserted the row after it ran
+        self.assertEqual(Department.objects.exclude(pk=finance.pk).resolve('Finance'), finance)
+        # A different case of the same name is the same department
+        self.assertEqual(Department.objects.exclude(pk=finance.pk).resolve('FINANCE'), finance)
+        self.assertEqual(Department.objects.filter(name__iexact='finance').count(), 1)
+
+    def test_dashboard_and_reports_group_by_department(self):
+        resp = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(resp.status_code, 200)
+        departments = {row['name']: row for row in resp.data['departments']}
+        self.assertEqual((departments['Finance']['count'], departments['Finance']['present']), (2, 1))
+        self.assertEqual(departments['IT']['absent'], 1)
+
+        resp = self.client.get(reverse('admin_reports') + '?department=finance')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['summary']['total_employees'], 2)
+        self.assertEqual([row['name'] for row in resp.data['department_stats']], ['Finance'])
+
+        resp = self.client.get(reverse('admin_departments'))
+        self.assertEqual(resp.data['departments'][0], {
+            'id': self.alice.department_ref_id, 'name': 'Finance', 'headcount': 2,
+        })
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class WorkforceSnapshotTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Workforce snapshot versions move on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin = User.objects.create_user(
+                username='admin5@example.com', password='StrongPass123',
+                full_name='Admin Five', nin='J123456789', short_id='ADM005', role='admin'
+            )
+            self.staff = [
+                User.objects.create_user(
+                    username=f'staff{i}@example.com', password='StrongPass123', full_name=f'Staff {i}',
+                    nin=f'J2{i}3456789', short_id=f'EMP03{i}', department='Audit' if i < 2 else 'Legal'
+                )
+                for i in range(3)
+            ]
+        self.client.force_authenticate(user=self.admin)
+
+    def test_snapshot_follows_user_changes(self):
+        from .workforce import get_snapshot
+
+        snapshot = get_snapshot()
+        self.assertEqual(snapshot.headcount, 3)
+        self.assertIs(get_snapshot(), snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('admin_users'), {
+                'action': 'suspend', 'user_id': self.staff[0].id,
+            }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        snapshot = get_snapshot()
+        self.assertEqual(snapshot.headcount, 2)
+        self.assertNotIn(self.staff[0].id, snapshot.ids)
+
+    def test_reports_do_not_query_users(self):
+        from django.db import connection as db_connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import AttendanceRecord
+        from .workforce import get_snapshot
+
+        AttendanceRecord.objects.create(user=self.staff[0], attendance_type='check_in')
+        AttendanceRecord.objects.create(user=self.admin, attendance_type='check_in')
+        get_snapshot()
+        with CaptureQueriesContext(db_connection) as ctx:
+            resp = self.client.get(reverse('admin_reports') + '?department=Audit')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if '"attendance_user"' in q['sql']])
+        self.assertEqual(resp.data['summary']['total_employees'], 2)
+        self.assertEqual(resp.data['summary']['present_today'], 1)
+        self.assertEqual(resp.data['summary']['absent_today'], 1)
+        self.assertEqual(resp.data['department_stats'][0]['present'], 1)
+
+
+class AbsenceEngineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='dana@example.com', password='StrongPass123',
+            full_name='Dana', nin='K123456789', short_id='EMP040'
+        )
+
+    def _check_in(self, day, attendance_type='check_in', status='present'):
+        from datetime import timedelta
+        from .models import AttendanceRecord
+        from .queries import day_start
+
+        record = AttendanceRecord.objects.create(user=self.user, attendance_type=attendance_type, status=status)
+        AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=day_start(day) + timedelta(hours=9))
+
+    def test_bitmaps_account_for_weekends_holidays_and_leave(self):
+        from datetime import date
+        from django.test import override_settings
+        from .absence import AttendanceBitmaps
+        from .models import LeavePeriod
+
+        for day in (3, 4, 6, 13, 14):
+            self._check_in(date(2025, 3, day))
+        self._check_in(date(2025, 3, 7), status='late')
+        self._check_in(date(2025, 3, 12), attendance_type='check_out')
+        LeavePeriod.objects.create(
+            user=self.user, start_date=date(2025, 3, 10), end_date=date(2025, 3, 11), status='approved'
+        )
+        LeavePeriod.objects.create(
+            user=self.user, start_date=date(2025, 3, 12), end_date=date(2025, 3, 12), status='rejected'
+        )
+
+        with override_settings(PUBLIC_HOLIDAYS=['2025-03-05']):
+            summary = AttendanceBitmaps.build([self.user.id], date(2025, 3, 3), date(2025, 3, 16)).summaries()[0]
+        self.assertEqual(summary['working_days'], 9)
+        self.assertEqual(summary['present_days'], 6)
+        self.assertEqual(summary['late_days'], 1)
+        self.assertEqual(summary['leave_days'], 2)
+        self.assertEqual(summary['absent_days'], 1)
+        self.assertEqual((summary['current_streak'], summary['longest_streak']), (2, 4))
+        self.assertEqual(summary['attendance_rate'], 85.71)
+
+    def test_weekly_absence_ignores_check_outs(self):
+        from django.test import override_settings
+        from .queries import local_today
+
+        today = local_today()
+        self._check_in(today)
+        self._check_in(today, attendance_type='check_out')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with override_settings(WORKING_WEEKDAYS=list(range(7))):
+            resp = client.get(reverse('attendance-weekly'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data['present_days'], resp.data['absent_days']), (1, 6))
+
+
+class AbsenteeJobTests(TestCase):
+    def setUp(self):
+        from datetime import date, timedelta
+        from .models import AttendanceRecord, LeavePeriod
+        from .queries import day_start
+
+        self.day = date(2025, 3, 4)  # a Tuesday
+        self.users = [
+            User.objects.create_user(
+                username=f'abs{i}@example.com', password='StrongPass123', full_name=f'Abs {i}',
+                nin=f'L{i}23456789', short_id=f'EMP05{i}', department='Works' if i < 3 else None
+            )
+            for i in range(4)
+        ]
+        User.objects.filter(pk__in=[u.pk for u in self.users]).update(date_joined=day_start(self.day) - timedelta(days=30))
+        record = AttendanceRecord.objects.create(user=self.users[0], attendance_type='check_in')
+        AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=day_start(self.day) + timedelta(hours=8))
+        LeavePeriod.objects.create(user=self.users[1], start_date=self.day, end_date=self.day, status='approved')
+
+    def test_job_writes_rows_once_per_department(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .absentees import materialize_absentees
+        from .models import AbsenteeRun, AttendanceRecord
+        from .queries import on_day
+
+        totals = materialize_absentees(day=self.day)
+        self.assertEqual((totals['absent'], totals['on_leave'], totals['departments']), (2, 1, 2))
+        rows = AttendanceRecord.objects.filter(on_day(self.day))
+        self.assertEqual(
+            sorted(rows.values_list('user__short_id', 'status')),
+            [('EMP050', 'present'), ('EMP051', 'on_leave'), ('EMP052', 'absent'), ('EMP053', 'absent')],
+        )
+        self.assertEqual(rows.present_check_ins().count(), 1)
+        self.assertEqual(AbsenteeRun.objects.filter(day=self.day).count(), 2)
+
+        # Re-running skips finished departments; forcing writes nothing new
+        self.assertEqual(materialize_absentees(day=self.day)['skipped'], 2)
+        out = StringIO()
+        call_command('materialize_absentees', date=self.day.isoformat(), force=True, stdout=out)
+        self.assertIn('Recorded 0 absent', out.getvalue())
+        self.assertEqual(rows.count(), 4)
+
+    def test_weekends_are_skipped(self):
+        from datetime import date
+        from .absentees import materialize_absentees
+
+        self.assertEqual(materialize_absentees(day=date(2025, 3, 8))['departments'], 0)
+
+    def test_admin_user_list_ignores_absent_rows(self):
+        from .absentees import materialize_absentees
+
+        materialize_absentees(day=self.day)
+        admin = User.objects.create_user(
+            username='abs-admin@example.com', password='StrongPass123', full_name='Abs Admin',
+            nin='L923456789', short_id='ADM059', role='admin'
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        resp = client.get(reverse('admin_users'))
+        self.assertEqual(resp.status_code, 200)
+        rows = {row['short_id']: row for row in resp.data}
+        self.assertEqual((rows['EMP052']['attendance_records_count'], rows['EMP052']['last_attendance']), (0, None))
+        self.assertEqual(rows['EMP051']['attendance_records_count'], 0)
+        self.assertEqual(rows['EMP050']['attendance_records_count'], 1)
+
+    def test_late_arrival_can_check_in_over_absent_row(self):
+        from types import SimpleNamespace
+        from django.test import override_settings
+        from .absentees import materialize_absentees
+        from .models import AttendanceRecord
+        from .queries import local_today, on_day
+        from .serializers import AttendanceRecordSerializer
+
+        user = self.users[2]
+        User.objects.filter(pk=user.pk).update(is_verified=True)
+        user.refresh_from_db()
+        context = {'request': SimpleNamespace(user=user)}
+        with override_settings(WORKING_WEEKDAYS=list(range(7))):
+            materialize_absentees(day=local_today())
+        serializer = AttendanceRecordSerializer(data={'attendance_type': 'check_in'}, context=context)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save(user=user)
+
+        serializer = AttendanceRecordSerializer(data={'attendance_type': 'check_in'}, context=context)
+        self.assertFalse(serializer.is_valid())
+        today = AttendanceRecord.objects.filter(on_day(local_today()), user=user)
+        self.assertEqual(sorted(today.values_list('status', flat=True)), ['absent', 'present'])
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class ReportJobTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        # Submission locks and cached results must not leak between tests
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        # Workforce snapshot versions move on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin = User.objects.create_user(
+                username='admin6@example.com', password='StrongPass123',
+                full_name='Admin Six', nin='M123456789', short_id='ADM006', role='admin'
+            )
+            self.other_admin = User.objects.create_user(
+                username='admin7@example.com', password='StrongPass123',
+                full_name='Admin Seven', nin='M223456789', short_id='ADM007', role='admin'
+            )
+            User.objects.create_user(
+                username='eve@example.com', password='StrongPass123', full_name='Eve',
+                nin='M323456789', short_id='EMP060', department='Audit'
+            )
+
+    def test_identical_requests_share_one_job(self):
+        from django.test import override_settings
+        from .models import ReportJob
+        from .reports import run_queued_jobs
+
+        with override_settings(REPORT_JOB_BACKEND='local'):
+            self.client.force_authenticate(user=self.admin)
+            resp = self.client.post(reverse('admin_report_jobs'), {'date_range': 'month'}, format='json')
+            self.assertEqual(resp.status_code, 202)
+            job_id = resp.data['job_id']
+            self.assertIsNone(resp.data['download_url'])
+
+            self.client.force_authenticate(user=self.other_admin)
+            resp = self.client.post(reverse('admin_report_jobs'), {
+                'date_range': 'month', 'department': 'all',
+            }, format='json')
+            self.assertEqual(resp.data['job_id'], job_id)
+
+            resp = self.client.get(reverse('admin_report_job_download', args=[job_id]))
+            self.assertEqual(resp.status_code, 409)
+
+            self.assertEqual(run_queued_jobs(), 1)
+            self.assertEqual(ReportJob.objects.count(), 1)
+
+            resp = self.client.get(reverse('admin_report_job', args=[job_id]))
+            self.assertEqual(resp.data['status'], 'completed')
+            resp = self.client.get(reverse('admin_report_job_download', args=[job_id]))
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.data['summary']['total_employees'], 1)
+            self.assertIn('attachment', resp['Content-Disposition'])
+
+            # A finished result is reused
+            resp = self.client.post(reverse('admin_report_jobs'), {'date_range': 'month'}, format='json')
+            self.assertEqual((resp.status_code, resp.data['job_id']), (200, job_id))
+
+    def test_thread_backend_runs_jobs_in_process(self):
+        from django.test import override_settings
+        from .models import ReportJob
+        from .reports import LocalRunner, runner
+
+        self.client.force_authenticate(user=self.admin)
+        with override_settings(REPORT_JOB_BACKEND='thread'):
+            with self.captureOnCommitCallbacks() as callbacks:
+                resp = self.client.post(reverse('admin_report_jobs'), {'date_range': 'week'}, format='json')
+        self.assertEqual(resp.status_code, 202)
+        self.assertIn(runner.wake, callbacks)
+
+        # What the woken thread does, run here so it shares the test transaction
+        local = LocalRunner()
+        local._wanted = True
+        local._run()
+        self.assertEqual(ReportJob.objects.get(job_id=resp.data['job_id']).status, 'completed')
+
+    @override_settings(REPORT_JOB_BACKEND='local', REPORT_SUBMIT_LOCK_WAIT=0.2)
+    def test_concurrent_identical_submissions_share_a_job(self):
+        import uuid
+        from django.core.cache import cache
+        from .models import ReportJob
+        from .reports import _submit_lock, normalize_params, params_hash, submit_report_job
+
+        params = normalize_params({'date_range': 'week'})
+        digest = params_hash(params)
+        self.addCleanup(cache.delete, _submit_lock(digest))
+
+        # Another request holds the lock and has just created the job
+        self.assertTrue(cache.add(_submit_lock(digest), 1))
+        other = ReportJob.objects.create(job_id=uuid.uuid4().hex, params_hash=digest, params=params)
+        job, created = submit_report_job({'date_range': 'week'}, user=self.admin)
+        self.assertEqual((job.pk, created), (other.pk, False))
+
+        # A lock never released does not block submissions for good
+        ReportJob.objects.filter(pk=other.pk).update(status='failed')
+        with self.captureOnCommitCallbacks(execute=True):
+            job, created = submit_report_job({'date_range': 'week'}, user=self.admin)
+        self.assertTrue(created)
+        self.assertIsNone(cache.get(_submit_lock(digest)))
+        self.assertEqual(ReportJob.objects.filter(params_hash=digest).count(), 2)
+
+    def test_lateness_is_the_status_recorded_at_marking(self):
+        from datetime import timedelta
+        from .models import AttendanceRecord
+        from .queries import day_start, local_today
+        from .reports import build_report
+
+        today = local_today()
+        eve = User.objects.get(short_id='EMP060')
+        # 10:00 within an admin-configured grace period, recorded on time
+        record = AttendanceRecord.objects.create(user=eve, attendance_type='check_in', status='present')
+        AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=day_start(today) + timedelta(hours=10))
+        report = build_report('today', today=today)
+        self.assertEqual((report['summary']['present_today'], report['summary']['late_today']), (1, 0))
+
+        AttendanceRecord.objects.filter(pk=record.pk).update(status='late')
+        report = build_report('today', today=today)
+        self.assertEqual(report['summary']['late_today'], 1)
+        self.assertEqual(report['attendance_trend'][-1]['late'], 1)
+
+    def test_invalid_parameters_are_rejected(self):
+        self.client.force_authenticate(user=self.admin)
+        resp = self.client.post(reverse('admin_report_jobs'), {'date_range': 'decade'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+
+class UserSerializerQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin8@example.com', password='StrongPass123',
+            full_name='Admin Eight', nin='N123456789', short_id='ADM008', role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def _add_users(self, start, count):
+        from .models import AttendanceRecord
+
+        for i in range(start, start + count):
+            user = User.objects.create_user(
+                username=f'q{i}@example.com', password='StrongPass123', full_name=f'Query {i}',
+                nin=f'N9{i:02d}456789', short_id=f'EMP07{i:02d}'
+            )
+            AttendanceRecord.objects.create(user=user, attendance_type='check_in')
+            AttendanceRecord.objects.create(user=user, attendance_type='check_out')
+
+    def _list_queries(self):
+        from django.db import connection as db_connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(db_connection) as ctx:
+            resp = self.client.get(reverse('admin_users'))
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(ctx.captured_queries)
+
+    def test_admin_user_list_uses_constant_queries(self):
+        self._add_users(0, 2)
+        _, few = self._list_queries()
+        self._add_users(2, 8)
+        resp, many = self._list_queries()
+        self.assertEqual(few, many)
+        # users, groups, permissions
+        self.assertEqual(many, 3)
+        self.assertEqual(len(resp.data), 10)
+        self.assertEqual(resp.data[0]['attendance_records_count'], 2)
+        self.assertIsNotNone(resp.data[0]['last_attendance'])
+
+    def test_user_serializer_with_prefetched_day_records(self):
+        from .serializers import UserSerializer
+
+        self._add_users(0, 3)
+        users = UserSerializer.setup_queryset(User.objects.filter(role='user'))
+        with self.assertNumQueries(4):
+            data = UserSerializer(users, many=True).data
+        self.assertEqual({row['attendance_today']['status'] for row in data}, {'marked'})
+        self.assertTrue(all(row['attendance_today']['check_out'] for row in data))
+
+
+class ProjectionRendererTests(TestCase):
+    def setUp(self):
+        from .models import AttendanceRecord
+
+        self.user = User.objects.create_user(
+            username='proj@example.com', password='StrongPass123',
+            full_name='Projection User', nin='N555666777', short_id='EMP0900', department='Finance'
+        )
+        AttendanceRecord.objects.create(
+            user=self.user, attendance_type='check_in', face_verified=True, face_confidence=0.91,
+            location={'lat': 9.05, 'lng': 7.49}
+        )
+        AttendanceRecord.objects.create(user=self.user, attendance_type='check_out', notes='done')
+
+    def test_projections_render_like_serializers(self):
+        import json
+        from .models import AttendanceRecord
+        from .projections import ATTENDANCE_RECORD, admin_user_rows
+        from .renderers import ORJSONRenderer
+        from .serializers import AdminUserSerializer, AttendanceRecordSerializer
+
+        renderer = ORJSONRenderer()
+        records = AttendanceRecord.objects.select_related('user').order_by('id')
+        self.assertEqual(
+            json.loads(renderer.render(ATTENDANCE_RECORD.rows(records))),
+            json.loads(renderer.render(AttendanceRecordSerializer(
+                records, many=True, expand=AttendanceRecordSerializer.Meta.expandable_fields
+            ).data)),
+        )
+
+        users = AdminUserSerializer.setup_queryset(User.objects.order_by('id'))
+        self.assertEqual(
+            json.loads(renderer.render(admin_user_rows(users))),
+            json.loads(renderer.render(AdminUserSerializer(
+                users, many=True, expand=AdminUserSerializer.Meta.expandable_fields
+            ).data)),
+        )
+
+    def test_weekly_endpoint_uses_projection(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        resp = client.get('/api/attendance/weekly/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('application/json'))
+        self.assertEqual(len(resp.data['records']), 2)
+        self.assertEqual(resp.data['records'][0]['user_short_id'], 'EMP0900')
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        from .models import AttendanceRecord
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='sparse@example.com', password='StrongPass123',
+            full_name='Sparse User', nin='N444555666', short_id='EMP0950',
+            face_biometric_data={'face_features': [0.1] * 128},
+        )
+        self.user.update_biometric_status()
+        self.admin = User.objects.create_user(
+            username='admin9@example.com', password='StrongPass123',
+            full_name='Admin Nine', nin='N444555667', short_id='ADM009', role='admin'
+        )
+        AttendanceRecord.objects.create(
+            user=self.user, attendance_type='check_in', face_verified=True,
+            biometric_data={'face_features': [0.2] * 128}, device_info={'agent': 'test'}
+        )
+
+    def test_user_profile_is_lean_by_default(self):
+        self.client.force_authenticate(user=self.user)
+        resp = self.client.get(reverse('user_detail'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('face_biometric_data', resp.data)
+        self.assertNotIn('ear_biometric_data', resp.data)
+        self.assertEqual(resp.data['biometric_status'], 'face_only')
+
+        resp = self.client.get(reverse('user_detail'), {'expand': 'face_biometric_data'})
+        self.assertEqual(len(resp.data['face_biometric_data']['face_features']), 128)
+
+    def test_fields_limits_keys_and_columns(self):
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('user_detail'), {'fields': 'id,full_name,biometric_status'})
+        self.assertEqual(set(resp.data), {'id', 'full_name', 'biometric_status'})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('face_biometric_data', ctx.captured_queries[0]['sql'])
+
+    def test_attendance_records_are_lean_by_default(self):
+        self.client.force_authenticate(user=self.user)
+        resp = self.client.get('/api/attendance/')
+        record = resp.data['results'][0]
+        self.assertNotIn('biometric_data', record)
+        self.assertNotIn('device_info', record)
+        self.assertEqual(record['verification_status'], 'face_verified')
+
+        resp = self.client.get('/api/attendance/today/', {'expand': 'device_info'})
+        self.assertEqual(resp.data[0]['device_info'], {'agent': 'test'})
+        self.assertNotIn('biometric_data', resp.data[0])
+
+        resp = self.client.get('/api/attendance/weekly/', {'fields': 'id,status'})
+        self.assertEqual(set(resp.data['records'][0]), {'id', 'status'})
+
+    def test_admin_user_list_fields(self):
+        self.client.force_authenticate(user=self.admin)
+        resp = self.client.get(reverse('admin_users'))
+        self.assertNotIn('face_biometric_data', resp.data[0])
+        self.assertIn('groups', resp.data[0])
+
+        resp = self.client.get(reverse('admin_users'), {'fields': 'full_name,short_id', 'page_size': 1})
+        self.assertEqual(resp.data['results'], [{'full_name': 'Sparse User', 'short_id': 'EMP0950'}])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='etag@example.com', password='StrongPass123',
+            full_name='Etag User', nin='N777888999', short_id='EMP0960'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_profile_returns_304_until_changed(self):
+        from django.test.utils import CaptureQueriesContext
+
+        resp = self.client.get(reverse('user_detail'))
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+        self.assertIn('no-cache', resp['Cache-Control'])
+        self.assertIn('private', resp['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('user_detail'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # A different field selection is a different representation
+        resp = self.client.get(reverse('user_detail'), {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.phone = '08012345678'
+            self.user.save()
+        resp = self.client.get(reverse('user_detail'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_attendance_today_changes_with_new_records(self):
+        from .models import AttendanceRecord
+
+        resp = self.client.get('/api/attendance/today/')
+        etag = resp['ETag']
+        self.assertEqual(self.client.get('/api/attendance/today/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get('/api/attendance/weekly/', HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(user=self.user, attendance_type='check_in')
+        resp = self.client.get('/api/attendance/today/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 1)
+        self.assertEqual(
+            self.client.get('/api/attendance/today/', HTTP_IF_NONE_MATCH=f'W/{resp["ETag"]}').status_code, 304
+        )
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework_simplejwt.tokens import AccessToken
+        from . import principals
+
+        cache.clear()
+        principals.cache.clear_local()
+        self.addCleanup(principals.cache.clear_local)
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='principal@example.com', password='StrongPass123',
+            full_name='Principal User', nin='N121212121', short_id='EMP0970', department='Finance'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def _user_queries(self, path):
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(path)
+        users_table = User._meta.db_table
+        return resp, [q['sql'] for q in ctx.captured_queries if f'FROM "{users_table}"' in q['sql']]
+
+    def test_principal_is_cached_between_requests(self):
+        resp, queries = self._user_queries('/api/attendance/today/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('face_biometric_data', queries[0])
+
+        resp, queries = self._user_queries('/api/attendance/today/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_principal_behaves_like_user(self):
+        from .models import AttendanceRecord
+        from .principals import LazyPrincipal, load_principal
+
+        principal = LazyPrincipal(load_principal(self.user.pk))
+        with self.assertNumQueries(1):
+            self.assertIsInstance(principal, User)
+            self.assertEqual(principal, self.user)
+            self.assertEqual(principal.department, 'Finance')
+            self.assertEqual(principal.username, 'principal@example.com')  # audit entries record it
+            self.assertEqual(AttendanceRecord.objects.filter(user=principal).count(), 0)
+        # Other attributes load the full row once
+        with self.assertNumQueries(1):
+            self.assertEqual(principal.full_name, 'Principal User')
+            self.assertEqual(principal.short_id, 'EMP0970')
+
+        # An entry cached before a field was added loads the row instead of failing
+        cached = dict(load_principal(self.user.pk))
+        del cached['username']
+        with self.assertNumQueries(1):
+            self.assertEqual(LazyPrincipal(cached).username, 'principal@example.com')
+
+    def test_user_changes_invalidate_principal(self):
+        self.client.get('/api/attendance/today/')
+        self.assertEqual(self.client.get(reverse('admin_users')).status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = 'admin'
+            self.user.save()
+        self.assertEqual(self.client.get(reverse('admin_users')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/attendance/today/').status_code, 401)
+
+    def test_profile_update_through_principal(self):
+        resp = self.client.patch(reverse('user_detail'), {'phone': '08011112222'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.phone, '08011112222')
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0, WRITE_BEHIND_INTERVAL=60)
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        from .writebehind import buffer
+
+        self.buffer = buffer
+        self.buffer.flush()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='buffer@example.com', password='StrongPass123',
+            full_name='Buffer User', nin='N131313131', short_id='EMP0980'
+        )
+
+    def test_login_defers_last_login_to_one_flush(self):
+        resp = self.client.post(reverse('token_obtain_pair'), {
+            'username': 'buffer@example.com', 'password': 'StrongPass123'
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.client.post(reverse('token_obtain_pair'), {
+            'username': 'buffer@example.com', 'password': 'StrongPass123'
+        }, format='json')
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        self.assertEqual(len(self.buffer), 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_increments_coalesce(self):
+        from .models import BiometricVerificationSession
+
+        session = BiometricVerificationSession.objects.create(
+            user=self.user, session_id='wb-session', verification_type='face', status='in_progress'
+        )
+        for _ in range(3):
+            self.buffer.increment(BiometricVerificationSession, session.pk, attempts=1)
+        self.assertEqual(self.buffer.apply_pending(session).attempts, 3)
+        with self.assertNumQueries(1):
+            self.buffer.flush()
+        session.refresh_from_db()
+        self.assertEqual(session.attempts, 3)
+
+    @override_settings(VERIFICATION_SESSION_BACKEND='database')
+    def test_session_progress_is_buffered_until_status_changes(self):
+        from .models import BiometricVerificationSession
+
+        session = BiometricVerificationSession.objects.create(
+            user=self.user, session_id='wb-session-2', verification_type='face', status='in_progress'
+        )
+        self.client.force_authenticate(user=self.user)
+        url = f'/api/biometric/session/{session.session_id}/'
+        resp = self.client.put(url, {'session_data': {'step': 2}}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        session.refresh_from_db()
+        self.assertIsNone(session.session_data)
+        self.assertEqual(self.client.get(url).data['session_data'], {'step': 2})
+
+        resp = self.client.put(url, {'status': 'completed'}, format='json')
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.session_data), ('completed', {'step': 2}))
+        self.assertIsNotNone(session.completed_at)
+        self.assertEqual(len(self.buffer), 0)
+
+    @override_settings(WRITE_BEHIND_INTERVAL=0)
+    def test_zero_interval_writes_through(self):
+        self.buffer.set(User, self.user.pk, last_login=timezone.now())
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(len(self.buffer), 0)
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class LoginHashingTests(TestCase):
+    def setUp(self):
+        from . import metrics
+
+        metrics.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='hash@example.com', password='StrongPass123',
+            full_name='Hash User', nin='N141414141', short_id='EMP0990'
+        )
+
+    def _login(self, password='StrongPass123'):
+        return self.client.post(reverse('token_obtain_pair'), {
+            'username': 'hash@example.com', 'password': password
+        }, format='json')
+
+    @override_settings(LOGIN_HASH_WORKERS=1, WRITE_BEHIND_INTERVAL=0)
+    def test_login_hashes_in_pool_and_records_metrics(self):
+        from .hashing import pool
+
+        self.addCleanup(pool.shutdown)
+        self.assertEqual(self._login().status_code, 200)
+        self.assertEqual(self._login('wrong-password').status_code, 401)
+
+        admin = User.objects.create_user(
+            username='admin10@example.com', password='StrongPass123',
+            full_name='Admin Ten', nin='N141414142', short_id='ADM010', role='admin'
+        )
+        self.client.force_authenticate(user=admin)
+        resp = self.client.get(reverse('admin_metrics'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['metrics']['login.hash']['count'], 2)
+        self.assertGreater(resp.data['metrics']['login.hash']['total_ms'], 0)
+        self.assertIn('login.queue', resp.data['metrics'])
+
+    @override_settings(LOGIN_HASH_WORKERS=0, WRITE_BEHIND_INTERVAL=0, PASSWORD_HASH_ITERATIONS=1000)
+    def test_login_rehashes_to_configured_cost(self):
+        from django.contrib.auth.hashers import identify_hasher
+
+        old = self.user.password
+        self.assertEqual(self._login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.password, old)
+        self.assertEqual(identify_hasher(self.user.password).decode(self.user.password)['iterations'], 1000)
+        self.assertTrue(self.user.check_password('StrongPass123'))
+
+    @override_settings(LOGIN_HASH_WORKERS=1, LOGIN_HASH_QUEUE=1, LOGIN_HASH_QUEUE_TIMEOUT=0.01)
+    def test_full_queue_returns_503(self):
+        from .hashing import pool
+
+        self.addCleanup(pool.shutdown)
+        pool.shutdown()
+        _, slots = pool._ensure()
+        slots.acquire()
+        self.addCleanup(slots.release)
+        resp = self._login()
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn('Retry-After', resp)
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0, ROSTER_PASSWORD_ITERATIONS=1000, LOGIN_HASH_WORKERS=0, WRITE_BEHIND_INTERVAL=0)
+class RosterImportTests(TestCase):
+    ROSTER = (
+        'Username,Password,Full Name,Short ID,NIN,Department,Office Location,Hire Date\n'
+        'roster1@example.com,StrongPass123,Roster One,ROS001,N151515151,  finance ,HQ,2024-01-15\n'
+        'roster2@example.com,,Roster Two,ROS002,N151515152,Finance,HQ,\n'
+        'roster3@example.com,StrongPass123,Roster Three,ROS003,N161616161,Finance,,\n'
+        'roster1@example.com,StrongPass123,Roster Dup,ROS004,N151515154,,,\n'
+        'roster5@example.com,StrongPass123,,ROS005,N151515155,,,15/01/2024\n'
+    )
+
+    def setUp(self):
+        User.objects.create_user(
+            username='existing@example.com', password='StrongPass123',
+            full_name='Existing User', nin='N161616161', short_id='EMP0991', department='Finance'
+        )
+
+    def test_command_imports_valid_rows_and_reports_the_rest(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Department
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'roster.csv')
+            errors_path = os.path.join(directory, 'errors.csv')
+            with open(path, 'w') as roster:
+                roster.write(self.ROSTER)
+            out = StringIO()
+            call_command('import_roster', path, '--default-password', 'Welcome123',
+                         '--workers', '2', '--errors', errors_path, stdout=out)
+            with open(errors_path) as report:
+                self.assertEqual(len(report.readlines()), 4)
+
+        self.assertIn('Created 2 of 5 users (3 rows with errors)', out.getvalue())
+        first = User.objects.get(username='roster1@example.com')
+        self.assertEqual(first.department, 'Finance')
+        self.assertEqual(first.department_ref.name, 'Finance')
+        self.assertEqual(str(first.hire_date), '2024-01-15')
+        self.assertTrue(User.objects.get(username='roster2@example.com').check_password('Welcome123'))
+        self.assertEqual(Department.objects.get(name='Finance').headcount, 3)
+
+        # Cheap import hash is replaced by the full-cost one at first login
+        self.assertIn('$1000$', first.password)
+        resp = APIClient().post(reverse('token_obtain_pair'), {
+            'username': 'roster1@example.com', 'password': 'StrongPass123'
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        first.refresh_from_db()
+        self.assertNotIn('$1000$', first.password)
+
+    def test_validation_uses_sets_and_first_duplicate_wins(self):
+        from .roster import import_roster, read_roster
+        from io import BytesIO
+
+        with self.assertNumQueries(3):
+            result = import_roster(read_roster(BytesIO(self.ROSTER.encode()), 'csv'), dry_run=True)
+        self.assertEqual((result['rows'], result['valid'], result['created']), (5, 1, 0))
+        errors = {error['row']: error['errors'] for error in result['errors']}
+        self.assertEqual(errors[3], ['password is required (or give a default password)'])
+        self.assertEqual(errors[4], ['NIN N161616161 already exists'])
+        self.assertEqual(errors[5], ['Username roster1@example.com already exists'])
+        self.assertIn('full_name is required', errors[6])
+        self.assertIn('hire_date must be in YYYY-MM-DD format', errors[6])
+        self.assertFalse(User.objects.filter(username='roster1@example.com').exists())
+
+    def test_admin_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        client = APIClient()
+        staff = User.objects.get(username='existing@example.com')
+        client.force_authenticate(user=staff)
+        upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode(), content_type='text/csv')
+        self.assertEqual(client.post(reverse('admin_roster_import'), {'file': upload}).status_code, 403)
+
+        admin = User.objects.create_user(
+            username='admin11@example.com', password='StrongPass123',
+            full_name='Admin Eleven', nin='N161616162', short_id='ADM011', role='admin'
+        )
+        client.force_authenticate(user=admin)
+        with override_settings(ROSTER_UPLOAD_MAX_ROWS=4):
+            upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode(), content_type='text/csv')
+            self.assertEqual(client.post(reverse('admin_roster_import'), {'file': upload}).status_code, 400)
+
+        upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode(), content_type='text/csv')
+        resp = client.post(reverse('admin_roster_import'), {
+            'file': upload, 'default_password': 'Welcome123'
+        })
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['created'], 2)
+        self.assertEqual(len(resp.data['errors']), 3)
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class BiometricTemplateImportTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.users = [
+            User.objects.create_user(
+                username=f'tmpl{i}@example.com', password='StrongPass123',
+                full_name=f'Template {i}', nin=f'N17171717{i}', short_id=f'TPL00{i}'
+            )
+            for i in range(3)
+        ]
+        self.users[2].face_biometric_data = {'face_features': [1.0, 0.0, 0.0, 0.0]}
+        self.users[2].update_biometric_status()
+
+    def _path(self, name):
+        import os
+        return os.path.join(self.directory.name, name)
+
+    def test_npy_with_ids_file(self):
+        import numpy as np
+        from io import StringIO
+        from django.core.management import call_command
+
+        templates = np.array([
+            [3.0, 4.0, 0.0, 0.0],   # user 0
+            [0.0, 0.0, 0.0, 0.0],   # zero vector, rejected
+            [1.0, 1.0, 1.0, 1.0],   # already enrolled
+            [0.0, 2.0, 0.0, 0.0],   # unknown NIN
+        ], dtype=np.float32)
+        np.save(self._path('face.npy'), templates)
+        with open(self._path('ids.csv'), 'w') as ids:
+            ids.write('nin\nN171717170\nN171717171\nN171717172\nN999999999\n')
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_biometric_templates', self._path('face.npy'),
+                         '--ids', self._path('ids.csv'), stdout=out)
+        self.assertIn('Updated 1 of 4 users (1 unknown, 1 invalid, 1 already enrolled)', out.getvalue())
+
+        first = User.objects.get(pk=self.users[0].pk)
+        self.assertEqual(first.face_biometric_data, {'face_features': [0.6, 0.8, 0.0, 0.0]})
+        self.assertEqual(first.biometric_verification_status, 'face_only')
+        self.assertTrue(first.is_verified)
+        self.assertIsNotNone(first.face_verification_date)
+        self.assertEqual(User.objects.get(pk=self.users[1].pk).biometric_verification_status, 'pending')
+        self.assertEqual(User.objects.get(pk=self.users[2].pk).face_biometric_data['face_features'], [1.0, 0.0, 0.0, 0.0])
+
+    def test_npz_members_are_mapped_and_matched_by_short_id(self):
+        import numpy as np
+        from .enrollment import import_templates, npz_members, open_templates, read_npz_ids
+
+        np.savez(
+            self._path('ears.npz'),
+            short_id=np.array(['TPL001', 'TPL002']),
+            ear_left=np.array([[0.0, 5.0], [2.0, 0.0]], dtype=np.float32),
+        )
+        self.assertEqual(sorted(npz_members(self._path('ears.npz'))), ['ear_left', 'short_id'])
+        ears = open_templates(self._path('ears.npz'), member='ear_left')
+        self.assertIsInstance(ears, np.memmap)
+
+        with self.assertNumQueries(4):  # index load, then one bulk_update in a savepoint
+            result = import_templates(read_npz_ids(self._path('ears.npz'), 'short_id'),
+                                      {'ear_left': ears}, match='short_id')
+        self.assertEqual(result['updated'], 2)
+        second = User.objects.get(pk=self.users[2].pk)
+        self.assertEqual(second.biometric_verification_status, 'both')
+        self.assertEqual(second.ear_biometric_data, {
+            'ear_features': [], 'ear_left_features': [1.0, 0.0], 'ear_right_features': []
+        })
+
+    def test_raw_float32_needs_dim(self):
+        import numpy as np
+        from .enrollment import import_templates, open_templates
+
+        np.array([[0.0, 0.0, 9.0]], dtype='<f4').tofile(self._path('face.f32'))
+        with self.assertRaises(ValueError):
+            open_templates(self._path('face.f32'))
+        templates = open_templates(self._path('face.f32'), dim=3)
+        result = import_templates(['N171717171'], {'face': templates}, dry_run=True)
+        self.assertEqual((result['updated'], result['dry_run']), (1, True))
+        self.assertIsNone(User.objects.get(pk=self.users[1].pk).face_biometric_data)
+
+
+@override_settings(VERIFICATION_SESSION_BACKEND='cache', WRITE_BEHIND_INTERVAL=0)
+class VerificationSessionStoreTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='vsession@example.com', password='StrongPass123',
+            full_name='Session User', nin='N181818181', short_id='EMP0992',
+            face_biometric_data={'face_features': [0.1, 0.2]}
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _start(self):
+        resp = self.client.post(reverse('biometric_verify'))
+        self.assertEqual(resp.status_code, 200)
+        return f"/api/biometric/session/{resp.data['session_id']}/", resp.data['session_id']
+
+    def test_live_session_stays_in_cache_until_its_outcome(self):
+        from .models import BiometricVerificationSession
+
+        url, session_id = self._start()
+        with self.assertNumQueries(0):
+            resp = self.client.put(url, {'attempt': True, 'session_data': {'step': 1}}, format='json')
+        self.assertEqual((resp.data['attempts'], resp.data['status']), (1, 'in_progress'))
+        self.assertFalse(BiometricVerificationSession.objects.exists())
+
+        resp = self.client.put(url, {'status': 'completed'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        row = BiometricVerificationSession.objects.get(session_id=session_id)
+        self.assertEqual((row.status, row.attempts, row.session_data), ('completed', 1, {'step': 1}))
+        self.assertIsNotNone(row.completed_at)
+        self.assertLess(row.created_at, row.completed_at)
+
+        # Finished sessions are read from the audit row and cannot be reopened
+        self.assertEqual(self.client.get(url).data['status'], 'completed')
+        self.assertEqual(self.client.put(url, {'status': 'in_progress'}, format='json').status_code, 400)
+
+    def test_progress_racing_a_finish_does_not_revive_the_session(self):
+        from .verification_sessions import CacheSessionStore, SessionFinished
+
+        url, session_id = self._start()
+        store = CacheSessionStore()
+        stale = store.get(self.user, session_id)  # read before the finish below
+        store.update(store.get(self.user, session_id), status='completed')
+        with self.assertRaises(SessionFinished):
+            store.update(stale, session_data={'step': 2})
+
+        session = store.get(self.user, session_id)
+        self.assertEqual(session.status, 'completed')
+        self.assertNotEqual(session.session_data, {'step': 2})
+        self.assertEqual(self.client.put(url, {'session_data': {'step': 3}}, format='json').status_code, 400)
+
+    def test_attempts_are_counted_and_capped(self):
+        from .models import BiometricVerificationSession
+
+        url, session_id = self._start()
+        for expected in (1, 2, 3):
+            # A client-supplied count no longer sets the value
+            resp = self.client.put(url, {'attempts': 99}, format='json')
+            self.assertEqual(resp.data['attempts'], expected)
+        resp = self.client.put(url, {'attempt': True}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data['error'], 'Maximum attempts reached')
+        row = BiometricVerificationSession.objects.get(session_id=session_id)
+        self.assertEqual((row.status, row.attempts), ('failed', 3))
+
+    def test_expired_and_foreign_sessions_are_not_found(self):
+        from datetime import timedelta
+        from django.core.cache import cache
+        from .verification_sessions import CacheSessionStore
+
+        url, session_id = self._start()
+        other = User.objects.create_user(
+            username='vsession2@example.com', password='StrongPass123',
+            full_name='Other User', nin='N181818182', short_id='EMP0993'
+        )
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        store = CacheSessionStore()
+        state = cache.get(store._key(session_id))
+        state['created_at'] -= timedelta(hours=1)
+        cache.set(store._key(session_id), state)
+        self.assertIsNone(store.get(self.user, session_id))
+
+    @override_settings(VERIFICATION_SESSION_BACKEND='database')
+    def test_database_backend_caps_attempts_atomically(self):
+        from .models import BiometricVerificationSession
+
+        url, session_id = self._start()
+        self.assertTrue(BiometricVerificationSession.objects.filter(session_id=session_id).exists())
+        BiometricVerificationSession.objects.filter(session_id=session_id).update(attempts=2)
+        self.assertEqual(self.client.put(url, {'attempt': True}, format='json').data['attempts'], 3)
+        self.assertEqual(self.client.put(url, {'attempt': True}, format='json').status_code, 400)
+        row = BiometricVerificationSession.objects.get(session_id=session_id)
+        self.assertEqual((row.status, row.attempts), ('failed', 3))
+        self.assertIsNotNone(row.completed_at)
+
+
+class SharedMemoryCacheTests(TestCase):
+    def _cache(self, **options):
+        import os
+        import tempfile
+        from .shared_cache import SharedMemoryCache
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return SharedMemoryCache(os.path.join(directory.name, 'cache.sqlite3'), {'OPTIONS': options})
+
+    def test_cache_api(self):
+        cache = self._cache()
+        cache.set('a', {'x': 1})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 5))
+        self.assertEqual(cache.incr('b', 3), 8)
+        self.assertEqual(cache.decr('b'), 7)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        self.assertEqual(cache.get_many(['a', 'b', 'missing']), {'a': {'x': 1}, 'b': 7})
+
+        cache.set('gone', 1, timeout=0)
+        self.assertIsNone(cache.get('gone'))
+        self.assertTrue(cache.add('gone', 2))  # an expired entry can be added over
+        self.assertTrue(cache.touch('gone', timeout=None))
+        self.assertTrue(cache.has_key('gone'))
+
+        cache.delete_many(['a', 'b'])
+        self.assertEqual(cache.get_many(['a', 'b']), {})
+        cache.clear()
+        self.assertIsNone(cache.get('gone'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self._cache(MAX_ENTRIES=3, CULL_FREQUENCY=3, CULL_EVERY=1, LRU_RESOLUTION=0)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_increments_from_forked_workers_are_atomic(self):
+        import os
+
+        cache = self._cache()
+        cache.set('hits', 0)
+        children = []
+        for _ in range(4):
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover - runs in the child
+                try:
+                    for _ in range(50):
+                        cache.incr('hits')
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+        self.assertEqual(cache.get('hits'), 200)
+
+    def test_cache_file_must_be_private(self):
+        import os
+        import stat
+        from django.core.exceptions import ImproperlyConfigured
+        from .shared_cache import SharedMemoryCache, default_location
+
+        path = default_location()
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode), 0o700)
+
+        cache = self._cache()
+        cache.set('a', 1)
+        self.assertEqual(stat.S_IMODE(os.stat(cache._path).st_mode) & 0o077, 0)
+        os.chmod(cache._path, 0o666)
+        with self.assertRaises(ImproperlyConfigured):
+            SharedMemoryCache(cache._path, {}).get('a')
+
+
+@override_settings(TIERED_CACHE_VERSION_CHECK=0)
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from . import metrics, tiered_cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.loads = 0
+        # Two instances of one namespace stand in for two worker processes;
+        # the bus delivers to the last one created
+        self.peer = tiered_cache.TwoTierCache('test-tier')
+        self.tier = tiered_cache.TwoTierCache('test-tier', size=2)
+        self.peer.l1, self.peer.l2 = self.tier.l1, self.tier.l2
+        self.addCleanup(tiered_cache._namespaces.pop, 'test-tier', None)
+        for name in ('cache.test-tier.l1', 'cache.test-tier.l2'):
+            self.addCleanup(metrics.REGISTRY.pop, name, None)
+
+    def _load(self):
+        self.loads += 1
+        return {'value': self.loads}
+
+    def test_tiers_and_hit_ratio(self):
+        from . import metrics
+
+        self.assertEqual(self.tier.get('k', self._load), {'value': 1})  # miss, miss, load
+        self.assertEqual(self.tier.get('k', self._load), {'value': 1})  # L1 hit
+        self.assertEqual(self.peer.get('k', self._load), {'value': 1})  # L1 miss, L2 hit
+        self.assertEqual(self.loads, 1)
+        self.assertIsNone(self.tier.get('absent'))
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['cache.test-tier.l1']['hits'], 1)
+        self.assertEqual(snapshot['cache.test-tier.l1']['misses'], 3)
+        self.assertEqual(snapshot['cache.test-tier.l2']['hit_ratio'], 0.3333)
+
+    def test_lru_keeps_recently_used(self):
+        for key in ('a', 'b'):
+            self.tier.get(key, self._load)
+        self.tier.get('a')
+        self.tier.get('c', self._load)
+        self.assertEqual(list(self.tier._entries), ['a', 'c'])
+
+    def test_invalidation_reaches_other_processes(self):
+        self.tier.get('k', self._load)
+        self.peer.get('k', self._load)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tier.invalidate('k')
+        self.assertEqual(self.peer.get('k', self._load), {'value': 2})
+        self.assertEqual(self.tier.get('k', self._load), {'value': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.peer.invalidate_all()
+        self.assertEqual(self.tier.get('k', self._load), {'value': 3})
+        self.assertEqual(self.peer.get('k', self._load), {'value': 3})
+
+    def test_value_loaded_across_an_invalidation_is_not_stored(self):
+        from django.core.cache import cache
+
+        def load_then_invalidated():
+            # The row was read, then another process committed a change
+            self.peer._invalidate(['k'])
+            return {'value': 'old'}
+
+        self.assertEqual(self.tier.get('k', load_then_invalidated), {'value': 'old'})
+        self.assertIsNone(cache.get(self.tier._key('k')))
+        self.assertNotIn('k', self.tier._entries)
+        self.assertEqual(self.tier.get('k', self._load), {'value': 1})
+        self.assertEqual(cache.get(self.tier._key('k')), {'value': 1})
+
+    def test_other_processes_drop_only_invalidated_keys(self):
+        from django.core.cache import cache
+
+        for key in ('a', 'b'):
+            self.peer.get(key, self._load)
+        self.peer.get('a')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tier.invalidate('a')
+        self.peer._check_version()
+        self.assertEqual(list(self.peer._entries), ['b'])
+
+        # A lost log entry means the changed keys are unknown: clear everything
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tier.invalidate('a')
+        cache.delete(self.tier._log_key(cache.get(self.tier._version_key())))
+        self.peer._check_version()
+        self.assertEqual(list(self.peer._entries), [])
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0, TIERED_CACHE_VERSION_CHECK=0)
+class SystemSettingsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from . import system_settings
+
+        cache.clear()
+        system_settings.cache.clear_local()
+        self.addCleanup(system_settings.cache.clear_local)
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='settings-admin@example.com', password='StrongPass123',
+            full_name='Settings Admin', nin='S505050505', short_id='ADM050', role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_defaults_come_from_django_settings(self):
+        from django.conf import settings
+
+        resp = self.client.get(reverse('admin_settings'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(set(resp.data), {'biometric', 'attendance', 'security', 'notifications'})
+        self.assertEqual(resp.data['biometric']['face_recognition_tolerance'], settings.FACE_RECOGNITION_TOLERANCE)
+        self.assertEqual(resp.data['attendance']['work_start_time'], settings.WORK_START_TIME)
+        with override_settings(WORKING_WEEKDAYS=list(range(6))):
+            resp = self.client.get(reverse('admin_settings'))
+        self.assertEqual(resp.data['attendance']['working_weekdays'], list(range(6)))
+
+    def test_update_stores_only_overrides(self):
+        from .models import SystemSetting
+
+        form = self.client.get(reverse('admin_settings')).data
+        form['biometric']['face_recognition_tolerance'] = 0.75
+        form['attendance']['late_threshold_minutes'] = 15
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('admin_settings'), form, format='json')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(
+            sorted(resp.data['changed']),
+            ['attendance.late_threshold_minutes', 'biometric.face_recognition_tolerance'],
+        )
+        self.assertEqual(SystemSetting.objects.count(), 2)
+        self.assertEqual(SystemSetting.objects.get(name='late_threshold_minutes').updated_by, self.admin)
+
+        resp = self.client.get(reverse('admin_settings'))
+        self.assertEqual(resp.data['biometric']['face_recognition_tolerance'], 0.75)
+        self.assertEqual(resp.data['attendance']['late_threshold_minutes'], 15)
+
+        # Null (or the default value) drops the override again
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('admin_settings'), {'attendance': {'late_threshold_minutes': None}}, format='json')
+        self.assertEqual(resp.data['settings']['attendance']['late_threshold_minutes'], 0)
+        self.assertEqual(SystemSetting.objects.count(), 1)
+
+    def test_invalid_updates_are_rejected(self):
+        from .models import SystemSetting
+
+        resp = self.client.post(reverse('admin_settings'), {
+            'biometric': {'face_recognition_tolerance': 1.5, 'max_attempts': 'three', 'colour': 'red'},
+            'attendance': {'work_start_time': '9am', 'public_holidays': ['2025-02-30']},
+            'payroll': {},
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(set(resp.data['biometric']), {'face_recognition_tolerance', 'max_attempts', 'colour'})
+        self.assertEqual(set(resp.data['attendance']), {'work_start_time', 'public_holidays'})
+        self.assertIn('payroll', resp.data)
+
+        resp = self.client.post(reverse('admin_settings'), {
+            'attendance': {'work_start_time': '18:00'},
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('work_end_time', resp.data['attendance'])
+        self.assertFalse(SystemSetting.objects.exists())
+
+        staff = User.objects.create_user(
+            username='settings-staff@example.com', password='StrongPass123',
+            full_name='Settings Staff', nin='S606060606', short_id='EMP0606'
+        )
+        self.client.force_authenticate(user=staff)
+        self.assertEqual(self.client.get(reverse('admin_settings')).status_code, 403)
+
+    def test_hot_path_reads_cached_snapshot(self):
+        from . import system_settings
+        from .absence import working_day_mask
+        from datetime import date
+
+        self.assertEqual(system_settings.get('biometric', 'max_attempts'), 3)  # loads once
+        with self.assertNumQueries(0):
+            system_settings.get('biometric', 'face_recognition_tolerance')
+            system_settings.get_time('attendance', 'work_start_time')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            system_settings.update({('attendance', 'working_weekdays'): [0, 1, 2, 3, 4, 5]})
+        # 2025-03-08 is a Saturday
+        self.assertTrue(working_day_mask(date(2025, 3, 8), date(2025, 3, 8))[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(system_settings.get('attendance', 'working_weekdays'), [0, 1, 2, 3, 4, 5])
+
+    def test_mark_and_sessions_follow_settings(self):
+        from . import system_settings
+
+        user = User.objects.create_user(
+            username='settings-mark@example.com', password='StrongPass123',
+            full_name='Settings Mark', nin='S707070707', short_id='EMP0707',
+            face_biometric_data={'face_features': [0.1] * 128}, biometric_verification_status='face_only',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            system_settings.update({
+                ('biometric', 'enable_face_recognition'): False,
+                ('biometric', 'max_attempts'): 5,
+                ('attendance', 'work_start_time'): '00:00',
+            })
+        self.client.force_authenticate(user=user)
+
+        resp = self.client.post(reverse('biometric_verify'), {}, format='json')
+        self.assertEqual(resp.data['max_attempts'], 5)
+
+        resp = self.client.post(reverse('attendance_mark'), {
+            'attendance_type': 'check_in', 'face_verified': True, 'ear_verified': False,
+            'biometric_data': {
+                'face_features': [0.1] * 128, 'confidence': 0.9,
+                'timestamp': timezone.now().isoformat(), 'verification_type': 'face',
+            },
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertFalse(resp.data['attendance']['face_verified'])
+        self.assertEqual(resp.data['attendance']['verification_method'], 'manual')
+        # Office-local clock is past 00:00 with no grace period
+        self.assertEqual(resp.data['attendance']['status'], 'late')
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0, WRITE_BEHIND_INTERVAL=0, TIERED_CACHE_VERSION_CHECK=0)
+class AuditLogTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from . import system_settings
+
+        cache.clear()
+        system_settings.cache.clear_local()
+        self.addCleanup(system_settings.cache.clear_local)
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='audit-admin@example.com', password='StrongPass123',
+            full_name='Audit Admin', nin='A808080808', short_id='ADM080', role='admin', department='IT'
+        )
+
+    def test_actions_are_recorded_and_listed(self):
+        from .models import AuditLog
+
+        self.client.post(reverse('token_obtain_pair'), {
+            'username': 'audit-admin@example.com', 'password': 'wrong'
+        }, format='json', REMOTE_ADDR='10.0.0.7')
+        self.client.post(reverse('token_obtain_pair'), {
+            'username': 'audit-admin@example.com', 'password': 'StrongPass123'
+        }, format='json', HTTP_X_FORWARDED_FOR='203.0.113.9, 10.0.0.1')
+        self.client.force_authenticate(user=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin_settings'), {'biometric': {'max_attempts': 4}}, format='json')
+
+        failed, login, settings_update = AuditLog.objects.order_by('id')
+        self.assertEqual((failed.action_type, failed.status, failed.user_id), ('login', 'failure', None))
+        self.assertEqual((failed.username, failed.ip_address), ('audit-admin@example.com', '10.0.0.7'))
+        self.assertEqual((login.user_id, login.role, login.ip_address), (self.admin.pk, 'admin', '203.0.113.9'))
+        self.assertEqual(settings_update.details, {'biometric.max_attempts': 4})
+
+        resp = self.client.get(reverse('admin_audit_logs'), {'action_type': 'login', 'status': 'failure'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['total'], 1)
+        self.assertEqual(resp.data['logs'][0]['user_name'], 'audit-admin@example.com')
+
+        resp = self.client.get(reverse('admin_audit_logs'), {'search': 'settings'})
+        self.assertEqual([log['action'] for log in resp.data['logs']], ['Settings Update'])
+        log = resp.data['logs'][0]
+        self.assertEqual((log['user_name'], log['department']), ('Audit Admin', 'IT'))
+        self.assertIsInstance(log['details'], str)
+
+        resp = self.client.get(reverse('admin_audit_summary'))
+        self.assertEqual(resp.data['total_actions'], 3)
+        self.assertEqual(resp.data['failed_actions'], 1)
+        self.assertEqual(resp.data['unique_users'], 1)
+        self.assertEqual(resp.data['top_actions'][0], {'action': 'User Login', 'count': 2})
+        self.assertEqual(resp.data['recent_activities'][0]['action'], 'Settings Update')
+
+        self.assertEqual(self.client.get(reverse('admin_audit_logs'), {'start_date': '2025-13-01'}).status_code, 400)
+        staff = User.objects.create_user(
+            username='audit-staff@example.com', password='StrongPass123',
+            full_name='Audit Staff', nin='A909090909', short_id='EMP0909'
+        )
+        self.client.force_authenticate(user=staff)
+        self.assertEqual(self.client.get(reverse('admin_audit_logs')).status_code, 403)
+
+    def test_list_pages_by_cursor_and_summary_is_windowed(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import AuditLog
+
+        now = timezone.now()
+        for days_ago, action in ((90, 'Old Export'), (2, 'Export'), (0, 'Export')):
+            AuditLog.objects.create(
+                timestamp=now - timedelta(days=days_ago), user=self.admin, username=self.admin.username,
+                action=action, action_type='export',
+            )
+        self.client.force_authenticate(user=self.admin)
+
+        resp = self.client.get(reverse('admin_audit_logs'), {'limit': 2})
+        self.assertEqual(resp.data['total'], 3)
+        self.assertEqual([log['action'] for log in resp.data['logs']], ['Export', 'Export'])
+        self.assertIsNone(resp.data['previous'])
+        resp = self.client.get(resp.data['next'])
+        self.assertEqual([log['action'] for log in resp.data['logs']], ['Old Export'])
+        self.assertIsNone(resp.data['next'])
+
+        resp = self.client.get(reverse('admin_audit_summary'))
+        self.assertEqual((resp.data['days'], resp.data['total_logs'], resp.data['today_logs']), (30, 2, 1))
+        self.assertEqual(resp.data['top_actions'], [{'action': 'Export', 'count': 2}])
+        resp = self.client.get(reverse('admin_audit_summary'), {'days': 365})
+        self.assertEqual(resp.data['total_logs'], 3)
+
+    def test_entries_are_append_only(self):
+        from .audit import writer
+        from .models import AuditLog
+
+        entry = writer.record('Roster Import', 'system', details={'rows': 1})
+        self.assertIsNotNone(entry.pk)
+        with self.assertRaises(TypeError):
+            entry.save()
+        with self.assertRaises(TypeError):
+            AuditLog.objects.filter(pk=entry.pk).update(status='failure')
+        with self.assertRaises(TypeError):
+            AuditLog.objects.all().delete()
+
+    @override_settings(AUDIT_FLUSH_INTERVAL=60, AUDIT_BATCH_SIZE=3, AUDIT_QUEUE_SIZE=2, AUDIT_QUEUE_TIMEOUT=0.01)
+    def test_writer_batches_applies_backpressure_and_drains(self):
+        import threading
+        import time
+        from . import audit, metrics
+        from .models import AuditLog
+
+        class CollectingWriter(audit.AuditWriter):
+            """Collects batches instead of inserting them (the test database is not shared with threads)"""
+            def __init__(self):
+                super().__init__()
+                self.batches = []
+                self.release = threading.Event()
+                self.release.set()
+
+            def _write(self, batch):
+                if threading.current_thread().name == 'audit-writer':
+                    self.release.wait(5)
+                self.batches.append((threading.current_thread().name, [entry.action for entry in batch]))
+                return len(batch)
+
+        writer = CollectingWriter()
+        self.addCleanup(writer.drain, 1)
+
+        def wait_for(count):
+            deadline = time.monotonic() + 5
+            while len(writer.batches) < count and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        # A full batch goes out without waiting for the interval
+        for action in ('a', 'b', 'c'):
+            writer.submit(AuditLog(action=action, action_type='system'))
+        wait_for(1)
+        self.assertEqual(writer.batches, [('audit-writer', ['a', 'b', 'c'])])
+
+        # Writer stuck on the database: once the queue is full, the caller writes
+        metrics.REGISTRY['audit.backpressure'].reset()
+        writer.release.clear()
+        for action in ('x', 'y', 'z'):
+            writer.submit(AuditLog(action=action, action_type='system'))
+        deadline = time.monotonic() + 5
+        while len(writer) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for action in ('p', 'q', 'r'):
+            writer.submit(AuditLog(action=action, action_type='system'))
+        self.assertEqual(writer.batches[-1], (threading.current_thread().name, ['r', 'p', 'q']))
+        self.assertEqual(metrics.snapshot()['audit.backpressure']['count'], 3)
+
+        # Drain writes what is still queued, well before the 60s interval
+        writer.release.set()
+        started = time.monotonic()
+        writer.drain(timeout=5)
+        self.assertLess(time.monotonic() - started, 5)
+        written = [action for _, batch in writer.batches for action in batch]
+        self.assertEqual(sorted(written), ['a', 'b', 'c', 'p', 'q', 'r', 'x', 'y', 'z'])
@@ -0,0 +1,313 @@
+"""Two-tier cache for hot, rarely-changing data.
+
+Principals, thresholds, schedules and department lists are read on nearly
+every request and change rarely. ``TwoTierCache`` keeps them:
+
+* in L1, a per-process LRU of ``size`` entries, each kept at most
+  ``local_ttl`` seconds;
+* in L2, the Django cache shared by every process (``shared_ttl``).
+
+Coherence across processes is kept two ways. ``invalidate`` publishes the
+key on an invalidation bus: Redis pub/sub when ``REDIS_URL`` is set, so
+every process drops its L1 copy at once, or an in-process ``LocalBus``
+otherwise (and in tests). Each invalidation also bumps the namespace's
+version key in L2 and logs the keys it dropped under the new version. Every
+process compares that version at most once per
+``TIERED_CACHE_VERSION_CHECK`` seconds and drops the logged keys from its
+L1; it clears the whole L1 only when the log is incomplete (expired,
+evicted, or more than ``MAX_LOGGED_VERSIONS`` behind). Without pub/sub that
+is how other processes learn of an invalidation; with it, it covers lost
+messages. ``local_ttl`` bounds staleness either way.
+
+A miss loads the value and stores it only if the version and generation
+did not move while loading, and takes it back out if they moved while
+storing. A value read before a concurrent invalidation committed therefore
+never outlives it in L2.
+
+``invalidate_all`` bumps a generation number that is part of every L2 key
+name, so the whole namespace is dropped from L2 without listing its keys;
+other processes move to the new generation at their next version check.
+
+Hits and misses of each tier are exported as ``cache.<namespace>.l1`` and
+``.l2`` on the admin metrics endpoint.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db import transaction
+
+from . import counters, metrics
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'attendance:tiered-cache'
+# Versions a process may fall behind and still drop just the logged keys
+MAX_LOGGED_VERSIONS = 256
+_MISSING = object()
+
+_namespaces: Dict[str, 'TwoTierCache'] = {}
+
+
+# Invalidation buses ---------------------------------------------------------
+
+def _dispatch(namespace: str, key) -> None:
+    tier = _namespaces.get(namespace)
+    if tier is not None:
+        tier._drop_local(key)
+
+
+class LocalBus:
+    """Delivers invalidations to this process only."""
+    cross_process = False
+
+    def ensure_listening(self) -> None:
+        pass
+
+    def publish(self, namespace: str, key) -> None:
+        _dispatch(namespace, key)
+
+
+class RedisBus:
+    """Redis pub/sub: every subscribed process drops its L1 copy straight away."""
+    cross_process = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self._url = url
+        self._client = redis.Redis.from_url(url)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def publish(self, namespace: str, key) -> None:
+        self.ensure_listening()
+        _dispatch(namespace, key)
+        try:
+            self._client.publish(CHANNEL, json.dumps([namespace, key]))
+        except Exception:
+            logger.exception('Could not publish cache invalidation; peers rely on local TTLs')
+
+    def ensure_listening(self) -> None:
+        pid = os.getpid()
+        if self._pid != pid or self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != pid or self._thread is None or not self._thread.is_alive():
+                    import redis
+
+                    # Forked: the parent's connection pool is not ours to use
+                    self._client = redis.Redis.from_url(self._url)
+                    self._pid = pid
+                    self._thread = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+                    self._thread.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Anything published while we were not listening is lost
+                for tier in list(_namespaces.values()):
+                    tier.clear_local()
+                for message in pubsub.listen():
+                    namespace, key = json.loads(message['data'])
+                    _dispatch(namespace, key)
+            except Exception:
+                logger.exception('Cache invalidation subscriber failed; reconnecting')
+                time.sleep(1)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                backend = settings.CACHES['default']
+                if backend['BACKEND'].endswith('.RedisCache') and getattr(settings, 'TIERED_CACHE_PUBSUB', True):
+                    _bus = RedisBus(backend['LOCATION'])
+                else:
+                    _bus = LocalBus()
+    return _bus
+
+
+# Cache ----------------------------------------------------------------------
+
+class TwoTierCache:
+    def __init__(self, namespace: str, size: int = 1024,
+                 local_ttl: Optional[Callable[[], float]] = None,
+                 shared_ttl: Optional[Callable[[], Optional[float]]] = None):
+        """``local_ttl``/``shared_ttl`` are callables so they follow settings overrides."""
+        self.namespace = namespace
+        self.size = size
+        self._local_ttl = local_ttl or (lambda: getattr(settings, 'TIERED_CACHE_LOCAL_TTL', 30))
+        self._shared_ttl = shared_ttl or (lambda: getattr(settings, 'TIERED_CACHE_SHARED_TTL', 300))
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._generation = 0
+        self._checked_at = 0.0
+        self.l1 = metrics.HitRatio(f'cache.{namespace}.l1', f'In-process tier of the {namespace} cache')
+        self.l2 = metrics.HitRatio(f'cache.{namespace}.l2', f'Shared tier of the {namespace} cache (after L1 misses)')
+        _namespaces[namespace] = self
+
+    def _key(self, key) -> str:
+        return f'attendance:tier:{self.namespace}:{self._generation}:{key}'
+
+    def _version_key(self) -> str:
+        return f'attendance:tier:{self.namespace}:version'
+
+    def _generation_key(self) -> str:
+        return f'attendance:tier:{self.namespace}:generation'
+
+    def _log_key(self, version: int) -> str:
+        return f'attendance:tier:{self.namespace}:invalidated:{version}'
+
+    # L1 ---------------------------------------------------------------------
+
+    def _check_version(self) -> None:
+        interval = getattr(settings, 'TIERED_CACHE_VERSION_CHECK', 1.0)
+        now = time.monotonic()
+        if now - self._checked_at < interval:
+            return
+        self._checked_at = now
+        get_bus().ensure_listening()
+        current = shared_cache.get_many([self._version_key(), self._generation_key()])
+        version, generation = current.get(self._version_key(), 0), current.get(self._generation_key(), 0)
+        if generation != self._generation:
+            self.clear_local()
+        elif version != self._version:
+            self._drop_logged(self._version, version)
+        self._version, self._generation = version, generation
+
+    def _drop_logged(self, seen: Optional[int], version: int) -> None:
+        """Drop the keys invalidated after version ``seen`` up to ``version``."""
+        if seen is None or not 0 < version - seen <= MAX_LOGGED_VERSIONS:
+            self.clear_local()
+            return
+        logged = shared_cache.get_many([self._log_key(number) for number in range(seen + 1, version + 1)])
+        if len(logged) < version - seen:
+            # Which keys changed is no longer known
+            self.clear_local()
+            return
+        with self._lock:
+            for keys in logged.values():
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def _get_local(self, key):
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value) -> None:
+        ttl = self._local_ttl()
+        if ttl <= 0 or self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _drop_local(self, key) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def clear_local(self) -> None:
+        self._drop_local(None)
+
+    # Public API -------------------------------------------------------------
+
+    def get(self, key, loader: Optional[Callable[[], Any]] = None, default=None):
+        """The value for ``key`` from L1, L2 or ``loader()`` (None results are not cached)."""
+        value = self._get_local(key)
+        if value is not _MISSING:
+            self.l1.hit()
+            return value
+        self.l1.miss()
+
+        value = shared_cache.get(self._key(key), _MISSING)
+        if value is not _MISSING:
+            self.l2.hit()
+            self._set_local(key, value)
+            return value
+        self.l2.miss()
+
+        if loader is None:
+            return default
+        stamp = self._stamp()
+        value = loader()
+        if value is not None:
+            self._store_loaded(key, value, stamp)
+        return value
+
+    def _stamp(self) -> tuple:
+        current = shared_cache.get_many([self._version_key(), self._generation_key()])
+        return current.get(self._version_key(), 0), current.get(self._generation_key(), 0)
+
+    def _store_loaded(self, key, value, stamp: tuple) -> None:
+        # Something was invalidated while loading: the value may predate it
+        if self._stamp() != stamp:
+            return
+        shared_cache.set(self._key(key), value, self._shared_ttl())
+        if self._stamp() != stamp:
+            # Invalidated between the check and the store; the delete may have run first
+            shared_cache.delete(self._key(key))
+            return
+        self._set_local(key, value)
+
+    def set(self, key, value) -> None:
+        shared_cache.set(self._key(key), value, self._shared_ttl())
+        self._set_local(key, value)
+
+    def _invalidate(self, keys: Iterable) -> None:
+        keys = list(keys)
+        # Bump before deleting, so a concurrent load either sees the new
+        # version or stored its value before the delete. Peers read the log
+        # at their next version check; it is kept long enough that a process
+        # checking at all recently finds it.
+        version = counters.incr(self._version_key())
+        shared_cache.set(self._log_key(version), keys, max(self._local_ttl() * 2, 60))
+        shared_cache.delete_many([self._key(key) for key in keys])
+        bus = get_bus()
+        for key in keys:
+            self._drop_local(key)
+            bus.publish(self.namespace, key)
+
+    def invalidate(self, *keys) -> None:
+        """Forget ``keys`` in every process once the current transaction commits."""
+        if keys:
+            transaction.on_commit(lambda: self._invalidate(keys))
+
+    def invalidate_all(self) -> None:
+        """Forget the whole namespace in every process once the transaction commits."""
+        def run():
+            self._generation = counters.incr(self._generation_key())
+            self.clear_local()
+            get_bus().publish(self.namespace, None)
+        transaction.on_commit(run)
+
@@ -4,7 +4,8 @@ from .views import (
     UserDetailView, AttendanceRecordViewSet, RegisterView,
     BiometricRegistrationView, BiometricVerificationView, AttendanceWithBiometricView,
     AdminDashboardView, AdminUserManagementView, BiometricSessionView,
-    AdminReportsView, AdminSettingsView, AdminAuditLogsView, AdminAuditSummaryView
+    AdminReportsView, AdminReportJobsView, AdminReportJobView, AdminReportJobDownloadView,
+    AdminAbsenceView, AdminDepartmentsView, AdminMetricsView, AdminRosterImportView, AdminSettingsView, AdminAuditLogsView, AdminAuditSummaryView
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -32,7 +33,14 @@ urlpatterns = [
     # Admin endpoints
     path('admin/dashboard/', AdminDashboardView.as_view(), name='admin_dashboard'),
     path('admin/users/', AdminUserManagementView.as_view(), name='admin_users'),
+    path('admin/users/import/', AdminRosterImportView.as_view(), name='admin_roster_import'),
     path('admin/reports/', AdminReportsView.as_view(), name='admin_reports'),
+    path('admin/reports/jobs/', AdminReportJobsView.as_view(), name='admin_report_jobs'),
+    path('admin/reports/jobs/<str:job_id>/', AdminReportJobView.as_view(), name='admin_report_job'),
+    path('admin/reports/jobs/<str:job_id>/download/', AdminReportJobDownloadView.as_view(), name='admin_report_job_download'),
+    path('admin/absence/', AdminAbsenceView.as_view(), name='admin_absence'),
+    path('admin/departments/', AdminDepartmentsView.as_view(), name='admin_departments'),
+    path('admin/metrics/', AdminMetricsView.as_view(), name='admin_metrics'),
     path('admin/settings/', AdminSettingsView.as_view(), name='admin_settings'),
     path('admin/audit-logs/', AdminAuditLogsView.as_view(), name='admin_audit_logs'),
     path('admin/audit-summary/', AdminAuditSummaryView.as_view(), name='admin_audit_summary'),
@@ -0,0 +1,217 @@
+"""Where live biometric verification sessions are kept.
+
+A session is started for every verification and updated by the scanner as
+it goes. With ``VERIFICATION_SESSION_BACKEND = 'cache'`` (the default when
+Redis is configured) a live session lives only in the shared cache:
+
+* it expires on its own after ``SESSION_EXPIRY_SECONDS``, measured from
+  when it started, so abandoned sessions need no clean-up;
+* attempts are a separate cache counter, incremented atomically and capped
+  at ``max_attempts``; an attempt past the cap fails the session;
+* a ``BiometricVerificationSession`` row is written once, when the session
+  reaches a final status, as the audit record. A "finished" marker is set
+  before the live state is deleted; reads and progress writes check it, so
+  an update racing the finish cannot bring the session back to life.
+
+With ``'database'`` (the default with the per-process local cache, which
+other workers cannot see) the row is created up front as before. Attempts
+are then a conditional ``UPDATE``, which is just as atomic, and progress
+within a status goes through the write-behind buffer.
+
+Either way a client can no longer set ``attempts`` directly; every update
+that reports an attempt adds one.
+"""
+from __future__ import annotations
+
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from . import system_settings
+from .archive import SESSION_EXPIRY_SECONDS, insert_raw
+from .models import BiometricVerificationSession
+from .writebehind import buffer as write_behind
+
+LIVE_STATUSES = ('pending', 'in_progress')
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class SessionFinished(Exception):
+    """The session already has its final status."""
+
+
+class AttemptsExhausted(Exception):
+    """The attempt was past ``max_attempts``; the session has been failed."""
+
+
+class SessionStore:
+    def create(self, user, verification_type: str) -> BiometricVerificationSession:
+        raise NotImplementedError
+
+    def get(self, user, session_id: str) -> Optional[BiometricVerificationSession]:
+        """The user's session, or None if there is none or it has expired."""
+        raise NotImplementedError
+
+    def _record_attempt(self, session) -> bool:
+        """Count one attempt; False when that would exceed ``max_attempts``."""
+        raise NotImplementedError
+
+    def _save_progress(self, session, status_changed: bool) -> None:
+        raise NotImplementedError
+
+    def _finish(self, session) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def expired(created_at) -> bool:
+        return timezone.now() - created_at > timedelta(seconds=SESSION_EXPIRY_SECONDS)
+
+    def update(self, session, session_data: Any = None, status: Optional[str] = None,
+               attempt: bool = False) -> BiometricVerificationSession:
+        """Apply a scanner update; raises ``SessionFinished``/``AttemptsExhausted``."""
+        if session.status not in LIVE_STATUSES:
+            raise SessionFinished()
+        if session_data is not None:
+            session.session_data = session_data
+        if attempt and not self._record_attempt(session):
+            session.status = 'failed'
+            self._finish(session)
+            raise AttemptsExhausted()
+        if status in FINAL_STATUSES:
+            session.status = status
+            self._finish(session)
+        else:
+            status_changed = bool(status) and status != session.status
+            if status_changed:
+                session.status = status
+            self._save_progress(session, status_changed)
+        return session
+
+
+class CacheSessionStore(SessionStore):
+    def _key(self, session_id: str) -> str:
+        return f'attendance:verification-session:{session_id}'
+
+    def _attempts_key(self, session_id: str) -> str:
+        return f'attendance:verification-session:{session_id}:attempts'
+
+    def _finished_key(self, session_id: str) -> str:
+        return f'attendance:verification-session:{session_id}:finished'
+
+    def _ttl(self, session) -> int:
+        # Updates must not extend a session's life
+        remaining = SESSION_EXPIRY_SECONDS - (timezone.now() - session.created_at).total_seconds()
+        return max(int(remaining), 1)
+
+    @staticmethod
+    def _state(session) -> Dict[str, Any]:
+        return {
+            'user_id': session.user_id,
+            'verification_type': session.verification_type,
+            'status': session.status,
+            'max_attempts': session.max_attempts,
+            'session_data': session.session_data,
+            'created_at': session.created_at,
+        }
+
+    def create(self, user, verification_type):
+        session = BiometricVerificationSession(
+            user=user, session_id=str(uuid.uuid4()), verification_type=verification_type,
+            status='in_progress', max_attempts=system_settings.get('biometric', 'max_attempts'),
+            created_at=timezone.now(),
+        )
+        cache.set(self._key(session.session_id), self._state(session), SESSION_EXPIRY_SECONDS)
+        cache.set(self._attempts_key(session.session_id), 0, SESSION_EXPIRY_SECONDS)
+        return session
+
+    def get(self, user, session_id):
+        found = cache.get_many([self._key(session_id), self._finished_key(session_id)])
+        state = found.get(self._key(session_id))
+        if state is None or self._finished_key(session_id) in found:
+            # Finished sessions are answered from their audit row
+            return BiometricVerificationSession.objects.filter(session_id=session_id, user=user).first()
+        if state['user_id'] != user.pk or self.expired(state['created_at']):
+            return None
+        session = BiometricVerificationSession(session_id=session_id, **state)
+        session.user = user
+        session.attempts = cache.get(self._attempts_key(session_id)) or 0
+        return session
+
+    def _record_attempt(self, session):
+        try:
+            attempts = cache.incr(self._attempts_key(session.session_id))
+        except ValueError:
+            # Counter expired with the session
+            return False
+        if attempts > session.max_attempts:
+            session.attempts = session.max_attempts
+            return False
+        session.attempts = attempts
+        return True
+
+    def _save_progress(self, session, status_changed):
+        key = self._key(session.session_id)
+        cache.set(key, self._state(session), self._ttl(session))
+        # Checked after the write: a finish that began earlier has set the
+        # marker, and one that begins later deletes the state itself
+        if cache.get(self._finished_key(session.session_id)) is not None:
+            cache.delete(key)
+            raise SessionFinished()
+
+    def _finish(self, session):
+        session.completed_at = timezone.now()
+        # Keeps created_at as started; a concurrent finish of the same session is ignored
+        insert_raw(BiometricVerificationSession, [session])
+        # Outlives any live state, which expires with the session
+        cache.set(self._finished_key(session.session_id), 1, self._ttl(session))
+        cache.delete_many([self._key(session.session_id), self._attempts_key(session.session_id)])
+
+
+class DatabaseSessionStore(SessionStore):
+    def create(self, user, verification_type):
+        return BiometricVerificationSession.objects.create(
+            user=user, session_id=str(uuid.uuid4()), verification_type=verification_type,
+            status='in_progress', max_attempts=system_settings.get('biometric', 'max_attempts'),
+        )
+
+    def get(self, user, session_id):
+        session = BiometricVerificationSession.objects.filter(session_id=session_id, user=user).first()
+        if session is None or (session.status in LIVE_STATUSES and self.expired(session.created_at)):
+            return None
+        session.user = user
+        return write_behind.apply_pending(session)
+
+    def _record_attempt(self, session):
+        counted = BiometricVerificationSession.objects.filter(
+            pk=session.pk, attempts__lt=F('max_attempts'),
+        ).update(attempts=F('attempts') + 1)
+        session.refresh_from_db(fields=['attempts'])
+        return bool(counted)
+
+    def _save_progress(self, session, status_changed):
+        if status_changed:
+            # Status changes are saved at once; progress within a status is buffered
+            write_behind.discard(BiometricVerificationSession, session.pk)
+            session.save(update_fields=['status', 'session_data'])
+        else:
+            write_behind.set(BiometricVerificationSession, session.pk, session_data=session.session_data)
+
+    def _finish(self, session):
+        write_behind.discard(BiometricVerificationSession, session.pk)
+        session.completed_at = timezone.now()
+        session.save(update_fields=['status', 'session_data', 'completed_at'])
+
+
+STORES = {
+    'cache': CacheSessionStore,
+    'database': DatabaseSessionStore,
+}
+
+
+def get_store() -> SessionStore:
+    return STORES[getattr(settings, 'VERIFICATION_SESSION_BACKEND', 'database')]()
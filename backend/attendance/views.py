@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.urls import reverse
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -7,17 +8,31 @@ from rest_framework.viewsets import ModelViewSet
 from django.utils import timezone
 from django.db.models import Q, Count
 from datetime import datetime, timedelta
-import uuid
 import json
 
-from .models import User, AttendanceRecord, BiometricVerificationSession
+from .models import User, AttendanceRecord, AuditLog, Department, Office, ReportJob
 from django.conf import settings
+from . import hashing, metrics, system_settings  # hashing registers the login metrics
+from .absence import department_summary, user_summary
+from .audit import writer as audit
 from .biometric import verify_biometrics
+from .conditional import ALL_USERS, conditional_response
+from .exports import EXPORT_FORMATS, export_response, filter_export_queryset
+from .fieldsets import requested, select_fields
+from .pagination import AttendanceKeysetPagination, AuditLogKeysetPagination, UserKeysetPagination, approximate_count
+from .projections import ADMIN_USER, ADMIN_USER_M2M, ATTENDANCE_RECORD, admin_user_projection, admin_user_rows
+from .queries import between_days, local_date, local_today, office_timezone, on_day, since_day, until_day
+from .reports import build_report, department_breakdown, job_result, submit_report_job
+from .roster import ROSTER_FORMATS, import_roster, read_roster, roster_format
 from .serializers import (
     UserSerializer, AttendanceRecordSerializer, BiometricVerificationSessionSerializer,
     AttendanceWithBiometricSerializer, BiometricRegistrationSerializer,
     UserProfileUpdateSerializer, AdminUserSerializer
 )
+from .verification_sessions import (
+    FINAL_STATUSES, LIVE_STATUSES, AttemptsExhausted, SessionFinished, get_store as get_verification_store,
+)
+from .workforce import get_snapshot
 
 def convert_datetime_to_iso(obj):
     """Recursively convert datetime objects to ISO format strings for JSON serialization"""
@@ -32,6 +47,46 @@ def convert_datetime_to_iso(obj):
     else:
         return obj
 
+def selected_keys(request, keys, serializer_class):
+    """Keys picked by the request's ?fields=/?expand= (defaults leave out heavy fields)"""
+    fields, expand = requested(request)
+    return select_fields(keys, fields, expand, serializer_class.Meta.expandable_fields)
+
+def attendance_record_rows(request, records):
+    """Project attendance records to the fields the request selected"""
+    keys = selected_keys(request, ATTENDANCE_RECORD.keys, AttendanceRecordSerializer)
+    return ATTENDANCE_RECORD.select(keys).rows(records)
+
+AUDIT_LOG_FIELDS = (
+    'id', 'timestamp', 'user_id', 'username', 'role', 'action', 'action_type', 'resource_type',
+    'resource_id', 'resource_name', 'status', 'ip_address', 'user_agent', 'details',
+    'user__full_name', 'user__email', 'user__department',
+)
+
+def audit_log_rows(logs):
+    """``AUDIT_LOG_FIELDS`` rows in the shape the admin audit page expects"""
+    return [
+        {
+            'id': row['id'],
+            'timestamp': row['timestamp'].isoformat(),
+            'user_id': row['user_id'],
+            'user_name': row['user__full_name'] or row['username'] or 'System',
+            'user_email': row['user__email'] or '',
+            'action': row['action'],
+            'action_type': row['action_type'],
+            'resource_type': row['resource_type'],
+            'resource_id': row['resource_id'],
+            'resource_name': row['resource_name'],
+            'ip_address': row['ip_address'],
+            'user_agent': row['user_agent'],
+            'status': row['status'],
+            'details': row['details'] if isinstance(row['details'], str) else json.dumps(row['details'] or {}),
+            'department': row['user__department'] or '',
+            'role': row['role'],
+        }
+        for row in logs
+    ]
+
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -74,6 +129,8 @@ class RegisterView(APIView):
                 staff_id=data.get('staff_id', ''),
                 employee_id=data.get('employee_id', ''),
             )
+            audit.record('User Registration', 'create', request=request, user=user,
+                         resource_type='user', resource_id=user.pk, resource_name=user.full_name)
             return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({
@@ -85,8 +142,19 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        """Get the profile, or 304 when the client's copy is current"""
+        return conditional_response(
+            request, lambda: super(UserDetailView, self).retrieve(request, *args, **kwargs),
+            user_id=request.user.pk,
+        )
+
     def get_object(self):
-        return self.request.user
+        if self.request.method != 'GET':
+            return self.request.user
+        # Read only the columns behind the selected fields
+        serializer = UserSerializer(context=self.get_serializer_context())
+        return serializer.only_queryset(User.objects.all()).get(pk=self.request.user.pk)
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -99,6 +167,12 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
             context['instance'] = self.get_object()
         return context
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        audit.record('Profile Update', 'update', request=self.request, resource_type='user',
+                     resource_id=self.request.user.pk, resource_name=self.request.user.full_name,
+                     details={'fields': sorted(serializer.validated_data)})
+
 class BiometricRegistrationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -129,11 +203,14 @@ class BiometricRegistrationView(APIView):
                 }
                 user.ear_verification_date = timezone.now()
             
-            # Update verification status
-            user.update_biometric_status()
+            # Update verification status (saved with the rest below)
+            user.biometric_verification_status = user.get_biometric_status()
             user.is_verified = True
             user.onboarding_completed = True
             user.save()
+            audit.record('Biometric Registration', 'create', request=request, resource_type='biometric',
+                         resource_id=user.pk, resource_name='Biometric System',
+                         details={'verification_type': data['verification_type']})
             
             return Response({
                 'message': 'Biometric registration successful',
@@ -156,16 +233,12 @@ class BiometricVerificationView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Create verification session
-        session_id = str(uuid.uuid4())
-        session = BiometricVerificationSession.objects.create(
-            user=user,
-            session_id=session_id,
-            verification_type='both' if user.face_biometric_data and user.ear_biometric_data else 'face',
-            status='in_progress'
+        session = get_verification_store().create(
+            user, 'both' if user.face_biometric_data and user.ear_biometric_data else 'face'
         )
         
         return Response({
-            'session_id': session_id,
+            'session_id': session.session_id,
             'verification_type': session.verification_type,
             'max_attempts': session.max_attempts
         }, status=status.HTTP_200_OK)
@@ -193,8 +266,8 @@ class AttendanceWithBiometricView(APIView):
                 thresholds = verify_biometrics(
                     user_biometric_data=user_bio,
                     probe_biometric_data=biometric_probe,
-                    face_threshold=float(getattr(settings, 'FACE_RECOGNITION_TOLERANCE', getattr(settings, 'MIN_CONFIDENCE_THRESHOLD', 0.8))),
-                    ear_threshold=float(getattr(settings, 'EAR_RECOGNITION_TOLERANCE', getattr(settings, 'MIN_CONFIDENCE_THRESHOLD', 0.8))),
+                    face_threshold=system_settings.get('biometric', 'face_recognition_tolerance'),
+                    ear_threshold=system_settings.get('biometric', 'ear_recognition_tolerance'),
                 )
                 # Enforce server-computed results; ignore client booleans when vectors provided
                 data['face_verified'] = thresholds['face_verified']
@@ -202,6 +275,12 @@ class AttendanceWithBiometricView(APIView):
                 data['face_confidence'] = thresholds['face_confidence']
                 data['ear_confidence'] = thresholds['ear_confidence']
 
+            # A modality switched off by an admin cannot verify anyone
+            if not system_settings.get('biometric', 'enable_face_recognition'):
+                data['face_verified'] = False
+            if not system_settings.get('biometric', 'enable_ear_recognition'):
+                data['ear_verified'] = False
+
             # Determine verification method
             if data['face_verified'] and data['ear_verified']:
                 verification_method = 'both'
@@ -217,10 +296,21 @@ class AttendanceWithBiometricView(APIView):
             if biometric_data:
                 biometric_data = convert_datetime_to_iso(biometric_data)
             
-            # Create attendance record
+            # Determine status based on office-local time
+            now = timezone.localtime(timezone.now(), office_timezone())
+            late_after = datetime.combine(
+                now.date(), system_settings.get_time('attendance', 'work_start_time'), now.tzinfo,
+            ) + timedelta(minutes=system_settings.get('attendance', 'late_threshold_minutes'))
+            if now > late_after and data['attendance_type'] == 'check_in':
+                attendance_status = 'late'
+            else:
+                attendance_status = 'present'
+            
+            # Create attendance record (one INSERT, status included)
             attendance = AttendanceRecord.objects.create(
                 user=user,
                 attendance_type=data['attendance_type'],
+                status=attendance_status,
                 face_verified=data['face_verified'],
                 ear_verified=data['ear_verified'],
                 face_confidence=data.get('face_confidence'),
@@ -231,60 +321,83 @@ class AttendanceWithBiometricView(APIView):
                 verification_method=verification_method,
                 notes=data.get('notes')
             )
-            
-            # Determine status based on time
-            current_time = timezone.now().time()
-            work_start_str = getattr(settings, 'WORK_START_TIME', '09:00')
-            try:
-                work_start_time = datetime.strptime(work_start_str, '%H:%M').time()
-            except Exception:
-                work_start_time = datetime.strptime('09:00', '%H:%M').time()
-            if current_time > work_start_time and data['attendance_type'] == 'check_in':
-                attendance.status = 'late'
-            else:
-                attendance.status = 'present'
-            attendance.save()
+            audit.record('Attendance Mark', 'create', request=request, resource_type='attendance',
+                         resource_id=attendance.pk, resource_name='Attendance System', details={
+                             'attendance_type': attendance.attendance_type, 'status': attendance_status,
+                             'verification_method': verification_method,
+                         })
             
             return Response({
                 'message': f'Attendance {data["attendance_type"].replace("_", " ")} marked successfully',
                 'attendance': AttendanceRecordSerializer(attendance).data
             }, status=status.HTTP_201_CREATED)
         
+        audit.record('Attendance Mark', 'create', request=request, status='failure',
+                     resource_type='attendance', resource_name='Attendance System',
+                     details={'errors': serializer.errors})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class AttendanceRecordViewSet(ModelViewSet):
     serializer_class = AttendanceRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AttendanceKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
-            return AttendanceRecord.objects.all()
-        return AttendanceRecord.objects.filter(user=user)
+            queryset = AttendanceRecord.objects.all()
+        else:
+            queryset = AttendanceRecord.objects.filter(user=user)
+        if self.action in ('list', 'retrieve'):
+            # Keyset pages read the ordering columns of each row
+            ordering = [name.lstrip('-') for name in self.pagination_class.ordering]
+            queryset = self.get_serializer().only_queryset(queryset, extra=ordering)
+        return queryset
+
+    def conditional(self, request, build, cache_control=None):
+        """Answer with 304 when nothing the caller can see has changed"""
+        user_id = ALL_USERS if request.user.role == 'admin' else request.user.pk
+        return conditional_response(request, build, user_id=user_id, cache_control=cache_control)
+
+    def list(self, request, *args, **kwargs):
+        # Pages further back rarely change; let the browser reuse them briefly
+        cache_control = {'private': True, 'max_age': 30} if 'cursor' in request.query_params else None
+        return self.conditional(
+            request, lambda: super(AttendanceRecordViewSet, self).list(request, *args, **kwargs),
+            cache_control=cache_control,
+        )
 
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Get today's attendance records"""
-        today = timezone.now().date()
-        records = self.get_queryset().filter(timestamp__date=today)
-        return Response(AttendanceRecordSerializer(records, many=True).data)
+        return self.conditional(request, lambda: self.today_response(request))
+
+    def today_response(self, request):
+        today = local_today()
+        records = self.get_queryset().filter(on_day(today))
+        return Response(attendance_record_rows(request, records))
 
     @action(detail=False, methods=['get'])
     def weekly(self, request):
         """Get weekly attendance summary"""
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=7)
+        return self.conditional(request, lambda: self.weekly_response(request))
+
+    def weekly_response(self, request):
+        end_date = local_today()
+        start_date = end_date - timedelta(days=6)
         
-        records = self.get_queryset().filter(
-            timestamp__date__range=[start_date, end_date]
-        )
+        records = self.get_queryset().filter(between_days(start_date, end_date))
+        days = user_summary(request.user.id, start_date, end_date)
         
         summary = {
             'total_days': 7,
-            'present_days': records.filter(status='present').count(),
-            'late_days': records.filter(status='late').count(),
-            'absent_days': 7 - records.count(),
-            'records': AttendanceRecordSerializer(records, many=True).data
+            'working_days': days['working_days'],
+            'present_days': days['present_days'],
+            'late_days': days['late_days'],
+            'leave_days': days['leave_days'],
+            'absent_days': days['absent_days'],
+            'attendance_rate': days['attendance_rate'],
+            'records': attendance_record_rows(request, records)
         }
         
         return Response(summary)
@@ -292,24 +405,46 @@ class AttendanceRecordViewSet(ModelViewSet):
     @action(detail=False, methods=['get'])
     def monthly(self, request):
         """Get monthly attendance summary"""
-        end_date = timezone.now().date()
+        return self.conditional(request, lambda: self.monthly_response(request))
+
+    def monthly_response(self, request):
+        end_date = local_today()
         start_date = end_date.replace(day=1)
         
-        records = self.get_queryset().filter(
-            timestamp__date__range=[start_date, end_date]
-        )
+        records = self.get_queryset().filter(between_days(start_date, end_date))
+        days = user_summary(request.user.id, start_date, end_date)
         
         summary = {
             'month': start_date.strftime('%B %Y'),
             'total_days': end_date.day,
-            'present_days': records.filter(status='present').count(),
-            'late_days': records.filter(status='late').count(),
-            'absent_days': end_date.day - records.count(),
-            'records': AttendanceRecordSerializer(records, many=True).data
+            'working_days': days['working_days'],
+            'present_days': days['present_days'],
+            'late_days': days['late_days'],
+            'leave_days': days['leave_days'],
+            'absent_days': days['absent_days'],
+            'attendance_rate': days['attendance_rate'],
+            'current_streak': days['current_streak'],
+            'longest_streak': days['longest_streak'],
+            'records': attendance_record_rows(request, records)
         }
         
         return Response(summary)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream attendance records as CSV or XLSX"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({
+                'error': f'Unsupported export format: {file_format}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        records = filter_export_queryset(self.get_queryset(), request.query_params)
+        audit.record('Attendance Export', 'export', request=request, resource_type='attendance',
+                     resource_name='Attendance System',
+                     details={'file_format': file_format, 'filters': request.query_params.dict()})
+        return export_response(records, file_format)
+
 class AdminDashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -318,18 +453,22 @@ class AdminDashboardView(APIView):
         if request.user.role != 'admin':
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        today = timezone.now().date()
+        today = local_today()
         
         # Today's attendance summary
-        today_attendance = AttendanceRecord.objects.filter(timestamp__date=today)
-        total_employees = User.objects.filter(role='user', employment_status='active').count()
+        today_attendance = AttendanceRecord.objects.filter(on_day(today))
+        workforce = get_snapshot()
+        total_employees = workforce.headcount
+        checked_in_users = list(
+            today_attendance.present_check_ins().values_list('user_id', flat=True)
+        )
         
         summary = {
             'total_employees': total_employees,
-            'checked_in_today': today_attendance.filter(attendance_type='check_in').count(),
+            'checked_in_today': len(checked_in_users),
             'checked_out_today': today_attendance.filter(attendance_type='check_out').count(),
             'late_today': today_attendance.filter(status='late').count(),
-            'absent_today': total_employees - today_attendance.filter(attendance_type='check_in').count(),
+            'absent_today': workforce.count_absent(checked_in_users),
             'biometric_verified_today': today_attendance.filter(
                 Q(face_verified=True) | Q(ear_verified=True)
             ).count(),
@@ -358,8 +497,7 @@ class AdminDashboardView(APIView):
                 check_in = AttendanceRecord.objects.filter(
                     user=user,
                     attendance_type='check_in',
-                    timestamp__date=record.timestamp.date()
-                ).first()
+                ).filter(on_day(local_date(record.timestamp))).first()
                 if check_in:
                     # Find the record in recent_records and update it
                     for rec in recent_records:
@@ -371,32 +509,16 @@ class AdminDashboardView(APIView):
                             break
         
         # Department-wise attendance
-        departments = []
-        for user in User.objects.filter(role='user', employment_status='active'):
-            dept = user.department or 'Unknown'
-            existing_dept = next((d for d in departments if d['name'] == dept), None)
-
-            if existing_dept:
-                existing_dept['count'] += 1
-                if today_attendance.filter(user=user, attendance_type='check_in').exists():
-                    existing_dept['present'] += 1
-                else:
-                    existing_dept['absent'] += 1
-            else:
-                present = 1 if today_attendance.filter(user=user, attendance_type='check_in').exists() else 0
-                departments.append({
-                    'name': dept,
-                    'count': 1,
-                    'present': present,
-                    'absent': 1 - present
-                })
+        departments = department_breakdown(workforce, checked_in_users, unassigned='Unknown')
         
         # Attendance trend (last 7 days)
         attendance_trend = []
         for i in range(7):
             date = today - timedelta(days=i)
-            day_records = AttendanceRecord.objects.filter(timestamp__date=date)
-            day_present = day_records.filter(attendance_type='check_in').values('user').distinct().count()
+            day_records = AttendanceRecord.objects.filter(on_day(date))
+            day_present = workforce.count_present(
+                day_records.present_check_ins().values_list('user_id', flat=True)
+            )
             day_absent = total_employees - day_present
             day_late = day_records.filter(
                 attendance_type='check_in',
@@ -427,8 +549,22 @@ class AdminUserManagementView(APIView):
         if request.user.role != 'admin':
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        users = User.objects.filter(role='user').order_by('-date_joined')
-        return Response(AdminUserSerializer(users, many=True).data)
+        users = AdminUserSerializer.setup_queryset(
+            User.objects.filter(role='user').order_by('-date_joined')
+        )
+        
+        # Page with a keyset cursor when the client asks for it; the plain
+        # list is kept for existing callers that expect an array.
+        keys = selected_keys(request, ADMIN_USER.keys + list(ADMIN_USER_M2M), AdminUserSerializer)
+        if 'cursor' in request.query_params or 'page_size' in request.query_params:
+            paginator = UserKeysetPagination()
+            ordering = {name.lstrip('-') for name in paginator.ordering}
+            page = paginator.paginate_queryset(
+                admin_user_projection(set(keys) | ordering).values(users), request, view=self
+            )
+            return paginator.get_paginated_response(admin_user_rows(page, keys))
+        
+        return Response(admin_user_rows(users, keys))
 
     def post(self, request):
         """Update user status"""
@@ -449,6 +585,9 @@ class AdminUserManagementView(APIView):
                 user.employment_status = 'terminated'
             
             user.save()
+            audit.record(f'User {str(action).title()}', 'update', request=request, resource_type='user',
+                         resource_id=user.pk, resource_name=user.full_name,
+                         details={'employment_status': user.employment_status})
             
             return Response({
                 'message': f'User {action}ed successfully',
@@ -463,42 +602,39 @@ class BiometricSessionView(APIView):
 
     def get(self, request, session_id):
         """Get biometric verification session"""
-        try:
-            session = BiometricVerificationSession.objects.get(
-                session_id=session_id,
-                user=request.user
-            )
-            return Response(BiometricVerificationSessionSerializer(session).data)
-        except BiometricVerificationSession.DoesNotExist:
-            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        session = get_verification_store().get(request.user, session_id)
+        if session is None:
+            return Response({'error': 'Session not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(BiometricVerificationSessionSerializer(session).data)
 
     def put(self, request, session_id):
-        """Update biometric verification session"""
+        """Update biometric verification session; each reported attempt counts once"""
+        store = get_verification_store()
+        session = store.get(request.user, session_id)
+        if session is None:
+            return Response({'error': 'Session not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+        
+        new_status = request.data.get('status')
+        if new_status and new_status not in LIVE_STATUSES + FINAL_STATUSES:
+            return Response({'error': f'Invalid status: {new_status}'}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
-            session = BiometricVerificationSession.objects.get(
-                session_id=session_id,
-                user=request.user
+            store.update(
+                session,
+                session_data=request.data.get('session_data'),
+                status=new_status,
+                # Older clients send their own attempts count; it now just marks an attempt
+                attempt=bool(request.data.get('attempt')) or 'attempts' in request.data,
             )
-            
-            if session.is_expired():
-                session.status = 'expired'
-                session.save()
-                return Response({'error': 'Session expired'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Update session data
-            session.session_data = request.data.get('session_data', session.session_data)
-            session.attempts = request.data.get('attempts', session.attempts)
-            session.status = request.data.get('status', session.status)
-            
-            if session.status in ['completed', 'failed']:
-                session.completed_at = timezone.now()
-            
-            session.save()
-            
-            return Response(BiometricVerificationSessionSerializer(session).data)
+        except SessionFinished:
+            return Response({'error': 'Session already finished'}, status=status.HTTP_400_BAD_REQUEST)
+        except AttemptsExhausted:
+            return Response({
+                'error': 'Maximum attempts reached',
+                'session': BiometricVerificationSessionSerializer(session).data,
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        except BiometricVerificationSession.DoesNotExist:
-            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(BiometricVerificationSessionSerializer(session).data)
 
 class AdminReportsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -508,99 +644,173 @@ class AdminReportsView(APIView):
         if request.user.role != 'admin':
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        date_range = request.query_params.get('date_range', 'today')
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        department = request.query_params.get('department')
-        
-        # Calculate date range
-        today = timezone.now().date()
-        if date_range == 'week':
-            start_date = today - timedelta(days=7)
-            end_date = today
-        elif date_range == 'month':
-            start_date = today - timedelta(days=30)
-            end_date = today
-        else:  # today
-            start_date = today
-            end_date = today
-        
-        # Filter users by department if specified
-        user_filter = Q(role='user', employment_status='active')
-        if department and department != 'all':
-            user_filter &= Q(department=department)
-        
-        users = User.objects.filter(user_filter)
+        return Response(build_report(
+            date_range=request.query_params.get('date_range', 'today'),
+            department=request.query_params.get('department'),
+        ))
+
+def report_job_payload(request, job):
+    """Status document for a report job"""
+    return {
+        'job_id': job.job_id,
+        'status': job.status,
+        'params': job.params,
+        'error': job.error,
+        'created_at': job.created_at,
+        'completed_at': job.completed_at,
+        'status_url': request.build_absolute_uri(reverse('admin_report_job', args=[job.job_id])),
+        'download_url': request.build_absolute_uri(
+            reverse('admin_report_job_download', args=[job.job_id])
+        ) if job.status == 'completed' else None,
+    }
+
+class AdminReportJobsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Submit a report to be computed in the background"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get attendance data for the period
-        attendance_records = AttendanceRecord.objects.filter(
-            timestamp__date__range=[start_date, end_date],
-            user__in=users
+        try:
+            job, created = submit_report_job(request.data, user=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        audit.record('Report Request', 'export', request=request, resource_type='report',
+                     resource_id=job.job_id, resource_name='Reports', details={'params': job.params})
+        
+        return Response(
+            report_job_payload(request, job),
+            status=status.HTTP_202_ACCEPTED if job.status != 'completed' else status.HTTP_200_OK
         )
+
+class AdminReportJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Get the status of a report job"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Calculate statistics
-        total_employees = users.count()
-        present_count = attendance_records.filter(attendance_type='check_in').values('user').distinct().count()
-        absent_count = total_employees - present_count
-        late_count = attendance_records.filter(
-            attendance_type='check_in',
-            timestamp__hour__gte=9  # Late if after 9 AM
-        ).count()
-        
-        # Department breakdown
-        dept_stats = []
-        for dept in users.values_list('department', flat=True).distinct():
-            if dept:
-                dept_users = users.filter(department=dept)
-                dept_present = attendance_records.filter(
-                    user__in=dept_users,
-                    attendance_type='check_in',
-                    timestamp__date__range=[start_date, end_date]
-                ).values('user').distinct().count()
-                dept_stats.append({
-                    'name': dept,
-                    'count': dept_users.count(),
-                    'present': dept_present,
-                    'absent': dept_users.count() - dept_present
-                })
+        try:
+            job = ReportJob.objects.get(job_id=job_id)
+        except ReportJob.DoesNotExist:
+            return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(report_job_payload(request, job))
+
+class AdminReportJobDownloadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Download the result of a completed report job"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Attendance trend (last 7 days)
-        trend_data = []
-        for i in range(7):
-            date = today - timedelta(days=i)
-            day_records = attendance_records.filter(timestamp__date=date)
-            day_present = day_records.filter(attendance_type='check_in').values('user').distinct().count()
-            day_absent = total_employees - day_present
-            day_late = day_records.filter(
-                attendance_type='check_in',
-                timestamp__hour__gte=9
-            ).count()
-            
-            trend_data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'present': day_present,
-                'absent': day_absent,
-                'late': day_late
-            })
+        try:
+            job = ReportJob.objects.get(job_id=job_id)
+        except ReportJob.DoesNotExist:
+            return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        result = job_result(job)
+        if result is None:
+            return Response({
+                'error': f'Report is not ready (status: {job.status})'
+            }, status=status.HTTP_409_CONFLICT)
         
-        trend_data.reverse()  # Oldest to newest
+        response = Response(result)
+        response['Content-Disposition'] = f'attachment; filename="attendance_report_{job.params["as_of"]}_{job.job_id[:8]}.json"'
+        return response
+
+class AdminDepartmentsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """List departments and offices with their cached headcounts"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
         return Response({
-            'summary': {
-                'total_employees': total_employees,
-                'present_today': present_count,
-                'absent_today': absent_count,
-                'late_today': late_count,
-                'average_attendance_rate': round((present_count / total_employees * 100), 2) if total_employees > 0 else 0
-            },
-            'department_stats': dept_stats,
-            'attendance_trend': trend_data,
-            'date_range': {
-                'start': start_date.isoformat(),
-                'end': end_date.isoformat()
-            }
+            'departments': list(Department.objects.values('id', 'name', 'headcount')),
+            'offices': list(Office.objects.values('id', 'name', 'headcount')),
         })
 
+class AdminRosterImportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Create staff accounts from an uploaded CSV/XLSX roster"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the roster as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or roster_format(upload.name)
+        if file_format not in ROSTER_FORMATS:
+            return Response({'error': 'Roster must be a .csv or .xlsx file'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            rows = list(read_roster(upload, file_format))
+        except Exception as e:
+            return Response({'error': f'Could not read roster: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        max_rows = getattr(settings, 'ROSTER_UPLOAD_MAX_ROWS', 2000)
+        if len(rows) > max_rows:
+            return Response({
+                'error': f'Rosters over {max_rows} rows must be imported with the import_roster command'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        # Hash on this thread: a pool as wide as the host would take every CPU from other requests
+        result = import_roster(rows, default_password=request.data.get('default_password') or None,
+                               dry_run=dry_run, workers=1)
+        if not dry_run:
+            audit.record('Roster Import', 'create', request=request, resource_type='user',
+                         resource_name=upload.name, status='success' if not result['failed'] else 'warning',
+                         details={key: result[key] for key in ('rows', 'created', 'failed')})
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+class AdminMetricsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Operational counters and timings (login queueing and hashing, ...)"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({'metrics': metrics.snapshot()})
+
+class AdminAbsenceView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Get absence, leave and streak statistics for a department"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        today = local_today()
+        try:
+            start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date() \
+                if request.query_params.get('start_date') else today.replace(month=1, day=1)
+            end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date() \
+                if request.query_params.get('end_date') else today
+        except ValueError:
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if end_date < start_date or (end_date - start_date).days > 366:
+            return Response({'error': 'Date range must be at most one year'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        workforce = get_snapshot()
+        department = request.query_params.get('department')
+        if department and department != 'all':
+            if not department.isdigit():
+                return Response({'error': 'department must be a department id'}, status=status.HTTP_400_BAD_REQUEST)
+            workforce = workforce.select(department=int(department))
+        
+        result = department_summary(
+            workforce.ids.tolist(), start_date, end_date,
+            per_user=request.query_params.get('per_user', '').lower() in ('1', 'true', 'yes'),
+        )
+        result['date_range'] = {'start': start_date.isoformat(), 'end': end_date.isoformat()}
+        return Response(result)
 
 class AdminSettingsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -610,45 +820,28 @@ class AdminSettingsView(APIView):
         if request.user.role != 'admin':
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Return default settings (in a real app, these would come from a Settings model)
-        settings = {
-            'biometric': {
-                'face_threshold': 0.8,
-                'ear_threshold': 0.7,
-                'max_attempts': 3,
-                'session_timeout': 300
-            },
-            'attendance': {
-                'work_start_time': '09:00',
-                'work_end_time': '17:00',
-                'late_threshold': '09:15',
-                'overtime_threshold': '17:00'
-            },
-            'security': {
-                'password_min_length': 8,
-                'session_timeout': 3600,
-                'max_login_attempts': 5,
-                'lockout_duration': 900
-            },
-            'notifications': {
-                'email_notifications': True,
-                'sms_notifications': False,
-                'push_notifications': True
-            }
-        }
-        
-        return Response(settings)
+        return Response(system_settings.snapshot())
 
     def post(self, request):
         """Update system settings"""
         if request.user.role != 'admin':
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # In a real app, this would update a Settings model
-        # For now, just return success
+        changes, errors = system_settings.clean(request.data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        changed = system_settings.update(changes, user=request.user)
+        if changed:
+            audit.record('Settings Update', 'update', request=request, resource_type='settings',
+                         resource_name='System Settings', details={
+                             f'{section}.{name}': changes[(section, name)] for section, name in changed
+                         })
+        
         return Response({
             'message': 'Settings updated successfully',
-            'settings': request.data
+            'changed': [f'{section}.{name}' for section, name in changed],
+            # The cache is only invalidated once the request's transaction commits
+            'settings': system_settings.snapshot(fresh=True),
         })
 
 
@@ -663,74 +856,45 @@ class AdminAuditLogsView(APIView):
         # Get query parameters
         search = request.query_params.get('search', '')
         action_type = request.query_params.get('action_type', '')
-        status = request.query_params.get('status', '')
+        log_status = request.query_params.get('status', '')
         user_id = request.query_params.get('user', '')
         start_date = request.query_params.get('start_date', '')
         end_date = request.query_params.get('end_date', '')
         
-        # In a real app, this would query an AuditLog model
-        # For now, return mock data that matches frontend expectations
-        mock_logs = [
-            {
-                'id': 1,
-                'timestamp': timezone.now().isoformat(),
-                'user_name': 'admin',
-                'user_email': 'admin@example.com',
-                'action': 'User Login',
-                'action_type': 'login',
-                'resource_name': 'Authentication System',
-                'status': 'success',
-                'ip_address': '127.0.0.1',
-                'department': 'IT',
-                'role': 'admin',
-                'user_id': 1
-            },
-            {
-                'id': 2,
-                'timestamp': (timezone.now() - timedelta(hours=1)).isoformat(),
-                'user_name': 'testuser',
-                'user_email': 'testuser@example.com',
-                'action': 'Attendance Mark',
-                'action_type': 'create',
-                'resource_name': 'Attendance System',
-                'status': 'success',
-                'ip_address': '127.0.0.1',
-                'department': 'HR',
-                'role': 'user',
-                'user_id': 2
-            },
-            {
-                'id': 3,
-                'timestamp': (timezone.now() - timedelta(hours=2)).isoformat(),
-                'user_name': 'testuser2',
-                'user_email': 'testuser2@example.com',
-                'action': 'Biometric Verification',
-                'action_type': 'system',
-                'resource_name': 'Biometric System',
-                'status': 'success',
-                'ip_address': '127.0.0.1',
-                'department': 'Finance',
-                'role': 'user',
-                'user_id': 3
-            }
-        ]
-        
-        # Apply filters (mock implementation)
-        filtered_logs = mock_logs
+        logs = AuditLog.objects.all()
         if search:
-            filtered_logs = [log for log in filtered_logs if search.lower() in log['details'].lower()]
-        if action_type:
-            filtered_logs = [log for log in filtered_logs if log['action'] == action_type]
-        if status:
-            filtered_logs = [log for log in filtered_logs if log['status'] == status]
-        
+            logs = logs.filter(
+                Q(action__icontains=search) | Q(username__icontains=search)
+                | Q(resource_name__icontains=search) | Q(user__full_name__icontains=search)
+            )
+        if action_type and action_type != 'all':
+            logs = logs.filter(action_type=action_type)
+        if log_status and log_status != 'all':
+            logs = logs.filter(status=log_status)
+        if user_id and user_id != 'all':
+            if not user_id.isdigit():
+                return Response({'error': 'user must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+            logs = logs.filter(user_id=int(user_id))
+        try:
+            if start_date:
+                logs = logs.filter(since_day(datetime.strptime(start_date, '%Y-%m-%d').date()))
+            if end_date:
+                logs = logs.filter(until_day(datetime.strptime(end_date, '%Y-%m-%d').date()))
+        except ValueError:
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Keyset pages on (timestamp, id): later pages cost the same as the first
+        paginator = AuditLogKeysetPagination()
+        page = paginator.paginate_queryset(logs.values(*AUDIT_LOG_FIELDS), request, view=self)
         return Response({
-            'logs': filtered_logs,
-            'total': len(filtered_logs),
+            'logs': audit_log_rows(page),
+            'total': approximate_count(logs),
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'filters': {
                 'search': search,
                 'action_type': action_type,
-                'status': status,
+                'status': log_status,
                 'user': user_id,
                 'start_date': start_date,
                 'end_date': end_date
@@ -746,38 +910,42 @@ class AdminAuditSummaryView(APIView):
         if request.user.role != 'admin':
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # In a real app, this would aggregate data from AuditLog model
-        # For now, return mock summary that matches frontend expectations
-        summary = {
-            'total_logs': 1250,
-            'today_logs': 45,
-            'successful_actions': 1180,
-            'failed_actions': 70,
-            'top_actions': [
-                {'action': 'User Login', 'count': 450},
-                {'action': 'Attendance Mark', 'count': 320},
-                {'action': 'Biometric Verification', 'count': 280},
-                {'action': 'User Update', 'count': 120}
-            ],
-            'top_users': [
-                {'user': 'admin', 'actions': 180},
-                {'user': 'testuser', 'actions': 95},
-                {'user': 'testuser2', 'actions': 87}
-            ],
-            'recent_activity': [
-                {
-                    'timestamp': timezone.now().isoformat(),
-                    'action': 'User Login',
-                    'user': 'admin',
-                    'status': 'success'
-                },
-                {
-                    'timestamp': (timezone.now() - timedelta(minutes=5)).isoformat(),
-                    'action': 'Settings Update',
-                    'user': 'admin',
-                    'status': 'success'
-                }
-            ]
-        }
+        # Aggregate over a window on the indexed timestamp, not the whole trail
+        try:
+            days = min(max(int(request.query_params.get('days', settings.AUDIT_SUMMARY_DAYS)), 1), 366)
+        except ValueError:
+            return Response({'error': 'days must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        window = AuditLog.objects.filter(since_day(local_today() - timedelta(days=days - 1)))
+        counts = window.aggregate(
+            total=Count('id'),
+            today=Count('id', filter=since_day(local_today())),
+            successful=Count('id', filter=Q(status='success')),
+            failed=Count('id', filter=Q(status='failure')),
+            unique_users=Count('user', distinct=True),
+        )
+        top_actions = list(
+            window.values('action').annotate(count=Count('id')).order_by('-count', 'action')[:5]
+        )
+        top_users = [
+            {'user': row['username'], 'actions': row['actions']}
+            for row in window.exclude(username='').values('username')
+            .annotate(actions=Count('id')).order_by('-actions', 'username')[:5]
+        ]
+        recent = audit_log_rows(AuditLog.objects.order_by('-timestamp', '-id').values(*AUDIT_LOG_FIELDS)[:10])
         
-        return Response(summary)
+        return Response({
+            'total_logs': counts['total'],
+            'total_actions': counts['total'],
+            'today_logs': counts['today'],
+            'successful_actions': counts['successful'],
+            'failed_actions': counts['failed'],
+            'unique_users': counts['unique_users'],
+            'days': days,
+            'top_actions': top_actions,
+            'top_users': top_users,
+            'recent_activities': recent,
+            'recent_activity': [
+                {'timestamp': row['timestamp'], 'action': row['action'], 'user': row['user_name'], 'status': row['status']}
+                for row in recent
+            ],
+        })
@@ -0,0 +1,159 @@
+"""In-process snapshot of the active workforce.
+
+Dashboards and reports need the active headcount, and the department each
+employee belongs to, on every request. Rather than counting the users table
+each time, every process keeps a compact array snapshot of active staff:
+sorted user ids with parallel department, office and supervisor keys.
+
+The snapshot is versioned by a counter in the shared cache. ``User.save``
+bumps it (on commit) whenever a field captured here changes, including status changes
+through ``AdminUserManagementView.post``; bulk paths that bypass ``save()``
+call ``bump_workforce_version`` themselves. A process rebuilds its snapshot
+when the counter moves, or after ``WORKFORCE_SNAPSHOT_TTL`` seconds as a
+backstop for per-process caches.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import counters
+
+VERSION_KEY = 'attendance:workforce:version'
+# Missing department/office/supervisor
+NONE = -1
+
+_lock = threading.Lock()
+_snapshot: Optional['WorkforceSnapshot'] = None
+
+
+def workforce_version():
+    return cache.get(VERSION_KEY)
+
+
+def bump_workforce_version() -> None:
+    """Invalidate every process's snapshot once the current transaction commits.
+
+    Bumping earlier would let another process rebuild from the old rows and
+    keep them under the new version.
+    """
+    transaction.on_commit(lambda: counters.incr(VERSION_KEY))
+
+
+class WorkforceSnapshot:
+    """Active staff (role ``user``, status ``active``) as parallel arrays."""
+
+    def __init__(self, ids, departments, offices, supervisors, version=None):
+        self.ids = ids
+        self.departments = departments
+        self.offices = offices
+        self.supervisors = supervisors
+        self.version = version
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, version=None) -> 'WorkforceSnapshot':
+        from .models import User
+
+        rows = (
+            User.objects.filter(role='user', employment_status='active')
+            .order_by('id')
+            .values_list('id', 'department_ref_id', 'office_ref_id', 'supervisor_id')
+        )
+        data = np.array(
+            [[NONE if value is None else value for value in row] for row in rows],
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        return cls(
+            ids=data[:, 0].copy(),
+            departments=data[:, 1].astype(np.int32),
+            offices=data[:, 2].astype(np.int32),
+            supervisors=data[:, 3].copy(),
+            version=version,
+        )
+
+    @property
+    def headcount(self) -> int:
+        return int(self.ids.size)
+
+    def empty(self) -> 'WorkforceSnapshot':
+        return self.select(department=NONE - 1)
+
+    def select(self, department: Optional[int] = None, office: Optional[int] = None) -> 'WorkforceSnapshot':
+        """Sub-snapshot restricted to one department and/or office."""
+        mask = np.ones(self.ids.size, dtype=bool)
+        if department is not None:
+            mask &= self.departments == department
+        if office is not None:
+            mask &= self.offices == office
+        return WorkforceSnapshot(
+            self.ids[mask], self.departments[mask], self.offices[mask],
+            self.supervisors[mask], self.version,
+        )
+
+    def contains(self, user_ids: Iterable[int]) -> np.ndarray:
+        """Boolean mask over ``user_ids`` of entries that are in this snapshot."""
+        return np.isin(np.fromiter(user_ids, dtype=np.int64), self.ids)
+
+    def present_mask(self, user_ids: Iterable[int]) -> np.ndarray:
+        """Boolean mask over ``ids`` of staff appearing in ``user_ids``."""
+        return np.isin(self.ids, np.fromiter(user_ids, dtype=np.int64))
+
+    def count_present(self, user_ids: Iterable[int]) -> int:
+        return int(self.present_mask(user_ids).sum())
+
+    def count_absent(self, user_ids: Iterable[int]) -> int:
+        """Headcount minus the distinct staff in ``user_ids``."""
+        return self.headcount - self.count_present(user_ids)
+
+    def department_breakdown(self, user_ids: Iterable[int], names: Dict[int, str],
+                             unassigned: Optional[str] = None) -> List[dict]:
+        """Headcount and presence per department, as the admin views report it.
+
+        Staff without a department are reported under ``unassigned``, or
+        left out when it is None.
+        """
+        present = self.present_mask(user_ids)
+        keys, inverse = np.unique(self.departments, return_inverse=True)
+        counts = np.bincount(inverse, minlength=keys.size)
+        present_counts = np.bincount(inverse, weights=present, minlength=keys.size).astype(np.int64)
+
+        breakdown = []
+        for key, count, present_count in zip(keys.tolist(), counts.tolist(), present_counts.tolist()):
+            if key == NONE:
+                if unassigned is None:
+                    continue
+                department_id, name = None, unassigned
+            else:
+                department_id, name = key, names.get(key, unassigned)
+            breakdown.append({
+                'id': department_id,
+                'name': name,
+                'count': count,
+                'present': present_count,
+                'absent': count - present_count,
+            })
+        breakdown.sort(key=lambda item: item['name'] or '')
+        return breakdown
+
+
+def get_snapshot() -> WorkforceSnapshot:
+    """Current snapshot, rebuilt if the version moved or it has aged out."""
+    global _snapshot
+    version = workforce_version()
+    ttl = getattr(settings, 'WORKFORCE_SNAPSHOT_TTL', 300)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version and time.monotonic() - snapshot.built_at < ttl:
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != version or time.monotonic() - snapshot.built_at >= ttl:
+            snapshot = WorkforceSnapshot.build(version)
+            _snapshot = snapshot
+    return snapshot
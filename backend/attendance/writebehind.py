@@ -0,0 +1,200 @@
+"""Write-behind buffer for bookkeeping columns on hot paths.
+
+Some writes only record that something happened: ``last_login`` on every
+token issue, progress on an in-flight verification session. Doing each as
+its own UPDATE turns the opening-time login rush into a stream of hot-row
+writes on tables every request reads. Instead they are collected per
+process, coalesced per row (the latest value wins; increments add up), and
+written with one ``bulk_update`` per model and field set.
+
+A daemon thread flushes every ``WRITE_BEHIND_INTERVAL`` seconds, and early
+once ``WRITE_BEHIND_MAX_PENDING`` rows are waiting. Pending writes are also
+flushed at interpreter exit, so they can be at most one interval stale and
+are lost only if the process is killed. With an interval of 0 or less every
+write goes straight to the database, which is what tests and one-off
+commands get.
+
+Only use this for values nothing reads back for decisions; rows that must be
+durable immediately should be saved as usual (and ``discard`` any pending
+write for them first).
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[Any, Any]
+
+
+class WriteBehindBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[Key, Dict[str, Any]] = {}
+        self._deltas: Dict[Key, Dict[str, int]] = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @staticmethod
+    def interval() -> float:
+        return float(getattr(settings, 'WRITE_BEHIND_INTERVAL', 5))
+
+    # Recording --------------------------------------------------------------
+
+    def set(self, model, pk, **values) -> None:
+        """Write ``values`` to row ``pk``; later values for a field replace earlier ones."""
+        if self.interval() <= 0:
+            model.objects.filter(pk=pk).update(**values)
+            self._after_flush(model, [pk])
+            return
+        self._ensure_worker()
+        with self._lock:
+            key = (model, pk)
+            self._values.setdefault(key, {}).update(values)
+            # A set value absorbs increments recorded before it
+            for name in values:
+                self._deltas.get(key, {}).pop(name, None)
+        self._wake_if_full()
+
+    def increment(self, model, pk, **deltas: int) -> None:
+        """Add ``deltas`` to integer columns of row ``pk``."""
+        if self.interval() <= 0:
+            model.objects.filter(pk=pk).update(**{name: F(name) + delta for name, delta in deltas.items()})
+            self._after_flush(model, [pk])
+            return
+        self._ensure_worker()
+        with self._lock:
+            key = (model, pk)
+            values = self._values.get(key, {})
+            for name, delta in deltas.items():
+                if name in values:
+                    values[name] += delta
+                else:
+                    pending = self._deltas.setdefault(key, {})
+                    pending[name] = pending.get(name, 0) + delta
+        self._wake_if_full()
+
+    def apply_pending(self, obj):
+        """Overlay this process's pending writes onto a freshly loaded ``obj``."""
+        key = (type(obj), obj.pk)
+        with self._lock:
+            values = dict(self._values.get(key, {}))
+            deltas = dict(self._deltas.get(key, {}))
+        for name, value in values.items():
+            setattr(obj, name, value)
+        for name, delta in deltas.items():
+            setattr(obj, name, getattr(obj, name) + delta)
+        return obj
+
+    def discard(self, model, pk) -> None:
+        """Drop pending writes for a row that is about to be saved in full."""
+        with self._lock:
+            self._values.pop((model, pk), None)
+            self._deltas.pop((model, pk), None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._values.keys() | self._deltas.keys())
+
+    # Flushing ---------------------------------------------------------------
+
+    def flush(self) -> int:
+        """Write everything pending; returns the number of rows updated."""
+        with self._lock:
+            values, self._values = self._values, {}
+            deltas, self._deltas = self._deltas, {}
+        if not values and not deltas:
+            return 0
+
+        # model -> frozenset(fields) -> [objects]
+        groups: Dict[Any, Dict[frozenset, list]] = defaultdict(lambda: defaultdict(list))
+        for key in values.keys() | deltas.keys():
+            model, pk = key
+            row = dict(values.get(key, {}))
+            row.update({name: F(name) + delta for name, delta in deltas.get(key, {}).items()})
+            obj = model(pk=pk)
+            for name, value in row.items():
+                setattr(obj, name, value)
+            groups[model][frozenset(row)].append(obj)
+
+        updated = 0
+        batch_size = getattr(settings, 'WRITE_BEHIND_BATCH_SIZE', 500)
+        try:
+            for model, by_fields in groups.items():
+                for fields, objs in by_fields.items():
+                    updated += model.objects.bulk_update(objs, sorted(fields), batch_size=batch_size)
+                    self._after_flush(model, [obj.pk for obj in objs])
+        except Exception:
+            # Keep the writes for the next flush rather than lose them
+            self._requeue(values, deltas)
+            raise
+        return updated
+
+    def _requeue(self, values, deltas) -> None:
+        with self._lock:
+            for key, row in values.items():
+                newer = self._values.get(key, {})
+                self._values[key] = {**row, **newer}
+            for key, row in deltas.items():
+                pending = self._deltas.setdefault(key, {})
+                for name, delta in row.items():
+                    pending[name] = pending.get(name, 0) + delta
+
+    @staticmethod
+    def _after_flush(model, pks) -> None:
+        from django.contrib.auth import get_user_model
+
+        from .conditional import bump_data_version
+
+        # Profile ETags cover every user column
+        if model is get_user_model():
+            bump_data_version(pks)
+
+    def _ensure_worker(self) -> None:
+        pid = os.getpid()
+        if self._pid != pid or self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != pid or self._thread is None or not self._thread.is_alive():
+                    if self._pid != pid:
+                        # Forked: the parent's pending writes are the parent's to flush
+                        self._values, self._deltas = {}, {}
+                    self._pid = pid
+                    self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                    self._thread.start()
+
+    def _wake_if_full(self) -> None:
+        if len(self) >= getattr(settings, 'WRITE_BEHIND_MAX_PENDING', 1000):
+            self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(max(self.interval(), 0.1))
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Write-behind flush failed; retrying next interval')
+            finally:
+                close_old_connections()
+
+
+buffer = WriteBehindBuffer()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('Write-behind flush at exit failed')
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from datetime import timedelta
 import environ
+from celery.schedules import crontab
 
 # Initialize environment variables
 env = environ.Env()
@@ -158,18 +159,61 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Custom user model
 AUTH_USER_MODEL = "attendance.User"
 
+# Login password checks run in a small process pool (attendance.hashing)
+AUTHENTICATION_BACKENDS = ["attendance.backends.PooledModelBackend"]
+
+# Preferred password hash; stored hashes using another algorithm or cost are
+# upgraded at the next successful login
+PASSWORD_HASH_ALGORITHM = env("PASSWORD_HASH_ALGORITHM", default="pbkdf2_sha256")
+# PBKDF2 iterations; 0 keeps Django's default
+PASSWORD_HASH_ITERATIONS = env.int("PASSWORD_HASH_ITERATIONS", default=0)
+_PASSWORD_HASHERS = {
+    "pbkdf2_sha256": "attendance.hashing.PBKDF2PasswordHasher",
+    "pbkdf2_sha1": "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+    # argon2 and bcrypt_sha256 need argon2-cffi / bcrypt installed
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "bcrypt_sha256": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASH_ALGORITHM]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASH_ALGORITHM
+]
+# Hashing pool per gunicorn worker (0 hashes inline), the logins that may wait
+# for it, how long they wait before a 503, and the pool's nice level. Each
+# waiting login holds a gunicorn thread, so keep the queue well below
+# --threads (8 in render.yaml) and the wait short, leaving threads for marks.
+LOGIN_HASH_WORKERS = env.int("LOGIN_HASH_WORKERS", default=2)
+LOGIN_HASH_QUEUE = env.int("LOGIN_HASH_QUEUE", default=4)
+LOGIN_HASH_QUEUE_TIMEOUT = env.float("LOGIN_HASH_QUEUE_TIMEOUT", default=1)
+LOGIN_HASH_NICE = env.int("LOGIN_HASH_NICE", default=5)
+
+# Bulk roster import (attendance.roster): initial passwords are hashed with a
+# lower PBKDF2 cost and upgraded at first login; 0 hash workers uses every CPU
+ROSTER_PASSWORD_ITERATIONS = env.int("ROSTER_PASSWORD_ITERATIONS", default=10000)
+ROSTER_HASH_WORKERS = env.int("ROSTER_HASH_WORKERS", default=0)
+ROSTER_BATCH_SIZE = env.int("ROSTER_BATCH_SIZE", default=1000)
+# Larger rosters go through the import_roster command, not the upload endpoint
+ROSTER_UPLOAD_MAX_ROWS = env.int("ROSTER_UPLOAD_MAX_ROWS", default=2000)
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
+    # simplejwt checks against a cached principal instead of loading the users row
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "attendance.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # orjson-backed; falls back to the stock JSON renderer when orjson is missing
+    "DEFAULT_RENDERER_CLASSES": (
+        "attendance.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    # Keyset pagination: no COUNT(*) or OFFSET scans on deep pages
+    "DEFAULT_PAGINATION_CLASS": "attendance.pagination.KeysetPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.AnonRateThrottle",
@@ -188,7 +232,9 @@ SIMPLE_JWT = {
     ),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
-    "UPDATE_LAST_LOGIN": True,
+    # last_login is written in batches by attendance.writebehind instead
+    "UPDATE_LAST_LOGIN": False,
+    "TOKEN_OBTAIN_SERIALIZER": "attendance.serializers.BufferedTokenObtainPairSerializer",
     "ALGORITHM": "HS256",
     "SIGNING_KEY": env("JWT_SECRET_KEY", default=SECRET_KEY),
     "VERIFYING_KEY": None,
@@ -261,8 +307,72 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 # Biometric Settings
 FACE_RECOGNITION_TOLERANCE = env.float("FACE_RECOGNITION_TOLERANCE", default=0.6)
 EAR_RECOGNITION_TOLERANCE = env.float("EAR_RECOGNITION_TOLERANCE", default=0.7)
+# Template rows normalised and written per block by import_biometric_templates
+BIOMETRIC_IMPORT_BLOCK_SIZE = env.int("BIOMETRIC_IMPORT_BLOCK_SIZE", default=2000)
 MIN_CONFIDENCE_THRESHOLD = env.float("MIN_CONFIDENCE_THRESHOLD", default=0.8)
 WORK_START_TIME = env("WORK_START_TIME", default="09:00")
+# Timezone that defines an office day for attendance queries
+OFFICE_TIME_ZONE = env("OFFICE_TIME_ZONE", default=TIME_ZONE)
+# Months of attendance partitions to keep pre-created (PostgreSQL only, see attendance_partitions)
+ATTENDANCE_PARTITION_MONTHS_AHEAD = env.int("ATTENDANCE_PARTITION_MONTHS_AHEAD", default=3)
+# Seconds a process may reuse its workforce snapshot without a version bump
+WORKFORCE_SNAPSHOT_TTL = env.int("WORKFORCE_SNAPSHOT_TTL", default=300)
+# Working calendar for absence calculations (Monday=0) and public holidays as YYYY-MM-DD
+WORKING_WEEKDAYS = env.list("WORKING_WEEKDAYS", cast=int, default=[0, 1, 2, 3, 4])
+PUBLIC_HOLIDAYS = env.list("PUBLIC_HOLIDAYS", default=[])
+# When the office day closes; the absentee job processes days that have closed
+WORKDAY_END_TIME = env("WORKDAY_END_TIME", default="17:00")
+ABSENTEE_BATCH_SIZE = env.int("ABSENTEE_BATCH_SIZE", default=1000)
+
+# Background report jobs: "celery", "thread" to run them on a thread in the web
+# process, or "local" for a separate run_report_jobs worker command
+REPORT_JOB_BACKEND = env("REPORT_JOB_BACKEND", default="celery" if env("REDIS_URL", default="") else "thread")
+# Seconds a finished report is shared with identical requests
+REPORT_RESULT_TTL = env.int("REPORT_RESULT_TTL", default=900)
+# Seconds before a queued/running job is considered abandoned
+REPORT_JOB_TIMEOUT = env.int("REPORT_JOB_TIMEOUT", default=1800)
+# Seconds a submission waits for a concurrent identical one to create its job
+REPORT_SUBMIT_LOCK_WAIT = env.float("REPORT_SUBMIT_LOCK_WAIT", default=5)
+# Seconds the authenticated principal is cached: shared cache, and per process
+# (other processes see a user change only after the per-process TTL)
+PRINCIPAL_CACHE_TTL = env.int("PRINCIPAL_CACHE_TTL", default=300)
+PRINCIPAL_LOCAL_TTL = env.int("PRINCIPAL_LOCAL_TTL", default=5)
+# Two-tier caches (attendance.tiered_cache): default per-process and shared
+# TTLs, how often a process checks the shared invalidation version, and
+# whether Redis pub/sub pushes invalidations when Redis is the cache
+TIERED_CACHE_LOCAL_TTL = env.int("TIERED_CACHE_LOCAL_TTL", default=30)
+TIERED_CACHE_SHARED_TTL = env.int("TIERED_CACHE_SHARED_TTL", default=300)
+TIERED_CACHE_VERSION_CHECK = env.float("TIERED_CACHE_VERSION_CHECK", default=1.0)
+TIERED_CACHE_PUBSUB = env.bool("TIERED_CACHE_PUBSUB", default=True)
+# Seconds between write-behind flushes of bookkeeping columns (last_login,
+# session progress); 0 writes through immediately
+WRITE_BEHIND_INTERVAL = env.float("WRITE_BEHIND_INTERVAL", default=5)
+WRITE_BEHIND_MAX_PENDING = env.int("WRITE_BEHIND_MAX_PENDING", default=1000)
+# Audit log writer (attendance.audit): entries are bulk-inserted every
+# AUDIT_BATCH_SIZE entries or AUDIT_FLUSH_INTERVAL seconds (0 writes through).
+# Past AUDIT_QUEUE_SIZE queued entries, requests write a batch themselves
+# after waiting AUDIT_QUEUE_TIMEOUT seconds; at exit the queue is drained for
+# up to AUDIT_DRAIN_TIMEOUT seconds
+AUDIT_FLUSH_INTERVAL = env.float("AUDIT_FLUSH_INTERVAL", default=0.5)
+AUDIT_BATCH_SIZE = env.int("AUDIT_BATCH_SIZE", default=500)
+AUDIT_QUEUE_SIZE = env.int("AUDIT_QUEUE_SIZE", default=10000)
+AUDIT_QUEUE_TIMEOUT = env.float("AUDIT_QUEUE_TIMEOUT", default=0.05)
+AUDIT_DRAIN_TIMEOUT = env.float("AUDIT_DRAIN_TIMEOUT", default=10)
+# Days of audit entries the admin summary aggregates by default (?days= up to a year)
+AUDIT_SUMMARY_DAYS = env.int("AUDIT_SUMMARY_DAYS", default=30)
+
+# Archival (see archive_attendance)
+ARCHIVE_ROOT = env("ARCHIVE_ROOT", default=str(BASE_DIR / "archive"))
+ATTENDANCE_RETENTION_DAYS = env.int("ATTENDANCE_RETENTION_DAYS", default=365)
+SESSION_RETENTION_DAYS = env.int("SESSION_RETENTION_DAYS", default=30)
+ARCHIVE_BATCH_SIZE = env.int("ARCHIVE_BATCH_SIZE", default=1000)
+ARCHIVE_SEGMENT_ROWS = env.int("ARCHIVE_SEGMENT_ROWS", default=50000)
+
+# Exports
+# Rows fetched per database round trip when streaming CSV/XLSX exports
+EXPORT_CHUNK_SIZE = env.int("EXPORT_CHUNK_SIZE", default=2000)
+# Rows per row group in Parquet exports (see export_attendance_parquet)
+PARQUET_ROW_GROUP_SIZE = env.int("PARQUET_ROW_GROUP_SIZE", default=64000)
 
 # Email Configuration (disabled by default; safe in all environments)
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -289,6 +399,13 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Absent/on-leave rows for the day that just closed (see materialize_absentees)
+    "materialize-absentees": {
+        "task": "attendance.tasks.materialize_absentees_task",
+        "schedule": crontab(minute=30, hour=env.int("ABSENTEE_JOB_HOUR", default=20)),
+    },
+}
 
 # Logging Configuration
 LOGGING = {
@@ -360,14 +477,32 @@ if str(_redis_url).strip():
             "LOCATION": _redis_url,
         }
     }
+elif env.bool("SHARED_CACHE", default=not DEBUG):
+    # No Redis: one cache for every worker on this host, kept in a
+    # memory-backed file (attendance.shared_cache)
+    CACHES = {
+        "default": {
+            "BACKEND": "attendance.shared_cache.SharedMemoryCache",
+            "LOCATION": env("SHARED_CACHE_PATH", default=""),
+            "OPTIONS": {"MAX_ENTRIES": env.int("SHARED_CACHE_MAX_ENTRIES", default=50000)},
+        }
+    }
 else:
-    # Fallback to in-process cache when Redis is not configured
+    # Development: in-process cache
     CACHES = {
         "default": {
             "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
             "LOCATION": "attendance-local",
         }
     }
+_shared_cache = CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+
+# Live verification sessions: "cache" keeps them in the cache and writes only
+# the final outcome; "database" writes a row up front (needed while the cache
+# is per process)
+VERIFICATION_SESSION_BACKEND = env(
+    "VERIFICATION_SESSION_BACKEND", default="cache" if _shared_cache else "database"
+)
 
 # Session Configuration
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
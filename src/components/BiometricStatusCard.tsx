@@ -16,12 +16,11 @@ const BiometricStatusCard: React.FC<BiometricStatusCardProps> = ({ onStatusUpdat
     const { user, refreshProfile } = useAuth();
     const { toast } = useToast();
 
-    const isBiometricRegistered =
-        !!(user?.face_biometric_data || user?.ear_biometric_data);
-    const biometricData = {
-        ...(user?.face_biometric_data || {}),
-        ...(user?.ear_biometric_data || {}),
-    } as any;
+    // /api/user/ reports registration via biometric_status; template vectors are only sent with ?expand=
+    const biometricStatus: string = user?.biometric_status || 'pending';
+    const hasFace = biometricStatus === 'both' || biometricStatus === 'face_only';
+    const hasEar = biometricStatus === 'both' || biometricStatus === 'ear_only';
+    const isBiometricRegistered = hasFace || hasEar;
 
     const handleVerificationComplete = async (success: boolean) => {
         setShowVerification(false);
@@ -89,17 +88,17 @@ const BiometricStatusCard: React.FC<BiometricStatusCardProps> = ({ onStatusUpdat
                     </Badge>
                 </div>
 
-                {isBiometricRegistered && biometricData && (
+                {isBiometricRegistered && (
                     <div className="space-y-3 p-4 bg-gray-50 rounded-lg">
                         <h4 className="font-medium text-gray-900">Registration Details</h4>
                         <div className="grid grid-cols-2 gap-4 text-sm">
                             <div>
                                 <span className="text-gray-600">Face Features:</span>
-                                <div className="font-medium">{Array.isArray(biometricData.face_features) ? 'Stored' : 'N/A'}</div>
+                                <div className="font-medium">{hasFace ? 'Stored' : 'N/A'}</div>
                             </div>
                             <div>
                                 <span className="text-gray-600">Ear Features:</span>
-                                <div className="font-medium">{Array.isArray(biometricData.ear_features) ? 'Stored' : 'N/A'}</div>
+                                <div className="font-medium">{hasEar ? 'Stored' : 'N/A'}</div>
                             </div>
                         </div>
                     </div>